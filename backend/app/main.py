@@ -1,24 +1,107 @@
 import time
+
+# Measure how long importing the application takes, for the startup report
+_import_started = time.perf_counter()
+
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.utils.logging_utils import get_logger
-from app.routers import roles, chat
+from app.config import settings
+from app.utils.logging_utils import get_logger, should_log_access
+from app.routers import roles, chat, metrics
+from app.services.admission_controller import AdmissionController
+from app.services.chat_service import ChatService
+from app.services.conversation_store import ConversationStore
+from app.services.llm_service import PROVIDER_IMPORT_SECONDS, LLMService, preload_provider
+from app.services.result_store import ResultStore
+from app.utils.metrics import APP_STARTUP_SECONDS
 
 # Get module-specific logger
 logger = get_logger(__name__)
 
+# Optionally import the provider SDK now so a pre-forking server (gunicorn
+# --preload) imports it once in the master and every worker inherits it
+if settings.llm_preload_enabled:
+    for provider in settings.llm_providers:
+        preload_provider(provider)
+
 
 # Define lifespan context manager (new approach)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup logic
-    logger.info("Application startup complete")
+    # Startup logic: build app-scoped services once so every request reuses
+    # the same LLM client and its keep-alive connection pool
+    report = {"import": IMPORT_SECONDS}
+    started = phase_started = time.perf_counter()
+
+    # The SDK import is reported on its own; it costs nothing here when preloaded
+    preloaded = set(PROVIDER_IMPORT_SECONDS)
+    llm_service = LLMService()
+    report["provider_sdk"] = sum(
+        seconds for provider, seconds in PROVIDER_IMPORT_SECONDS.items() if provider not in preloaded
+    )
+    report["llm_service"] = time.perf_counter() - phase_started - report["provider_sdk"]
+    phase_started = time.perf_counter()
+    if settings.llm_warmup_enabled:
+        await llm_service.warm_up()
+    report["warm_up"] = time.perf_counter() - phase_started
+
+    phase_started = time.perf_counter()
+    if settings.conversation_store_backend == "mongo":
+        from app.services.mongo_conversation_store import MongoConversationStore
+        app.state.conversation_store = MongoConversationStore()
+    elif settings.conversation_store_backend == "sqlite":
+        from app.services.sqlite_conversation_store import SQLiteConversationStore
+        app.state.conversation_store = SQLiteConversationStore()
+    else:
+        app.state.conversation_store = ConversationStore()
+    await app.state.conversation_store.start()
+    report["conversation_store"] = time.perf_counter() - phase_started
+
+    phase_started = time.perf_counter()
+    app.state.llm_service = llm_service
+    app.state.chat_service = ChatService(
+        llm_service=llm_service,
+        conversation_store=app.state.conversation_store,
+    )
+    app.state.admission_controller = AdmissionController()
+    report["chat_service"] = time.perf_counter() - phase_started
+
+    phase_started = time.perf_counter()
+    app.state.sql_executor = None
+    app.state.schema_service = None
+    if settings.sql_executor_enabled:
+        from app.services.schema_service import SchemaService
+        from app.services.sql_executor import SQLExecutor
+        app.state.sql_executor = SQLExecutor()
+        app.state.schema_service = SchemaService(app.state.sql_executor)
+        await app.state.schema_service.start()
+    app.state.result_store = ResultStore()
+    report["sql"] = time.perf_counter() - phase_started
+    report["total"] = IMPORT_SECONDS + time.perf_counter() - started
+
+    for phase, seconds in report.items():
+        APP_STARTUP_SECONDS.set(seconds, phase=phase)
+    app.state.startup_report = report
+    logger.info(
+        "Application startup complete - {}",
+        ", ".join(f"{phase}: {seconds * 1000:.1f}ms" for phase, seconds in report.items()),
+    )
     yield
-    # Shutdown logic
+    # Shutdown logic: flush pending conversation writes before exiting
+    await app.state.conversation_store.close()
+    app.state.chat_service.response_cache.close()
+    app.state.chat_service.step_executor.close()
+    await llm_service.aclose()
+    app.state.result_store.close()
+    if app.state.sql_executor is not None:
+        await app.state.schema_service.close()
+        await app.state.sql_executor.aclose()
     logger.info("Application shutdown complete")
+    # Drain queued log records before the process exits
+    await logger.complete()
 
 
 # Create FastAPI app with lifespan handler
@@ -42,18 +125,20 @@ app.add_middleware(
 # Add logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-
-    # Log the request
-    logger.info(f"Request: {request.method} {request.url.path}")
-    logger.debug(f"Client: {request.client.host if request.client else 'Unknown'}")
+    start_time = time.perf_counter()
 
     # Process the request
     response = await call_next(request)
 
-    # Log the response
-    process_time = (time.time() - start_time) * 1000
-    logger.info(f"Response: {response.status_code} - Took {process_time:.2f}ms")
+    # Log one sampled, structured line per request
+    if should_log_access(request.url.path, response.status_code):
+        process_time = (time.perf_counter() - start_time) * 1000
+        logger.bind(
+            method=request.method,
+            path=request.url.path,
+            status_code=response.status_code,
+            duration_ms=round(process_time, 2),
+        ).info("{} {} - {} - Took {:.2f}ms", request.method, request.url.path, response.status_code, process_time)
 
     return response
 
@@ -61,6 +146,7 @@ async def log_requests(request: Request, call_next):
 # Include the routers
 app.include_router(roles.router)
 app.include_router(chat.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -73,3 +159,7 @@ async def root():
 async def health_check():
     logger.info("Health check endpoint called")
     return {"status": "healthy"}
+
+
+# Time spent importing the application, including the optional SDK preload
+IMPORT_SECONDS = time.perf_counter() - _import_started
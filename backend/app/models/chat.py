@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class ChatRequest(BaseModel):
     """Request model for chat endpoint."""
@@ -14,3 +14,18 @@ class ChatResponse(BaseModel):
     result: str
     conversation_id: str
     metadata: Optional[Dict[str, Any]] = None
+
+class ChatBatchRequest(BaseModel):
+    """Request model for the batch chat endpoint."""
+    items: List[ChatRequest]
+    stream: bool = False
+
+class ChatBatchItemResult(BaseModel):
+    """Result of a single item in a batch chat request."""
+    index: int
+    response: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+class ChatBatchResponse(BaseModel):
+    """Response model for the batch chat endpoint."""
+    results: List[ChatBatchItemResult]
@@ -1,12 +1,21 @@
 """
 Chat Router - API endpoints for chat functionality.
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
-from app.models.chat import ChatRequest, ChatResponse
+import asyncio
+from datetime import datetime, timezone
+import gzip
+import ipaddress
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import AsyncIterator, List, Dict, Any, Optional
+from app.config import settings
+from app.models.chat import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatResponse
+from app.services.admission_controller import BATCH_LANE, AdmissionController, AdmissionRejected
 from app.services.chat_service import ChatService
 from app.services.conversation_store import ConversationStore
 from app.services.roles_service import RolesService
+from app.utils.json_utils import dumps
 from app.utils.logging_utils import get_logger
 
 # Get module-specific logger
@@ -18,22 +27,63 @@ router = APIRouter(
     tags=["chat"],
 )
 
-# Dependency to get ChatService instance
-def get_chat_service():
-    return ChatService()
+# Dependency to get the app-scoped ChatService instance created in lifespan
+def get_chat_service(request: Request) -> ChatService:
+    return request.app.state.chat_service
 
-# Dependency to get ConversationStore instance
-def get_conversation_store():
-    return ConversationStore()
+# Dependency to get the app-scoped ConversationStore instance created in lifespan
+def get_conversation_store(request: Request) -> ConversationStore:
+    return request.app.state.conversation_store
+
+# Dependency to get the app-scoped AdmissionController instance created in lifespan
+def get_admission_controller(request: Request) -> AdmissionController:
+    return request.app.state.admission_controller
+
+# Proxies allowed to identify the caller with the X-User-Id header
+TRUSTED_PROXIES = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.admission_trusted_proxies]
+
+def _is_trusted_proxy(host: str) -> bool:
+    """Check whether a client address belongs to a trusted proxy."""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+# Dependency to identify the caller for per-user rate limits. The header is
+# client-supplied, so it is only honoured when a trusted proxy sets it.
+def get_user_id(request: Request) -> str:
+    host = request.client.host if request.client else None
+    user_id = request.headers.get("X-User-Id")
+    if user_id and host and _is_trusted_proxy(host):
+        return user_id
+    return host or "anonymous"
+
+def _admission_error(error: AdmissionRejected) -> HTTPException:
+    """Convert an admission rejection to an HTTP error with Retry-After."""
+    detail = "Too many requests" if error.status_code == 429 else "Server is busy, please retry later"
+    return HTTPException(
+        status_code=error.status_code,
+        detail=detail,
+        headers={"Retry-After": str(error.retry_after)},
+    )
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, chat_service: ChatService = Depends(get_chat_service)):
+async def chat(request: ChatRequest,
+               chat_service: ChatService = Depends(get_chat_service),
+               admission: AdmissionController = Depends(get_admission_controller),
+               user_id: str = Depends(get_user_id)):
     """
     Process a chat request.
 
+    Requests pass admission control first and are rejected with 429 or 503
+    and a Retry-After header when the caller or the service is saturated.
+
     Args:
         request: ChatRequest with query and optional role
         chat_service: ChatService instance
+        admission: AdmissionController instance
+        user_id: Identifier of the caller for rate limiting
 
     Returns:
         ChatResponse: The response from the LLM
@@ -42,9 +92,14 @@ async def chat(request: ChatRequest, chat_service: ChatService = Depends(get_cha
 
     # Validate role if provided
     if request.role and not RolesService.is_valid_role(request.role):
-        logger.warning(f"Invalid role provided: {request.role}")
+        logger.warning("Invalid role provided: {}", request.role)
         raise HTTPException(status_code=400, detail=f"Invalid role: {request.role}")
 
+    try:
+        ticket = await admission.acquire(user_id, request.role)
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
     try:
         # Process the chat request
         response_data = await chat_service.process_chat(
@@ -53,41 +108,286 @@ async def chat(request: ChatRequest, chat_service: ChatService = Depends(get_cha
             conversation_id=request.conversationId
         )
 
-        # Convert to response model
-        return ChatResponse(**response_data)
+        # Validated against ChatResponse once, by FastAPI, and serialized straight to JSON bytes
+        return response_data
 
+    except asyncio.TimeoutError:
+        logger.error("Chat request timed out waiting for the LLM")
+        raise HTTPException(status_code=504, detail="Timed out waiting for the LLM response")
     except Exception as e:
-        logger.error(f"Error processing chat request: {str(e)}")
+        logger.error("Error processing chat request: {}", str(e))
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+    finally:
+        admission.release(ticket)
+
+def _format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Format a single server-sent event."""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest,
+                      chat_service: ChatService = Depends(get_chat_service),
+                      admission: AdmissionController = Depends(get_admission_controller),
+                      user_id: str = Depends(get_user_id)):
+    """
+    Process a chat request and stream the response as server-sent events.
+
+    Emits a "token" event per chunk, then a "done" event carrying the same
+    fields as ChatResponse, or an "error" event if generation fails. The
+    admission slot is held until the stream ends.
+
+    Args:
+        request: ChatRequest with query and optional role
+        chat_service: ChatService instance
+        admission: AdmissionController instance
+        user_id: Identifier of the caller for rate limiting
+
+    Returns:
+        StreamingResponse: A text/event-stream response
+    """
+    logger.info("API endpoint called: POST /chat/stream")
+
+    # Validate role if provided
+    if request.role and not RolesService.is_valid_role(request.role):
+        logger.warning("Invalid role provided: {}", request.role)
+        raise HTTPException(status_code=400, detail=f"Invalid role: {request.role}")
+
+    try:
+        ticket = await admission.acquire(user_id, request.role)
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
+    async def event_stream() -> AsyncIterator[bytes]:
+        try:
+            async for event in chat_service.stream_chat(
+                query=request.query,
+                role=request.role,
+                conversation_id=request.conversationId
+            ):
+                yield _format_sse(event["event"], event["data"])
+        except asyncio.TimeoutError:
+            yield _format_sse("error", {"detail": "Timed out waiting for the LLM response"})
+        except Exception as e:
+            logger.error("Error streaming chat response: {}", str(e))
+            yield _format_sse("error", {"detail": f"Error processing request: {str(e)}"})
+        finally:
+            admission.release(ticket)
+
+    # Also release after the response in case the stream is never started
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(admission.release, ticket),
+    )
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest,
+                     chat_service: ChatService = Depends(get_chat_service),
+                     admission: AdmissionController = Depends(get_admission_controller),
+                     user_id: str = Depends(get_user_id)):
+    """
+    Process a batch of chat requests.
+
+    Results are returned in request order with per-item errors. With
+    "stream" set, each result is sent as an NDJSON line as soon as it
+    completes instead. A batch takes one admission slot in the batch lane,
+    so queued interactive requests are admitted first and the batch is the
+    first to be displaced from a full queue.
+
+    Args:
+        request: ChatBatchRequest with the items to process
+        chat_service: ChatService instance
+        admission: AdmissionController instance
+        user_id: Identifier of the caller for rate limiting
+
+    Returns:
+        ChatBatchResponse, or a StreamingResponse of NDJSON results
+    """
+    logger.info("API endpoint called: POST /chat/batch ({} items)", len(request.items))
+
+    if len(request.items) > settings.chat_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.items)} items, maximum is {settings.chat_batch_max_items}"
+        )
+
+    items = [
+        {"query": item.query, "role": item.role, "conversation_id": item.conversationId}
+        for item in request.items
+    ]
+
+    try:
+        ticket = await admission.acquire(user_id, BATCH_LANE)
+    except AdmissionRejected as e:
+        raise _admission_error(e)
+
+    if request.stream:
+        async def ndjson_stream() -> AsyncIterator[bytes]:
+            try:
+                async for index, result in chat_service.process_batch(items):
+                    yield dumps({"index": index, **result}) + b"\n"
+            finally:
+                admission.release(ticket)
+
+        # Also release after the response in case the stream is never started
+        return StreamingResponse(
+            ndjson_stream(),
+            media_type="application/x-ndjson",
+            background=BackgroundTask(admission.release, ticket),
+        )
+
+    try:
+        # Plain dicts, validated against ChatBatchResponse once by FastAPI
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        async for index, result in chat_service.process_batch(items):
+            results[index] = {"index": index, **result}
+        return {"results": results}
+    finally:
+        admission.release(ticket)
+
+@router.get("/chat/store/stats")
+async def get_store_stats(conversation_store: ConversationStore = Depends(get_conversation_store)):
+    """
+    Get conversation store usage and eviction counters.
+
+    Args:
+        conversation_store: ConversationStore instance
+
+    Returns:
+        Dict with store size, configured limits and eviction counts
+    """
+    logger.info("API endpoint called: GET /chat/store/stats")
+    return conversation_store.get_stats()
+
+@router.get("/chat/cache/stats")
+async def get_cache_stats(chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Get response cache hit/miss statistics.
+
+    Args:
+        chat_service: ChatService instance
+
+    Returns:
+        Dict with cache hit, miss and size counters
+    """
+    logger.info("API endpoint called: GET /chat/cache/stats")
+    return chat_service.response_cache.get_stats()
+
+@router.get("/chat/admission/stats")
+async def get_admission_stats(admission: AdmissionController = Depends(get_admission_controller)):
+    """
+    Get admission control counters and queue depth.
+
+    Args:
+        admission: AdmissionController instance
+
+    Returns:
+        Dict with admitted and rejected counts, active slots and waiting requests by role
+    """
+    logger.info("API endpoint called: GET /chat/admission/stats")
+    return admission.get_stats()
+
+@router.get("/chat/providers/stats")
+async def get_provider_stats(chat_service: ChatService = Depends(get_chat_service)):
+    """
+    Get per-provider latency and error statistics used for routing.
+
+    Args:
+        chat_service: ChatService instance
+
+    Returns:
+        Dict with the providers in current ranking order and the hedging settings
+    """
+    logger.info("API endpoint called: GET /chat/providers/stats")
+    return chat_service.llm_service.router.get_stats()
+
+def _parse_since(value: str) -> float:
+    """Parse a `since` value given as a Unix timestamp or an ISO 8601 datetime, UTC unless it has an offset."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # fromisoformat only accepts the "Z" suffix from Python 3.11
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid since value: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _json_response(request: Request, payload: Dict[str, Any], headers: Dict[str, str]) -> Response:
+    """Serialize a payload once, gzip-compressing it when large and the client accepts gzip."""
+    body = dumps(payload)
+    headers = dict(headers, Vary="Accept-Encoding")
+    if len(body) >= settings.conversation_gzip_min_bytes and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/chat/conversation/{conversation_id}")
-async def get_conversation(conversation_id: str, conversation_store: ConversationStore = Depends(get_conversation_store)):
+async def get_conversation(conversation_id: str,
+                           request: Request,
+                           cursor: Optional[int] = Query(None, ge=0),
+                           since: Optional[str] = None,
+                           limit: Optional[int] = Query(None, ge=1, le=1000),
+                           conversation_store: ConversationStore = Depends(get_conversation_store)):
     """
     Get the messages in a conversation.
 
+    Supports incremental polling: pass back next_cursor as cursor to receive
+    only new messages, or filter by a since timestamp, and cap the page size
+    with limit. Responses carry an ETag from the conversation's version; a
+    request with a matching If-None-Match gets an empty 304 without any
+    messages being read. Large responses are gzip-compressed when accepted.
+
     Args:
         conversation_id: The ID of the conversation to retrieve
+        request: The HTTP request, for conditional and encoding headers
+        cursor: Optional sequence number of the first message to return
+        since: Optional Unix timestamp or ISO 8601 datetime; only later messages are returned
+        limit: Optional maximum number of messages to return
         conversation_store: ConversationStore instance
 
     Returns:
-        Dict containing conversation ID and messages
+        Dict containing conversation ID, messages, version, next_cursor and has_more
     """
-    logger.info(f"API endpoint called: GET /chat/conversation/{conversation_id}")
+    logger.info("API endpoint called: GET /chat/conversation/{}", conversation_id)
+
+    since_timestamp = _parse_since(since) if since is not None else None
 
     try:
-        messages = conversation_store.get_conversation(conversation_id)
+        await conversation_store.ensure_loaded(conversation_id)
+
+        # Answer unchanged polls from the version alone
+        version = conversation_store.get_version(conversation_id)
+        if version is None:
+            logger.warning("Conversation not found: {}", conversation_id)
+            raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+        etag = f'W/"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
 
-        if not messages:
-            logger.warning(f"Conversation not found: {conversation_id}")
+        page = conversation_store.get_conversation_page(conversation_id, cursor, since_timestamp, limit)
+        if page is None:
+            logger.warning("Conversation not found: {}", conversation_id)
             raise HTTPException(status_code=404, detail=f"Conversation not found: {conversation_id}")
+        # The page may be newer than the version checked above
+        headers["ETag"] = f'W/"{page["version"]}"'
 
-        return {
+        return _json_response(request, {
             "id": conversation_id,
-            "messages": messages
-        }
+            "messages": page["messages"],
+            "version": page["version"],
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"],
+        }, headers)
 
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
-        logger.error(f"Error retrieving conversation: {str(e)}")
+        logger.error("Error retrieving conversation: {}", str(e))
         raise HTTPException(status_code=500, detail=f"Error retrieving conversation: {str(e)}")
@@ -0,0 +1,22 @@
+"""
+Metrics Router - Prometheus metrics endpoint.
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import REGISTRY
+
+# Create router
+router = APIRouter(
+    prefix="/api",
+    tags=["metrics"],
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Get chat pipeline metrics in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: Stage latency histograms, token counters, in-flight gauges and error counts
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
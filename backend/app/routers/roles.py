@@ -25,4 +25,5 @@ async def get_roles():
     """
     logger.info("API endpoint called: GET /roles")
     roles = RolesService.get_available_roles()
-    return RolesResponse(roles=roles)
+    # Validated against RolesResponse once, by FastAPI
+    return {"roles": roles}
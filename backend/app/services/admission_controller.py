@@ -0,0 +1,298 @@
+"""
+Admission Controller - Bounds the chat work accepted and orders it by role priority.
+"""
+import asyncio
+from collections import OrderedDict
+import heapq
+import itertools
+import math
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from contextlib import asynccontextmanager
+from app.config import settings
+from app.services.roles_service import RolesService
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import ADMISSION_REJECTIONS, CHAT_STAGE_SECONDS
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Priority lane of batch requests
+BATCH_LANE = "batch"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and Retry-After."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate up to a burst size."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """
+        Take one token if available.
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum tokens held
+            now: Current monotonic time
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / rate
+
+
+class Ticket:
+    """An admitted request holding one active slot until released."""
+
+    __slots__ = ("role", "admitted_at", "released")
+
+    def __init__(self, role: Optional[str], admitted_at: float):
+        self.role = role
+        self.admitted_at = admitted_at
+        self.released = False
+
+
+class _Waiter:
+    """A request waiting in its priority lane for a free slot."""
+
+    __slots__ = ("priority", "sequence", "role", "future")
+
+    def __init__(self, priority: int, sequence: int, role: Optional[str], future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.role = role
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+def _parse_priorities(value: str) -> Dict[str, int]:
+    """Parse "Role=priority" pairs, defaulting to the order of the available roles."""
+    if not value:
+        return {role: index for index, role in enumerate(RolesService.AVAILABLE_ROLES)}
+    return {
+        role.strip(): int(priority)
+        for role, _, priority in (item.partition("=") for item in value.split(",") if "=" in item)
+    }
+
+
+class AdmissionController:
+    """
+    Admission control and backpressure for chat requests.
+
+    At most max_active requests run at once. Further requests wait in
+    priority lanes keyed by role (lower number first, FIFO within a lane),
+    so under saturation Executive requests are served ahead of bulk
+    DataAnalyst traffic. Batch requests wait in their own lane after every
+    role, unless its priority is configured. When the wait queue is full a
+    request is rejected with 503, unless it outranks the lowest-priority
+    waiter, which is then rejected in its place. Requests that wait longer
+    than the queue timeout are rejected with 503, and each user is limited
+    by a token bucket (429). Rejections carry a Retry-After estimate.
+    """
+
+    def __init__(self):
+        """Initialize the admission controller from settings."""
+        self.enabled = settings.admission_enabled
+        self.max_active = settings.admission_max_active
+        self.max_queue = settings.admission_max_queue
+        self.queue_timeout = settings.admission_queue_timeout_seconds
+        self.user_rate = settings.admission_user_rate
+        self.user_burst = settings.admission_user_burst
+        self.max_users = settings.admission_max_tracked_users
+        self.priorities = _parse_priorities(settings.admission_role_priorities)
+        self.default_priority = max(self.priorities.values(), default=0) + 1
+        self.priorities.setdefault(BATCH_LANE, self.default_priority + 1)
+        self.active = 0
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # Moving average of how long admitted requests hold a slot, for Retry-After
+        self._service_time = 1.0
+        self.stats = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0, "displaced": 0}
+        logger.info(
+            "Admission controller initialized - enabled: {}, max active: {}, max queue: {}, priorities: {}",
+            self.enabled, self.max_active, self.max_queue, self.priorities,
+        )
+
+    def priority_of(self, role: Optional[str]) -> int:
+        """Get the priority lane of a role; unknown roles and no role go last."""
+        return self.priorities.get(role, self.default_priority) if role else self.default_priority
+
+    def _retry_after(self, queued: int) -> int:
+        """Estimate seconds until a slot frees up for a request behind `queued` others."""
+        return max(1, math.ceil(self._service_time * (queued + 1) / max(self.max_active, 1)))
+
+    def _reject(self, status_code: int, reason: str, role: Optional[str], retry_after: int) -> AdmissionRejected:
+        """Count a rejection and build its exception."""
+        self.stats[reason] += 1
+        ADMISSION_REJECTIONS.inc(reason=reason, role=role)
+        logger.warning("Request rejected by admission control - reason: {}, role: {}", reason, role)
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    def _check_rate(self, user_id: str, role: Optional[str]) -> None:
+        """Take a token from the user's bucket or reject with 429."""
+        if self.user_rate <= 0:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_burst, now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        wait = bucket.take(self.user_rate, self.user_burst, now)
+        if wait > 0:
+            raise self._reject(429, "rate_limited", role, max(1, math.ceil(wait)))
+
+    def _discard(self, waiter: _Waiter) -> None:
+        """Remove a waiter from the queue."""
+        self._waiters.remove(waiter)
+        heapq.heapify(self._waiters)
+
+    async def acquire(self, user_id: str, role: Optional[str] = None) -> Ticket:
+        """
+        Admit a request, waiting in its priority lane if every slot is busy.
+
+        Args:
+            user_id: Identifier the per-user rate limit applies to
+            role: Optional role of the request, selecting its priority lane (BATCH_LANE for batches)
+
+        Returns:
+            Ticket to pass to release() when the request is finished
+
+        Raises:
+            AdmissionRejected: If the request is rate limited, the queue is full or the wait times out
+        """
+        if not self.enabled:
+            return Ticket(role, time.perf_counter())
+        self._check_rate(user_id, role)
+
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return Ticket(role, time.perf_counter())
+
+        priority = self.priority_of(role)
+        if len(self._waiters) >= self.max_queue:
+            lowest = max(self._waiters) if self._waiters else None
+            if lowest is None or lowest.priority <= priority:
+                raise self._reject(503, "queue_full", role, self._retry_after(len(self._waiters)))
+            # Make room by turning away the newest request of the lowest-priority lane
+            self._discard(lowest)
+            self.stats["displaced"] += 1
+            lowest.future.set_exception(self._reject(503, "queue_full", lowest.role, self._retry_after(len(self._waiters))))
+
+        waiter = _Waiter(priority, next(self._sequence), role, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self.stats["queued"] += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.exception():
+                # A slot was handed over just as the wait timed out
+                return self._admitted(role, started)
+            # A displaced waiter has already been removed from the queue
+            if waiter in self._waiters:
+                self._discard(waiter)
+            raise self._reject(503, "queue_timeout", role, self._retry_after(len(self._waiters)))
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.exception():
+                # The slot was handed to a request that went away; pass it on
+                self.release(Ticket(role, started))
+            elif waiter in self._waiters:
+                self._discard(waiter)
+            raise
+        return self._admitted(role, started)
+
+    def _admitted(self, role: Optional[str], queued_at: float) -> Ticket:
+        """Record a request admitted from the queue."""
+        now = time.perf_counter()
+        CHAT_STAGE_SECONDS.observe(now - queued_at, stage="admission_wait", role=role)
+        self.stats["admitted"] += 1
+        return Ticket(role, now)
+
+    def release(self, ticket: Ticket) -> None:
+        """
+        Release an admitted request's slot, handing it to the next waiter.
+
+        Releasing the same ticket twice has no effect.
+
+        Args:
+            ticket: The ticket returned by acquire()
+        """
+        if ticket.released or not self.enabled:
+            return
+        ticket.released = True
+        self._service_time += 0.2 * ((time.perf_counter() - ticket.admitted_at) - self._service_time)
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if not waiter.future.done():
+                # The slot passes straight to the waiter, so active is unchanged
+                waiter.future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, role: Optional[str] = None) -> AsyncIterator[Ticket]:
+        """
+        Hold an admission slot for the duration of the block.
+
+        Args:
+            user_id: Identifier the per-user rate limit applies to
+            role: Optional role of the request, selecting its priority lane
+
+        Yields:
+            The admission ticket
+
+        Raises:
+            AdmissionRejected: If the request is not admitted
+        """
+        ticket = await self.acquire(user_id, role)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get admission counters and current queue depth per lane.
+
+        Returns:
+            Dictionary with admission counters, active slots and queued requests by role
+        """
+        lanes: Dict[str, int] = {}
+        for waiter in self._waiters:
+            lanes[waiter.role or "none"] = lanes.get(waiter.role or "none", 0) + 1
+        return dict(
+            self.stats,
+            enabled=self.enabled,
+            active=self.active,
+            max_active=self.max_active,
+            waiting=len(self._waiters),
+            max_queue=self.max_queue,
+            waiting_by_role=lanes,
+            tracked_users=len(self._buckets),
+        )
@@ -1,11 +1,19 @@
 """
 Chat Service - Handles chat functionality and conversation management.
 """
-from typing import Dict, Any, List, Optional
+import asyncio
+from typing import AsyncIterator, Dict, Any, Iterable, List, Optional, Tuple
 from uuid import uuid4
-from app.services.llm_service import LLMService
+from app.config import settings
+from app.services.context_builder import ContextBuilder, ContextWindow
+from app.services.llm_service import LLMResult, LLMService
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from app.services.step_executor import PlanResult, Step, StepExecutor
 from app.services.conversation_store import ConversationStore
+from app.services.roles_service import RolesService
 from app.utils.logging_utils import get_logger
+from app.utils.metrics import CHAT_ERRORS, CHAT_IN_FLIGHT, CHAT_STAGE_SECONDS
 
 # Get module-specific logger
 logger = get_logger(__name__)
@@ -16,17 +24,168 @@ class ChatService:
     Delegates LLM interactions to the LLMService.
     """
 
-    def __init__(self, llm_service: Optional[LLMService] = None):
+    def __init__(self,
+                 llm_service: Optional[LLMService] = None,
+                 conversation_store: Optional[ConversationStore] = None):
         """
         Initialize the chat service.
 
         Args:
             llm_service: An optional LLMService instance. If not provided, a new one will be created.
+            conversation_store: An optional ConversationStore instance. Defaults to the shared store.
         """
         self.llm_service = llm_service or LLMService()
-        self.conversation_store = ConversationStore()
+        self.conversation_store = conversation_store or ConversationStore()
+        self.context_builder = ContextBuilder(self.llm_service)
+        self.response_cache = ResponseCache()
+        self.single_flight = SingleFlight()
+        self.step_executor = StepExecutor()
+        self.coalesce_enabled = settings.chat_coalesce_enabled
+        self.batch_max_concurrency = settings.chat_batch_max_concurrency
         logger.info("Chat service initialized")
 
+    def _build_response_data(self,
+                             query: str,
+                             response_text: str,
+                             conversation_id: str,
+                             role: Optional[str],
+                             context: Optional[ContextWindow] = None,
+                             result: Optional[LLMResult] = None) -> Dict[str, Any]:
+        """
+        Build the response payload shared by the regular and streaming chat paths.
+
+        Args:
+            query: The user's query
+            response_text: The generated response text
+            conversation_id: The ID of the conversation
+            role: Optional role used for the response
+            context: Optional context window the response was generated from
+            result: Optional LLM result identifying the provider and model that served the response
+
+        Returns:
+            A dictionary matching the ChatResponse model
+        """
+        provider = self._serving_provider(result)
+        with CHAT_STAGE_SECONDS.time(stage="response_build", role=role, provider=provider):
+            metadata = {
+                "role": role,
+                "provider": provider
+            }
+            if result is not None and result.provider is not None:
+                metadata.update(result.metadata())
+            if context is not None:
+                metadata.update(context.metadata())
+            return {
+                "query": query,
+                "result": response_text,
+                "conversation_id": conversation_id,
+                "metadata": metadata
+            }
+
+    def _serving_provider(self, result: Optional[LLMResult] = None) -> str:
+        """
+        Get the provider to attribute work to in cache keys and metrics.
+
+        Args:
+            result: Optional LLM result of the call
+
+        Returns:
+            The provider that served the result, or the one the router would send the next call to
+        """
+        if result is not None and result.provider is not None:
+            return result.provider
+        return self.llm_service.router.select().provider
+
+    def _make_cache_key(self,
+                        query: str,
+                        role: Optional[str],
+                        context: ContextWindow,
+                        result: Optional[LLMResult] = None) -> str:
+        """
+        Build the response cache key for the prompt that would be sent to the LLM.
+
+        Lookups key on the backend the router would pick. Writes pass the
+        result, so a response served by a fallback or hedge backend is
+        stored under that backend's provider and model.
+
+        Args:
+            query: The user's query
+            role: Optional role used for the system prompt
+            context: The context window selected for the request
+            result: Optional LLM result whose provider and model the key is for
+
+        Returns:
+            The cache key
+        """
+        messages = list(context.history)
+        if context.summary:
+            messages.insert(0, {"role": "summary", "content": context.summary})
+        messages.append({"role": "user", "content": query})
+        if result is not None and result.provider is not None:
+            provider, model = result.provider, result.model
+        else:
+            backend = self.llm_service.router.select()
+            provider, model = backend.provider, backend.model
+        return self.response_cache.make_key(
+            provider,
+            model,
+            self.llm_service.get_system_prompt(role),
+            messages
+        )
+
+    async def _prepare_context(self,
+                               query: str,
+                               role: Optional[str],
+                               conversation_id: str,
+                               existing: bool = True) -> ContextWindow:
+        """
+        Store the user's query and select the context to send with it.
+
+        Args:
+            query: The user's query
+            role: Optional role to contextualize the response
+            conversation_id: The ID of the conversation
+            existing: Whether the client supplied the ID; a newly generated one has nothing to load
+
+        Returns:
+            The context window for the LLM call
+        """
+        provider = self._serving_provider()
+        with CHAT_STAGE_SECONDS.time(stage="store_read", role=role, provider=provider):
+            # Load an existing conversation from persistent storage if needed
+            if existing:
+                await self.conversation_store.ensure_loaded(conversation_id)
+
+            # Get conversation history before storing the query so it is sent only once
+            history = self.conversation_store.get_conversation_messages_for_llm(conversation_id)
+            offset = self.conversation_store.get_message_offset(conversation_id)
+
+        # Store the user message in the conversation history
+        self._add_message(conversation_id, "user", query, role)
+
+        # Fit the history into the token budget, summarizing older turns
+        with CHAT_STAGE_SECONDS.time(stage="context_build", role=role, provider=provider):
+            return await self.context_builder.build(conversation_id, history, query, role, offset)
+
+    def _add_message(self,
+                     conversation_id: str,
+                     sender: str,
+                     content: str,
+                     role: Optional[str],
+                     result: Optional[LLMResult] = None) -> None:
+        """
+        Store a message in the conversation history, timing the write.
+
+        Args:
+            conversation_id: The ID of the conversation
+            sender: The message sender ("user" or "assistant")
+            content: The message content
+            role: Optional role of the request, used as a metrics label
+            result: Optional LLM result that produced the content, used as a metrics label
+        """
+        with CHAT_STAGE_SECONDS.time(stage="store_write", role=role, provider=self._serving_provider(result)):
+            self.conversation_store.add_message(conversation_id, sender, content)
+
     async def process_chat(self,
                      query: str,
                      role: Optional[str] = None,
@@ -45,42 +204,265 @@ class ChatService:
             A dictionary containing the response data
         """
         # Generate a conversation ID if not provided
+        existing = bool(conversation_id)
         conversation_id = conversation_id or str(uuid4())
 
         # Log the chat request
-        logger.info(f"Processing chat request - Role: {role or 'None'}, Query: {query}")
+        logger.info("Processing chat request - Role: {}, Query: {}", role or 'None', query)
 
+        labels = {"endpoint": "chat", "role": role, "provider": self._serving_provider()}
+        CHAT_IN_FLIGHT.inc(**labels)
         try:
-            # Store the user message in the conversation history
-            self.conversation_store.add_message(conversation_id, "user", query)
+            # Store the query and select the conversation context for the LLM
+            context = await self._prepare_context(query, role, conversation_id, existing)
 
-            # Get conversation history from the store
-            history = self.conversation_store.get_conversation_messages_for_llm(conversation_id)
+            # Serve repeated prompts from the response cache when allowed for the role
+            cache_key = None
+            response_text = None
+            if self.response_cache.is_enabled_for(role):
+                cache_key = self._make_cache_key(query, role, context)
+                response_text = await self.response_cache.get(cache_key)
+            cache_hit = response_text is not None
 
-            # Generate response using LLM service with the full conversation history
-            response_text = self.llm_service.generate_response(
-                query=query,
-                role=role,
-                conversation_history=history
-            )
+            coalesced = False
+            result = None
+            if not cache_hit:
+                async def generate() -> LLMResult:
+                    # Generate response using LLM service with the budgeted context
+                    generated = await self.llm_service.agenerate(
+                        query=query,
+                        role=role,
+                        conversation_history=context.history,
+                        summary=context.summary
+                    )
+                    if cache_key is not None:
+                        await self.response_cache.set(
+                            self._make_cache_key(query, role, context, generated), generated.text
+                        )
+                    return generated
+
+                # Identical concurrent prompts share a single LLM call
+                if self.coalesce_enabled:
+                    flight_key = cache_key or self._make_cache_key(query, role, context)
+                    result, coalesced = await self.single_flight.do(flight_key, generate)
+                else:
+                    result = await generate()
+                response_text = result.text
 
             # Store the assistant's response in the conversation history
-            self.conversation_store.add_message(conversation_id, "assistant", response_text)
+            self._add_message(conversation_id, "assistant", response_text, role, result)
 
             # Construct response data
-            response_data = {
-                "query": query,
-                "result": response_text,
-                "conversation_id": conversation_id,
-                "metadata": {
-                    "role": role,
-                    "provider": self.llm_service.provider
-                }
-            }
+            response_data = self._build_response_data(query, response_text, conversation_id, role, context, result)
+            response_data["metadata"]["cache_hit"] = cache_hit
+            response_data["metadata"]["coalesced"] = coalesced
 
-            logger.info(f"Chat response generated successfully for conversation {conversation_id}")
+            logger.info("Chat response generated successfully for conversation {}", conversation_id)
             return response_data
 
         except Exception as e:
-            logger.error(f"Error in chat service: {str(e)}")
+            CHAT_ERRORS.inc(**labels)
+            logger.error("Error in chat service: {}", str(e))
+            raise
+        finally:
+            CHAT_IN_FLIGHT.dec(**labels)
+
+    async def execute_plan(self,
+                           steps: Iterable[Step],
+                           inputs: Optional[Dict[str, Any]] = None,
+                           role: Optional[str] = None) -> PlanResult:
+        """
+        Execute the steps a question was decomposed into.
+
+        Steps run as soon as their dependencies are done, so independent
+        steps run concurrently. A failing step does not raise; it and the
+        steps depending on it are reported in the result's metadata.
+
+        Args:
+            steps: The planned steps with their dependencies
+            inputs: Values passed to every step, such as the user's query
+            role: Optional role of the request, used as a metrics label
+
+        Returns:
+            The plan result with each step's output and timing metadata
+
+        Raises:
+            PlanError: If the steps do not form a valid dependency graph
+        """
+        labels = {"endpoint": "plan", "role": role, "provider": self._serving_provider()}
+        CHAT_IN_FLIGHT.inc(**labels)
+        try:
+            plan = await self.step_executor.run(steps, inputs)
+        except Exception as e:
+            CHAT_ERRORS.inc(**labels)
+            logger.error("Error executing plan: {}", str(e))
+            raise
+        finally:
+            CHAT_IN_FLIGHT.dec(**labels)
+        if not plan.ok:
+            CHAT_ERRORS.inc(**labels)
+        return plan
+
+    async def stream_chat(self,
+                          query: str,
+                          role: Optional[str] = None,
+                          conversation_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a chat request, streaming the response as it is generated.
+
+        The assistant message is stored once, when the stream completes or is
+        cancelled, rather than per token.
+
+        Args:
+            query: The user's query
+            role: Optional role to contextualize the response
+            conversation_id: Optional ID for an existing conversation
+
+        Yields:
+            Event dictionaries with an "event" name ("token" or "done") and "data"
+        """
+        existing = bool(conversation_id)
+        conversation_id = conversation_id or str(uuid4())
+        logger.info("Processing streaming chat request - Role: {}, Query: {}", role or 'None', query)
+
+        chunks: List[str] = []
+        completed = False
+        labels = {"endpoint": "chat_stream", "role": role, "provider": self._serving_provider()}
+        result = LLMResult()
+        CHAT_IN_FLIGHT.inc(**labels)
+        try:
+            context = await self._prepare_context(query, role, conversation_id, existing)
+
+            async for chunk in self.llm_service.astream_response(
+                query=query,
+                role=role,
+                conversation_history=context.history,
+                summary=context.summary,
+                result=result
+            ):
+                chunks.append(chunk)
+                yield {"event": "token", "data": {"content": chunk}}
+
+            completed = True
+            response_text = "".join(chunks)
+            self._add_message(conversation_id, "assistant", response_text, role, result)
+            logger.info("Streaming chat response completed for conversation {}", conversation_id)
+            yield {
+                "event": "done",
+                "data": self._build_response_data(query, response_text, conversation_id, role, context, result)
+            }
+
+        except Exception as e:
+            CHAT_ERRORS.inc(**labels)
+            logger.error("Error in streaming chat service: {}", str(e))
             raise
+        finally:
+            CHAT_IN_FLIGHT.dec(**labels)
+            # Keep whatever was generated if the client went away mid-stream
+            if not completed and chunks:
+                self._add_message(conversation_id, "assistant", "".join(chunks), role, result)
+                logger.info("Stored partial streamed response for conversation {}", conversation_id)
+
+    async def process_batch(self, items: List[Dict[str, Any]]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Process a batch of chat requests through the LLM client's batch API.
+
+        Items are independent: each is stored in its own conversation and a
+        failing item produces an error result without affecting the others.
+        Results are yielded as they complete, tagged with the item's index.
+
+        Args:
+            items: Chat requests with "query" and optional "role" and "conversation_id"
+
+        Yields:
+            Tuples of item index and a result dict holding either "response" or "error"
+        """
+        logger.info("Processing chat batch of {} items", len(items))
+        provider = self._serving_provider()
+        CHAT_IN_FLIGHT.inc(len(items), endpoint="chat_batch", provider=provider)
+        try:
+            async for result in self._process_batch(items):
+                yield result
+        finally:
+            CHAT_IN_FLIGHT.dec(len(items), endpoint="chat_batch", provider=provider)
+        logger.info("Chat batch of {} items completed", len(items))
+
+    async def _process_batch(self, items: List[Dict[str, Any]]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Run a batch of chat requests; see process_batch."""
+        # Preparing may call the summarizer, so it gets the batch's concurrency
+        # limit too. A separate semaphore: the summarizer takes the global one.
+        limit = asyncio.Semaphore(self.batch_max_concurrency)
+
+        async def prepare(index: int, item: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+            role = item.get("role")
+            if role and not RolesService.is_valid_role(role):
+                raise ValueError(f"Invalid role: {role}")
+            existing = bool(item.get("conversation_id"))
+            conversation_id = item.get("conversation_id") or str(uuid4())
+            async with limit:
+                context = await self._prepare_context(item["query"], role, conversation_id, existing)
+            cache_key = None
+            cached = None
+            if self.response_cache.is_enabled_for(role):
+                cache_key = self._make_cache_key(item["query"], role, context)
+                cached = await self.response_cache.get(cache_key)
+            return index, {
+                "query": item["query"],
+                "role": role,
+                "conversation_id": conversation_id,
+                "context": context,
+                "cache_key": cache_key,
+                "cached": cached,
+            }
+
+        prepared = await asyncio.gather(
+            *(prepare(index, item) for index, item in enumerate(items)),
+            return_exceptions=True
+        )
+
+        def finish(state: Dict[str, Any],
+                   response_text: str,
+                   cache_hit: bool,
+                   result: Optional[LLMResult] = None) -> Dict[str, Any]:
+            self._add_message(state["conversation_id"], "assistant", response_text, state["role"], result)
+            response_data = self._build_response_data(
+                state["query"], response_text, state["conversation_id"], state["role"], state["context"], result
+            )
+            response_data["metadata"]["cache_hit"] = cache_hit
+            return {"response": response_data}
+
+        pending: List[Dict[str, Any]] = []
+        for index, outcome in enumerate(prepared):
+            if isinstance(outcome, Exception):
+                CHAT_ERRORS.inc(endpoint="chat_batch", role=items[index].get("role"), provider=self._serving_provider())
+                logger.warning("Batch item {} failed during preparation: {}", index, str(outcome))
+                yield index, {"error": str(outcome)}
+            elif outcome[1]["cached"] is not None:
+                yield index, finish(outcome[1], outcome[1]["cached"], True)
+            else:
+                pending.append(dict(outcome[1], index=index))
+
+        if not pending:
+            return
+
+        requests = [
+            {
+                "query": state["query"],
+                "role": state["role"],
+                "conversation_history": state["context"].history,
+                "summary": state["context"].summary,
+            }
+            for state in pending
+        ]
+        async for position, outcome in self.llm_service.abatch_generate(requests, self.batch_max_concurrency):
+            state = pending[position]
+            if isinstance(outcome, Exception):
+                CHAT_ERRORS.inc(endpoint="chat_batch", role=state["role"], provider=self._serving_provider())
+                logger.warning("Batch item {} failed: {}", state['index'], str(outcome))
+                yield state["index"], {"error": str(outcome)}
+                continue
+            if state["cache_key"] is not None:
+                await self.response_cache.set(
+                    self._make_cache_key(state["query"], state["role"], state["context"], outcome), outcome.text
+                )
+            yield state["index"], finish(state, outcome.text, False, outcome)
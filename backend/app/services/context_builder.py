@@ -0,0 +1,269 @@
+"""
+Context Builder - Assembles token-budgeted conversation context for the LLM.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.llm_service import LLMService
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Approximate per-message token overhead of the chat format
+MESSAGE_TOKEN_OVERHEAD = 4
+
+_encoding: Any = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when its encoding is available and falls back to a
+    four-characters-per-token estimate otherwise.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        The (approximate) number of tokens
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning("tiktoken unavailable, estimating token counts: {}", str(e))
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a piece of text down to at most a number of tokens.
+
+    Args:
+        text: The text to shorten
+        max_tokens: Maximum number of tokens to keep
+
+    Returns:
+        The text, or its leading part that fits in max_tokens
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max(max_tokens - 1, 0) * 4]
+
+
+class ContextWindow:
+    """The history, summary and token count selected for one LLM call."""
+
+    __slots__ = ("history", "summary", "tokens", "summarized_messages")
+
+    def __init__(self, history: List[Dict[str, str]], summary: Optional[str], tokens: int, summarized_messages: int):
+        self.history = history
+        self.summary = summary
+        self.tokens = tokens
+        self.summarized_messages = summarized_messages
+
+    def metadata(self) -> Dict[str, Any]:
+        """Describe the context window for response metadata."""
+        return {
+            "context_tokens": self.tokens,
+            "history_messages": len(self.history),
+            "summarized_messages": self.summarized_messages,
+        }
+
+
+class _Summary:
+    """Cached rolling summary and how many of the oldest messages it covers."""
+
+    __slots__ = ("text", "folded_count")
+
+    def __init__(self, text: str, folded_count: int):
+        self.text = text
+        self.folded_count = folded_count
+
+
+class _SummaryLock:
+    """Lock serializing a conversation's summary refreshes, with a count of the turns using it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class ContextBuilder:
+    """
+    Builds the conversation context sent to the LLM within a token budget.
+
+    The most recent turns are included verbatim. Older turns are folded into
+    a rolling summary that is cached per conversation and only extended with
+    messages that have dropped out of the window since the last update.
+    Concurrent turns of a conversation refresh its summary one at a time,
+    and a turn whose refresh fails goes ahead with the summary it has, if
+    any, and the verbatim window.
+    """
+
+    def __init__(self, llm_service: LLMService):
+        """
+        Initialize the context builder.
+
+        Args:
+            llm_service: The LLMService used to update summaries
+        """
+        self.llm_service = llm_service
+        self.max_tokens = settings.context_max_tokens
+        self.summary_enabled = settings.context_summary_enabled
+        self.summary_max_tokens = settings.context_summary_max_tokens
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._max_summaries = settings.conversation_max_count
+        self._summary_locks: Dict[str, _SummaryLock] = {}
+        logger.info("Context builder initialized with a {} token budget", self.max_tokens)
+
+    def _get_summary(self, conversation_id: str) -> Optional[_Summary]:
+        """Get the cached summary for a conversation and mark it as recently used."""
+        summary = self._summaries.get(conversation_id)
+        if summary is not None:
+            self._summaries.move_to_end(conversation_id)
+        return summary
+
+    def _set_summary(self, conversation_id: str, summary: _Summary) -> None:
+        """Cache a summary, evicting the least recently used one when full."""
+        self._summaries[conversation_id] = summary
+        self._summaries.move_to_end(conversation_id)
+        while len(self._summaries) > self._max_summaries:
+            self._summaries.popitem(last=False)
+
+    async def _update_summary(self,
+                              conversation_id: str,
+                              older: List[Dict[str, str]],
+                              offset: int) -> Optional[_Summary]:
+        """
+        Bring the rolling summary up to date with the messages outside the window.
+
+        Args:
+            conversation_id: The ID of the conversation
+            older: Messages that no longer fit in the verbatim window, oldest first
+            offset: Number of messages trimmed from the conversation before older[0]
+
+        Returns:
+            The up-to-date summary, or None if there is nothing to summarize
+        """
+        end = offset + len(older)
+        cached = self._get_summary(conversation_id)
+        if cached is not None and cached.folded_count >= end:
+            return cached
+
+        lock = self._summary_locks.get(conversation_id)
+        if lock is None:
+            lock = self._summary_locks[conversation_id] = _SummaryLock()
+        lock.users += 1
+        try:
+            async with lock.lock:
+                return await self._refresh_summary(conversation_id, older, offset)
+        finally:
+            lock.users -= 1
+            if not lock.users:
+                del self._summary_locks[conversation_id]
+
+    async def _refresh_summary(self,
+                               conversation_id: str,
+                               older: List[Dict[str, str]],
+                               offset: int) -> Optional[_Summary]:
+        """Fold the messages not yet in the summary into it; called under the conversation's lock."""
+        # Another turn may have brought the summary up to date while this one waited
+        cached = self._get_summary(conversation_id)
+        end = offset + len(older)
+        if cached is not None and cached.folded_count >= end:
+            return cached
+
+        # Only fold what came after the messages already in the summary. If those
+        # have since been trimmed from the store, everything left is newer.
+        start = max((cached.folded_count if cached else 0) - offset, 0)
+        new_messages = older[start:]
+        if not new_messages:
+            return cached
+
+        try:
+            text = await self.llm_service.asummarize(
+                new_messages, cached.text if cached else None, max_tokens=self.summary_max_tokens
+            )
+        except Exception as e:
+            logger.warning("Could not update the summary for conversation {}, using the previous one: {}",
+                           conversation_id, repr(e))
+            return cached
+        # The model is asked to stay within the limit; the cut enforces it
+        summary = _Summary(truncate_tokens(text, self.summary_max_tokens), end)
+        self._set_summary(conversation_id, summary)
+        logger.info("Folded {} messages into the summary for conversation {}", len(new_messages), conversation_id)
+        return summary
+
+    async def build(self,
+                    conversation_id: str,
+                    history: Optional[List[Dict[str, str]]],
+                    query: str,
+                    role: Optional[str] = None,
+                    offset: int = 0) -> ContextWindow:
+        """
+        Select the context for a request within the token budget.
+
+        Args:
+            conversation_id: The ID of the conversation
+            history: Previous messages in the conversation, excluding the current query
+            query: The user's current query
+            role: Optional role used for the system prompt
+            offset: Number of messages already trimmed from the front of the history
+
+        Returns:
+            ContextWindow with the verbatim history, optional summary and token count
+        """
+        history = history or []
+        # The query and the system prompt are always sent, so the history gets what is left
+        tokens = count_tokens(query) + MESSAGE_TOKEN_OVERHEAD
+        system_prompt = self.llm_service.get_system_prompt(role)
+        if system_prompt:
+            tokens += count_tokens(system_prompt) + MESSAGE_TOKEN_OVERHEAD
+        budget = self.max_tokens - tokens
+        summary_reserve = (
+            self.summary_max_tokens
+            + count_tokens(self.llm_service.prompts.render("summary_context", summary=""))
+            + MESSAGE_TOKEN_OVERHEAD
+        )
+
+        # Keep room for the summary only when something will be summarized
+        used = 0
+        start = len(history)
+        for index in range(len(history) - 1, -1, -1):
+            cost = count_tokens(history[index]["content"]) + MESSAGE_TOKEN_OVERHEAD
+            reserve = summary_reserve if self.summary_enabled and index > 0 else 0
+            if used + cost + reserve > budget:
+                break
+            used += cost
+            start = index
+
+        recent = history[start:]
+        older = history[:start]
+        summary_text = None
+        summarized = 0
+        if older and self.summary_enabled:
+            summary = await self._update_summary(conversation_id, older, offset)
+            if summary is not None:
+                summary_text = summary.text
+                summarized = summary.folded_count
+                tokens += (
+                    count_tokens(self.llm_service.prompts.render("summary_context", summary=summary_text))
+                    + MESSAGE_TOKEN_OVERHEAD
+                )
+        elif older:
+            logger.debug("Dropped {} messages outside the context window for {}", len(older), conversation_id)
+
+        return ContextWindow(recent, summary_text, tokens + used, summarized)
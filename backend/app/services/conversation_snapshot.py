@@ -0,0 +1,350 @@
+"""
+Conversation Snapshot - Snapshots and journal that let the in-memory conversation store survive restarts.
+"""
+import asyncio
+import marshal
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List, Optional
+from app.config import settings
+from app.utils.logging_utils import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+if TYPE_CHECKING:
+    from app.services.conversation_store import ConversationStore, StoredMessage
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# File signatures; the trailing digit is the format version
+SNAPSHOT_MAGIC = b"CVSNAP1\n"
+JOURNAL_MAGIC = b"CVJRNL1\n"
+
+# Every record is framed as payload length and CRC-32, then the marshalled payload
+_FRAME = struct.Struct("<II")
+_MARSHAL_VERSION = 4
+
+SNAPSHOT_FILE = "snapshot.bin"
+LOCK_FILE = "lock"
+_JOURNAL_NAME = re.compile(r"^journal\.(\d+)\.log$")
+
+
+def _journal_name(generation: int) -> str:
+    return f"journal.{generation:08d}.log"
+
+
+def _frame(payload: Any) -> bytes:
+    """Encode one record."""
+    data = marshal.dumps(payload, _MARSHAL_VERSION)
+    return _FRAME.pack(len(data), zlib.crc32(data)) + data
+
+
+def _read_records(path: Path, magic: bytes) -> Iterator[Any]:
+    """
+    Decode the records of a snapshot or journal file.
+
+    Reading stops at the first incomplete or corrupt record, which is
+    where a crash cut off the last write.
+
+    Args:
+        path: The file to read
+        magic: Signature the file must start with
+
+    Yields:
+        The decoded records
+
+    Raises:
+        ValueError: If the file does not start with the signature
+    """
+    with open(path, "rb") as file:
+        if file.read(len(magic)) != magic:
+            raise ValueError(f"Not a conversation store file: {path}")
+        while True:
+            header = file.read(_FRAME.size)
+            if not header:
+                return
+            if len(header) == _FRAME.size:
+                length, checksum = _FRAME.unpack(header)
+                data = file.read(length)
+                if len(data) == length and zlib.crc32(data) == checksum:
+                    yield marshal.loads(data)
+                    continue
+            logger.warning("Ignoring truncated or corrupt record at offset {} of {}", file.tell(), path)
+            return
+
+
+class ConversationPersistence:
+    """
+    Snapshots and an append-only journal for the in-memory conversation store.
+
+    Every added message is appended to the current journal segment; the
+    buffer is flushed to the file once per flush interval. Periodically the
+    journal is rotated to a new segment and every conversation is copied
+    out and written to a new snapshot on a worker thread. The copy is taken
+    one conversation at a time under that conversation's lock, so requests
+    keep being served while it runs, and the snapshot replaces the previous
+    one atomically. Segments older than the snapshot are then deleted.
+
+    Journal entries carry the conversation's epoch and sequence number, so
+    messages added while a snapshot is being taken may appear both in the
+    snapshot and in the new segment and are applied once on restore. On
+    startup the store is rebuilt from the snapshot plus the later segments.
+    A lock file keeps a second worker process from sharing the directory;
+    that worker runs without persistence (use the sqlite backend to share
+    conversations between workers).
+    """
+
+    def __init__(self, store: "ConversationStore", directory: Optional[str] = None):
+        """
+        Initialize persistence for a store.
+
+        Args:
+            store: The conversation store to snapshot and restore
+            directory: Directory for the snapshot and journal, defaults to the configured one
+        """
+        self.store = store
+        self.directory = Path(directory or settings.conversation_snapshot_dir)
+        self.snapshot_interval = settings.conversation_snapshot_interval_seconds
+        self.flush_interval = settings.conversation_journal_flush_interval_seconds
+        self.generation = 0
+        self._journal: Optional[BinaryIO] = None
+        self._journal_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._lock_file: Optional[BinaryIO] = None
+        self._task: Optional[asyncio.Task] = None
+        self.journal_records = 0
+        self.stats: Dict[str, Any] = {
+            "restored_conversations": 0,
+            "replayed_messages": 0,
+            "restore_seconds": 0.0,
+            "snapshots": 0,
+            "last_snapshot_conversations": 0,
+            "last_snapshot_bytes": 0,
+            "last_snapshot_seconds": 0.0,
+            "last_snapshot_at": None,
+        }
+
+    def _acquire_directory(self) -> bool:
+        """Create the directory and take its lock; False if another process holds it."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            return True
+        lock_file = open(self.directory / LOCK_FILE, "ab")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _journal_generations(self) -> List[int]:
+        """Generations of the journal segments on disk, oldest first."""
+        return sorted(
+            int(match.group(1))
+            for match in map(_JOURNAL_NAME.match, os.listdir(self.directory)) if match
+        )
+
+    def load(self) -> None:
+        """
+        Restore the store from the latest snapshot and the journal written after it.
+
+        Then open a new journal segment for this process's writes.
+        """
+        started = time.perf_counter()
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        first_generation = 0
+        snapshot: List[Any] = []
+        if snapshot_path.exists():
+            try:
+                records = _read_records(snapshot_path, SNAPSHOT_MAGIC)
+                header = next(records, None)
+                if header is not None:
+                    first_generation = header["generation"]
+                    snapshot = list(records)
+            except Exception as e:
+                logger.error("Error reading conversation snapshot {}, replaying the journal only: {}", snapshot_path, str(e))
+                first_generation, snapshot = 0, []
+
+        generations = self._journal_generations()
+
+        def journal() -> Iterator[Any]:
+            for generation in generations:
+                if generation >= first_generation:
+                    try:
+                        yield from _read_records(self.directory / _journal_name(generation), JOURNAL_MAGIC)
+                    except ValueError as e:
+                        logger.error("Skipping journal segment: {}", str(e))
+
+        replayed = self.store.restore(snapshot, journal())
+        self.stats["restored_conversations"] = len(snapshot)
+        self.stats["replayed_messages"] = replayed
+        self.stats["restore_seconds"] = time.perf_counter() - started
+        # Replayed entries count as unsnapshotted, so the next snapshot compacts their segments
+        self.journal_records = replayed
+
+        # Never append to a segment a crash may have cut off mid-record
+        self.generation = max(generations + [first_generation]) + 1
+        self._open_journal()
+        logger.info(
+            "Restored {} conversations and replayed {} journaled messages from {} in {:.1f}ms",
+            len(snapshot), replayed, self.directory, self.stats["restore_seconds"] * 1000,
+        )
+
+    def _open_journal(self) -> None:
+        """Start the journal segment of the current generation. Caller must hold the journal lock or be starting up."""
+        self._journal = open(self.directory / _journal_name(self.generation), "ab", buffering=1 << 16)
+        if self._journal.tell() == 0:
+            self._journal.write(JOURNAL_MAGIC)
+
+    def record(self, conversation_id: str, epoch: int, seq: int, message: "StoredMessage") -> None:
+        """
+        Journal a message that was added to the store.
+
+        Args:
+            conversation_id: The ID of the conversation
+            epoch: The conversation's epoch
+            seq: The message's sequence number in the conversation
+            message: The added message
+        """
+        frame = _frame((conversation_id, epoch, seq, message.role, message.content, message.timestamp))
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.write(frame)
+                self.journal_records += 1
+
+    def flush(self) -> None:
+        """Write the buffered journal entries to the file."""
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.flush()
+
+    def _rotate(self) -> int:
+        """Switch new journal entries to a fresh segment and return its generation."""
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+            self.generation += 1
+            self.journal_records = 0
+            self._open_journal()
+            return self.generation
+
+    def snapshot(self) -> None:
+        """
+        Write a snapshot of the store and drop the journal segments it covers.
+
+        Runs on a worker thread; only one snapshot is written at a time.
+        """
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            # Entries from here on go to the new segment, which the snapshot does not cover
+            generation = self._rotate()
+            path = self.directory / SNAPSHOT_FILE
+            temporary = path.with_name(SNAPSHOT_FILE + ".tmp")
+            conversations = 0
+            with open(temporary, "wb", buffering=1 << 20) as file:
+                file.write(SNAPSHOT_MAGIC)
+                file.write(_frame({"generation": generation, "created_at": time.time()}))
+                for record in self.store.capture():
+                    file.write(_frame(record))
+                    conversations += 1
+                file.flush()
+                os.fsync(file.fileno())
+                size = file.tell()
+            os.replace(temporary, path)
+            for old in self._journal_generations():
+                if old < generation:
+                    (self.directory / _journal_name(old)).unlink(missing_ok=True)
+
+            elapsed = time.perf_counter() - started
+            self.stats.update(
+                snapshots=self.stats["snapshots"] + 1,
+                last_snapshot_conversations=conversations,
+                last_snapshot_bytes=size,
+                last_snapshot_seconds=elapsed,
+                last_snapshot_at=time.time(),
+            )
+            logger.info(
+                "Wrote conversation snapshot of {} conversations ({} bytes) in {:.1f}ms",
+                conversations, size, elapsed * 1000,
+            )
+
+    async def start(self) -> bool:
+        """
+        Restore the store and start the periodic flush and snapshot loop.
+
+        Returns:
+            False if another process already uses the directory and persistence is disabled
+        """
+        if not await asyncio.to_thread(self._acquire_directory):
+            logger.warning(
+                "Conversation snapshot directory {} is in use by another process; "
+                "this worker keeps conversations in memory only", self.directory,
+            )
+            return False
+        await asyncio.to_thread(self.load)
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def _run(self) -> None:
+        """Flush the journal every flush interval and snapshot every snapshot interval."""
+        last_snapshot = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if self.journal_records and time.monotonic() - last_snapshot >= self.snapshot_interval:
+                    last_snapshot = time.monotonic()
+                    await asyncio.to_thread(self.snapshot)
+            except Exception as e:
+                logger.error("Error persisting conversation store: {}", str(e))
+
+    async def close(self) -> None:
+        """Stop the loop, write a final snapshot and release the directory."""
+        if self._task is not None:
+            loop = self._task.get_loop()
+            if loop is asyncio.get_running_loop():
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+            else:
+                # The store is shared, so another app instance on another loop may have started it
+                loop.call_soon_threadsafe(self._task.cancel)
+            self._task = None
+        try:
+            if self.journal_records:
+                await asyncio.to_thread(self.snapshot)
+        except Exception as e:
+            logger.error("Error writing final conversation snapshot, keeping the journal: {}", str(e))
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get snapshot and journal statistics.
+
+        Returns:
+            Dictionary with restore and snapshot counters and the current journal segment
+        """
+        return dict(
+            self.stats,
+            directory=str(self.directory),
+            journal_generation=self.generation,
+            journal_records=self.journal_records,
+        )
@@ -1,17 +1,96 @@
 """
 Conversation Store - Manages conversation history persistence.
 """
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import bisect
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Any, Tuple
+from datetime import datetime, timezone
+import sys
 import threading
+import time
+from app.config import settings
 from app.utils.logging_utils import get_logger
 
+if TYPE_CHECKING:
+    from app.services.conversation_snapshot import ConversationPersistence
+
 # Get module-specific logger
 logger = get_logger(__name__)
 
+
+class StoredMessage:
+    """Compact record for a single conversation message."""
+
+    __slots__ = ("role", "content", "timestamp")
+
+    def __init__(self, role: str, content: str, timestamp: float):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+
+    @property
+    def size(self) -> int:
+        """Approximate memory footprint of the message in bytes."""
+        return _MESSAGE_OVERHEAD + sys.getsizeof(self.content)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the message to the API representation."""
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.timestamp, tz=timezone.utc).isoformat()
+        }
+
+
+def message_timestamp() -> float:
+    """
+    Get the current time as a message timestamp.
+
+    Timestamps are whole microseconds, the precision of the ISO 8601 form
+    clients receive, so a timestamp sent back as `since` parses to exactly
+    the stored value.
+    """
+    return round(time.time(), 6)
+
+
+# Fixed per-message cost: the slotted object plus its float timestamp
+_MESSAGE_OVERHEAD = sys.getsizeof(StoredMessage("", "", 0.0)) + sys.getsizeof(0.0)
+
+
+class _Conversation:
+    """
+    Messages of one conversation with their own lock and size accounting.
+
+    `appended` counts every message ever added and doubles as the
+    conversation's version: it changes on every write and never goes back.
+    `epoch` identifies this in-memory instance, so a conversation that is
+    evicted and reloaded never reuses a version of its earlier instance.
+    """
+
+    __slots__ = ("messages", "lock", "last_access", "size", "evicted", "appended", "epoch")
+
+    def __init__(self, now: float):
+        self.messages: List[StoredMessage] = []
+        self.appended = 0
+        self.epoch = int(now * 1_000_000)
+        self.lock = threading.Lock()
+        self.last_access = now
+        self.size = 0
+        self.evicted = False
+
+
 class ConversationStore:
     """
-    Simple in-memory store for conversation history.
+    Memory-bounded in-memory store for conversation history.
+
+    Conversations are kept in least-recently-used order and evicted when the
+    store exceeds its conversation count or byte budget, or when they have
+    been idle for longer than the configured TTL. Each conversation keeps at
+    most a fixed number of messages, dropping the oldest first.
+
+    With snapshots enabled, start() restores the store from the latest
+    snapshot and journal on disk and new messages are journaled, so a
+    restarted worker keeps its conversations.
 
     In a production environment, this would be replaced with a proper database.
     """
@@ -19,19 +98,121 @@ class ConversationStore:
     _lock = threading.Lock()
 
     # Properly define the conversations attribute as a class attribute
-    conversations: Dict[str, List[Dict[str, Any]]] = {}
+    conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
 
     def __new__(cls):
         """Singleton pattern to ensure only one conversation store exists."""
         with cls._lock:
             if cls._instance is None:
-                cls._instance = super(ConversationStore, cls).__new__(cls)
-                # Initialize the conversations dictionary
-                cls._instance.conversations = {}
+                instance = super(ConversationStore, cls).__new__(cls)
+                # Initialize the conversations dictionary and limits
+                instance.conversations = OrderedDict()
+                instance.max_conversations = settings.conversation_max_count
+                instance.max_messages = settings.conversation_max_messages
+                instance.max_bytes = settings.conversation_max_bytes
+                instance.idle_ttl = settings.conversation_idle_ttl_seconds
+                instance.total_bytes = 0
+                instance.evictions = {"lru": 0, "ttl": 0, "bytes": 0, "trimmed_messages": 0}
+                instance._store_lock = threading.RLock()
+                instance.persistence = None
+                cls._instance = instance
                 logger.info("Conversation store initialized")
             return cls._instance
 
-    def add_message(self, conversation_id: str, role: str, content: str) -> None:
+    def _remove(self, conversation_id: str, reason: Optional[str]) -> None:
+        """Remove a conversation and record why, if evicted. Caller must hold the store lock."""
+        conversation = self.conversations.pop(conversation_id)
+        conversation.evicted = True
+        self.total_bytes -= conversation.size
+        if reason is not None:
+            self.evictions[reason] += 1
+
+    def _evict(self, now: float) -> None:
+        """
+        Evict idle, least-recently-used and over-budget conversations.
+
+        The dict is ordered by last access, so expired entries are always at
+        the front and the sweep stops at the first live conversation.
+        Caller must hold the store lock.
+        """
+        while self.conversations:
+            oldest_id, oldest = next(iter(self.conversations.items()))
+            if now - oldest.last_access > self.idle_ttl:
+                self._remove(oldest_id, "ttl")
+            elif len(self.conversations) > self.max_conversations:
+                self._remove(oldest_id, "lru")
+            elif self.total_bytes > self.max_bytes and len(self.conversations) > 1:
+                self._remove(oldest_id, "bytes")
+            else:
+                break
+
+    def _touch(self, conversation_id: str, create: bool = False) -> Optional[_Conversation]:
+        """
+        Look up a conversation and mark it as recently used.
+
+        Args:
+            conversation_id: The ID of the conversation
+            create: Whether to create the conversation if it does not exist
+
+        Returns:
+            The conversation, or None if it does not exist (or has expired)
+        """
+        now = time.time()
+        with self._store_lock:
+            conversation = self.conversations.get(conversation_id)
+            if conversation is not None and now - conversation.last_access > self.idle_ttl:
+                self._remove(conversation_id, "ttl")
+                conversation = None
+            if conversation is None:
+                if not create:
+                    return None
+                conversation = _Conversation(now)
+                self.conversations[conversation_id] = conversation
+            else:
+                conversation.last_access = now
+                self.conversations.move_to_end(conversation_id)
+            return conversation
+
+    def _append(self, conversation_id: str, new_messages: List[StoredMessage]) -> Tuple[int, int]:
+        """
+        Append messages to a conversation, trimming and evicting as needed.
+
+        Args:
+            conversation_id: The ID of the conversation
+            new_messages: Messages to append, oldest first
+
+        Returns:
+            The conversation's epoch and its number of messages ever appended, after the append
+        """
+        while True:
+            conversation = self._touch(conversation_id, create=True)
+            with conversation.lock:
+                # Evicted between the lookup and the lock: appending would
+                # lose the messages, so look the conversation up again
+                if conversation.evicted:
+                    continue
+                conversation.messages.extend(new_messages)
+                conversation.appended += len(new_messages)
+                version = (conversation.epoch, conversation.appended)
+                delta = sum(message.size for message in new_messages)
+                trimmed = len(conversation.messages) - self.max_messages
+                if trimmed > 0:
+                    delta -= sum(m.size for m in conversation.messages[:trimmed])
+                    del conversation.messages[:trimmed]
+                break
+
+        # Size accounting happens under the store lock so it stays consistent
+        # with concurrent evictions of this conversation
+        with self._store_lock:
+            if not conversation.evicted:
+                conversation.size += delta
+                self.total_bytes += delta
+            if trimmed > 0:
+                self.evictions["trimmed_messages"] += trimmed
+            self._evict(time.time())
+        return version
+
+    def add_message(self, conversation_id: str, role: str, content: str) -> Tuple[int, int, float]:
         """
         Add a message to a conversation's history.
 
@@ -39,17 +220,146 @@ class ConversationStore:
             conversation_id: The ID of the conversation
             role: The role of the message sender ("user" or "assistant")
             content: The message content
+
+        Returns:
+            The conversation's epoch, the message's sequence number and its timestamp
         """
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = []
+        message = StoredMessage(sys.intern(role), content, message_timestamp())
+        epoch, seq = self._append(conversation_id, [message])
+        if self.persistence is not None:
+            self.persistence.record(conversation_id, epoch, seq, message)
+        logger.debug("Added message to conversation {}", conversation_id)
+        return epoch, seq, message.timestamp
 
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.conversations[conversation_id].append(message)
-        logger.debug(f"Added message to conversation {conversation_id}")
+    def restore_conversation(self,
+                             conversation_id: str,
+                             messages: List[Tuple[str, str, float]],
+                             epoch: Optional[int] = None,
+                             appended: Optional[int] = None) -> None:
+        """
+        Load previously persisted messages into the store.
+
+        When the persisted epoch and message count are given the conversation
+        keeps them, so versions and cursors handed out before it was evicted
+        or the worker restarted stay valid. Otherwise the messages are added
+        as new ones.
+
+        Args:
+            conversation_id: The ID of the conversation
+            messages: (role, content, timestamp) tuples, oldest first
+            epoch: Optional epoch of the persisted conversation
+            appended: Optional number of messages ever added, i.e. the sequence number of the last one
+        """
+        if epoch is None or appended is None:
+            self._append(
+                conversation_id,
+                [StoredMessage(sys.intern(role), content, timestamp) for role, content, timestamp in messages]
+            )
+        else:
+            now = time.time()
+            with self._store_lock:
+                conversation = self._insert(conversation_id, epoch, max(appended, len(messages)), now)
+                self._extend(conversation, messages)
+                self._evict(now)
+        logger.debug("Restored {} messages for conversation {}", len(messages), conversation_id)
+
+    def capture(self) -> Iterator[Tuple[str, int, int, float, List[Tuple[str, str, float]]]]:
+        """
+        Copy out every conversation, one at a time, for a snapshot.
+
+        Each conversation is copied under its own lock only, so requests
+        are never blocked for more than one conversation's copy. Messages
+        are immutable, so the copy is of references and timestamps.
+
+        Yields:
+            (conversation_id, epoch, appended, last_access, messages) in least-recently-used order,
+            with messages as (role, content, timestamp) tuples
+        """
+        with self._store_lock:
+            items = list(self.conversations.items())
+        for conversation_id, conversation in items:
+            with conversation.lock:
+                if conversation.evicted:
+                    continue
+                record = (
+                    conversation_id,
+                    conversation.epoch,
+                    conversation.appended,
+                    conversation.last_access,
+                    [(message.role, message.content, message.timestamp) for message in conversation.messages],
+                )
+            yield record
+
+    def _insert(self, conversation_id: str, epoch: int, appended: int, last_access: float) -> _Conversation:
+        """Insert an empty restored conversation, replacing any other instance. Caller must hold the store lock."""
+        if conversation_id in self.conversations:
+            self._remove(conversation_id, None)
+        conversation = _Conversation(last_access)
+        conversation.epoch = epoch
+        conversation.appended = appended
+        self.conversations[conversation_id] = conversation
+        return conversation
+
+    def _extend(self, conversation: _Conversation, messages: Iterable[Tuple[str, str, float]]) -> None:
+        """Add restored messages to a conversation without counting them as new. Caller must hold the store lock."""
+        restored = [StoredMessage(sys.intern(role), content, timestamp) for role, content, timestamp in messages]
+        conversation.messages.extend(restored)
+        delta = sum(message.size for message in restored)
+        trimmed = len(conversation.messages) - self.max_messages
+        if trimmed > 0:
+            delta -= sum(message.size for message in conversation.messages[:trimmed])
+            del conversation.messages[:trimmed]
+        conversation.size += delta
+        self.total_bytes += delta
+
+    def restore(self,
+                snapshot: Iterable[Tuple[str, int, int, float, List[Tuple[str, str, float]]]],
+                journal: Iterable[Tuple[str, int, int, str, str, float]]) -> int:
+        """
+        Rebuild conversations from a snapshot and the journal written after it.
+
+        Conversations keep their epoch and message count, so versions and
+        cursors handed out before a restart stay valid. Journal entries the
+        snapshot already holds are skipped; an entry with a different epoch
+        means the conversation was evicted and started again, so it replaces
+        the snapshot's copy. Call before the store serves requests.
+
+        Args:
+            snapshot: Conversations as yielded by capture()
+            journal: (conversation_id, epoch, seq, role, content, timestamp) entries, oldest first
+
+        Returns:
+            Number of journal entries applied
+        """
+        applied = 0
+        with self._store_lock:
+            for conversation_id, epoch, appended, last_access, messages in snapshot:
+                self._extend(self._insert(conversation_id, epoch, appended, last_access), messages)
+            for conversation_id, epoch, seq, role, content, timestamp in journal:
+                conversation = self.conversations.get(conversation_id)
+                if conversation is None or conversation.epoch != epoch:
+                    conversation = self._insert(conversation_id, epoch, seq - 1, timestamp)
+                elif seq <= conversation.appended:
+                    continue
+                self._extend(conversation, [(role, content, timestamp)])
+                conversation.appended = seq
+                conversation.last_access = max(conversation.last_access, timestamp)
+                self.conversations.move_to_end(conversation_id)
+                applied += 1
+            self._evict(time.time())
+        return applied
+
+    def has_conversation(self, conversation_id: str) -> bool:
+        """
+        Check whether a conversation is currently held in the store.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            True if the conversation exists and has not expired
+        """
+        return self._touch(conversation_id) is not None
 
     def get_conversation(self, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
         """
@@ -61,7 +371,68 @@ class ConversationStore:
         Returns:
             List of messages in the conversation, or None if not found
         """
-        return self.conversations.get(conversation_id)
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            return None
+        with conversation.lock:
+            return [message.to_dict() for message in conversation.messages]
+
+    def get_version(self, conversation_id: str) -> Optional[str]:
+        """
+        Get a version tag that changes whenever the conversation changes.
+
+        Checking the version is cheap, so unchanged polls can be answered
+        without reading or serializing any messages.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            The version tag, or None if not found
+        """
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            return None
+        with conversation.lock:
+            return f"{conversation.epoch:x}-{conversation.appended}"
+
+    def get_conversation_page(self,
+                              conversation_id: str,
+                              cursor: Optional[int] = None,
+                              since: Optional[float] = None,
+                              limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a page of a conversation's messages.
+
+        Messages are addressed by a stable sequence number (their position
+        counting trimmed messages), so a client can pass back next_cursor to
+        receive only messages added since its last read.
+
+        Args:
+            conversation_id: The ID of the conversation
+            cursor: Optional sequence number of the first message to return
+            since: Optional Unix timestamp; only messages after it are returned
+            limit: Optional maximum number of messages to return
+
+        Returns:
+            Dict with "messages", "version", "next_cursor" and "has_more", or None if not found
+        """
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            return None
+        with conversation.lock:
+            messages = conversation.messages
+            offset = conversation.appended - len(messages)
+            start = max((cursor or 0) - offset, 0)
+            if since is not None:
+                start = max(start, bisect.bisect_right(messages, since, key=lambda message: message.timestamp))
+            end = len(messages) if limit is None else min(len(messages), start + limit)
+            return {
+                "messages": [message.to_dict() for message in messages[start:end]],
+                "version": f"{conversation.epoch:x}-{conversation.appended}",
+                "next_cursor": offset + max(end, start),
+                "has_more": end < len(messages),
+            }
 
     def get_conversation_messages_for_llm(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
         """
@@ -74,18 +445,93 @@ class ConversationStore:
         Returns:
             List of simplified messages or None if not found
         """
-        messages = self.get_conversation(conversation_id)
-        if not messages:
+        conversation = self._touch(conversation_id)
+        if conversation is None:
             return None
 
         # Return just the role and content for the LLM
-        return [{"role": msg["role"], "content": msg["content"]} for msg in messages]
+        with conversation.lock:
+            if not conversation.messages:
+                return None
+            return [{"role": msg.role, "content": msg.content} for msg in conversation.messages]
+
+    def get_message_offset(self, conversation_id: str) -> int:
+        """
+        Get how many of a conversation's oldest messages have been trimmed.
+
+        Adding the offset to a position in the current message list gives a
+        stable index that does not shift when older messages are dropped.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            Number of messages trimmed from the front, or 0 if not found
+        """
+        conversation = self._touch(conversation_id)
+        if conversation is None:
+            return 0
+        with conversation.lock:
+            return conversation.appended - len(conversation.messages)
 
     def get_all_conversations(self) -> Dict[str, List[Dict[str, Any]]]:
         """
         Get all stored conversations.
 
         Returns:
-            Dictionary of all conversations
+            Dictionary of all conversations, as copies of their messages
+        """
+        with self._store_lock:
+            items = list(self.conversations.items())
+        result = {}
+        for conversation_id, conversation in items:
+            with conversation.lock:
+                result[conversation_id] = [message.to_dict() for message in conversation.messages]
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get store size and eviction counters, for sizing the configured limits.
+
+        Returns:
+            Dictionary with current usage, limits and eviction counts
         """
-        return self.conversations
+        with self._store_lock:
+            self._evict(time.time())
+            return {
+                "conversations": len(self.conversations),
+                "total_bytes": self.total_bytes,
+                "limits": {
+                    "max_conversations": self.max_conversations,
+                    "max_messages": self.max_messages,
+                    "max_bytes": self.max_bytes,
+                    "idle_ttl_seconds": self.idle_ttl,
+                },
+                "evictions": dict(self.evictions),
+                **({"persistence": self.persistence.get_stats()} if self.persistence is not None else {}),
+            }
+
+    async def start(self) -> None:
+        """Restore the store from disk and start periodic snapshots, when enabled."""
+        if settings.conversation_snapshot_enabled and self.persistence is None:
+            from app.services.conversation_snapshot import ConversationPersistence
+            persistence = ConversationPersistence(self)
+            if await persistence.start():
+                self.persistence = persistence
+
+    async def ensure_loaded(self, conversation_id: str) -> None:
+        """
+        Make sure a conversation is available for synchronous reads.
+
+        The in-memory store holds everything it knows about, so this is a
+        no-op; persistent backends load cold conversations here.
+
+        Args:
+            conversation_id: The ID of the conversation
+        """
+
+    async def close(self) -> None:
+        """Write a final snapshot, when enabled, so the next start has no journal to replay."""
+        if self.persistence is not None:
+            await self.persistence.close()
+            self.persistence = None
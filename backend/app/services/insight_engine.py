@@ -0,0 +1,699 @@
+"""
+Insight Engine - Summarizes query results with mergeable streaming aggregates.
+"""
+from hashlib import blake2b
+import heapq
+import math
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+from app.services.result_store import INT64_MAX, INT64_MIN, ColumnBuilder, ColumnarResult, build_result
+from app.services.sql_executor import RowChunk
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Column kinds summarized with numeric statistics and correlations
+NUMERIC_KINDS = ("int", "float")
+
+# NumPy dtype of each fixed-width column kind's value buffer
+DTYPES = {"int": np.int64, "float": np.float64, "bool": np.int8}
+
+# Hashes are unsigned 64-bit values, mapped onto [0, 1) for the distinct-count sketch
+HASH_BYTES = 8
+HASH_SPACE = float(1 << (8 * HASH_BYTES))
+
+# splitmix64 increment and finalizer multipliers, used to hash numeric values
+MIX_INCREMENT = np.uint64(0x9E3779B97F4A7C15)
+MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+# Label of the group that collects the smallest groups once max_groups is reached
+OTHER_GROUP = "(other)"
+
+
+def _as_float(column: Any) -> Any:
+    """Convert an exact decimal column to floats, which the statistics are computed in."""
+    builder = ColumnBuilder(column.name)
+    builder.extend([float(value) if value is not None else None for value in column.to_list()])
+    return builder.finish()
+
+
+def _array(column: Any) -> np.ndarray:
+    """View a fixed-width column's value buffer as an array, without copying."""
+    return np.frombuffer(column.values(), dtype=DTYPES[column.kind])
+
+
+def _valid(column: Any) -> Optional[np.ndarray]:
+    """A column's validity buffer as a boolean array, or None if it has no nulls."""
+    return np.frombuffer(column.validity, dtype=np.bool_) if column.validity is not None else None
+
+
+def _present(column: Any) -> np.ndarray:
+    """The non-null values of a fixed-width column."""
+    values, valid = _array(column), _valid(column)
+    return values if valid is None else values[valid]
+
+
+class NumericStats:
+    """Count, mean, variance, min and max of a numeric column, mergeable across chunks."""
+
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    def update(self, values: Sequence[float]) -> None:
+        """Add a batch of non-null values."""
+        values = np.asarray(values)
+        if not values.size:
+            return
+        batch = NumericStats()
+        batch.count = int(values.size)
+        batch.total = float(np.sum(values, dtype=np.float64))
+        batch.mean = batch.total / batch.count
+        deviations = values - batch.mean
+        batch.m2 = float(np.dot(deviations, deviations))
+        batch.minimum = values.min().item()
+        batch.maximum = values.max().item()
+        self.merge(batch)
+
+    def merge(self, other: "NumericStats") -> None:
+        """Combine another column's statistics into these (parallel variance formula)."""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2, self.total = other.count, other.mean, other.m2, other.total
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.total += other.total
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def summary(self) -> Dict[str, Any]:
+        """Get the statistics as rounded values."""
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return {
+            "mean": _round(self.mean),
+            "std": _round(std),
+            "min": _round(self.minimum),
+            "max": _round(self.maximum),
+            "sum": _round(self.total),
+        }
+
+
+def _grouped_stats(values: np.ndarray, codes: np.ndarray, size: int) -> List[NumericStats]:
+    """
+    Statistics of values split into groups, computed for every group at once.
+
+    Args:
+        values: Non-null values of a numeric column
+        codes: Group number of each value
+        size: Number of groups
+
+    Returns:
+        One NumericStats per group number
+    """
+    counts = np.bincount(codes, minlength=size)
+    totals = np.bincount(codes, weights=values, minlength=size)
+    means = np.divide(totals, counts, out=np.zeros(size), where=counts > 0)
+    deviations = values - means[codes]
+    m2 = np.bincount(codes, weights=deviations * deviations, minlength=size)
+    if values.dtype.kind == "f":
+        lowest, highest = np.inf, -np.inf
+    else:
+        limits = np.iinfo(values.dtype)
+        lowest, highest = limits.max, limits.min
+    minimum = np.full(size, lowest, dtype=values.dtype)
+    maximum = np.full(size, highest, dtype=values.dtype)
+    np.minimum.at(minimum, codes, values)
+    np.maximum.at(maximum, codes, values)
+    groups = []
+    for count, total, mean, m2_value, low, high in zip(
+            counts.tolist(), totals.tolist(), means.tolist(), m2.tolist(), minimum.tolist(), maximum.tolist()):
+        stats = NumericStats()
+        if count:
+            stats.count, stats.total, stats.mean, stats.m2 = count, total, mean, m2_value
+            stats.minimum, stats.maximum = low, high
+        groups.append(stats)
+    return groups
+
+
+def _uniform_hash(value: Any) -> int:
+    """
+    Hash a non-numeric value uniformly onto 64 bits.
+
+    Python's hash() is salted per process for strings, so the sketch
+    hashes each value's repr with BLAKE2b instead.
+    """
+    return int.from_bytes(blake2b(repr(value).encode("utf-8"), digest_size=HASH_BYTES).digest(), "little")
+
+
+def _hash_numbers(values: np.ndarray) -> np.ndarray:
+    """
+    Hash numeric values uniformly onto 64 bits in one vectorized pass.
+
+    Each value's 64-bit pattern goes through the splitmix64 finalizer,
+    which spreads consecutive integers over the whole range. A float with
+    an integral value is hashed as the equal int, as Python compares them.
+    """
+    if values.dtype.kind == "f":
+        integral = np.isfinite(values) & (values == np.trunc(values)) & (np.abs(values) < 2.0 ** 63)
+        bits = np.where(integral, np.where(integral, values, 0.0).astype(np.int64), values.view(np.int64))
+    else:
+        bits = values.astype(np.int64)
+    mixed = bits.view(np.uint64) + MIX_INCREMENT
+    mixed = (mixed ^ (mixed >> np.uint64(30))) * MIX_MULTIPLIERS[0]
+    mixed = (mixed ^ (mixed >> np.uint64(27))) * MIX_MULTIPLIERS[1]
+    return mixed ^ (mixed >> np.uint64(31))
+
+
+def _hash_values(values: Iterable[Any]) -> np.ndarray:
+    """Hash the distinct values of a batch of Python values, numbers as by _hash_numbers()."""
+    ints, floats, others = [], [], []
+    for value in set(values):
+        if isinstance(value, int) and INT64_MIN <= value <= INT64_MAX:
+            ints.append(value)
+        elif isinstance(value, float):
+            floats.append(value)
+        else:
+            others.append(value)
+    return np.concatenate((
+        _hash_numbers(np.array(ints, dtype=np.int64)),
+        _hash_numbers(np.array(floats, dtype=np.float64)),
+        np.fromiter(map(_uniform_hash, others), dtype=np.uint64, count=len(others)),
+    ))
+
+
+class DistinctSketch:
+    """
+    K-minimum-values estimate of the number of distinct values.
+
+    Keeps the k smallest value hashes, sorted; exact until more than k
+    distinct values are seen. The hashes do not depend on the process, so
+    sketches built by different workers can be merged.
+    """
+
+    __slots__ = ("k", "hashes")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, values: Iterable[Any]) -> None:
+        """Add a batch of non-null Python values."""
+        self.update_hashes(_hash_values(values))
+
+    def update_numbers(self, values: np.ndarray) -> None:
+        """Add a batch of non-null values of a fixed-width column."""
+        self.update_hashes(_hash_numbers(values))
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        """Add a batch of value hashes."""
+        if len(self.hashes) == self.k:
+            # Only hashes below the current k-th smallest can enter the sketch
+            hashes = hashes[hashes < self.hashes[-1]]
+        self.hashes = np.unique(np.concatenate((self.hashes, hashes)))[:self.k]
+
+    def merge(self, other: "DistinctSketch") -> None:
+        """Combine another sketch into this one."""
+        self.update_hashes(other.hashes)
+
+    def estimate(self) -> int:
+        """Estimated number of distinct values."""
+        if len(self.hashes) < self.k:
+            return len(self.hashes)
+        return int((self.k - 1) / ((float(self.hashes[-1]) + 1) / HASH_SPACE))
+
+
+class TopK:
+    """
+    Most frequent values of a column, in bounded memory.
+
+    Counts are exact until more than capacity distinct values are held;
+    then the rarest are pruned and the largest pruned count is kept as the
+    bound on how much any reported count may be under.
+    """
+
+    __slots__ = ("capacity", "counts", "error")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Counter = Counter()
+        self.error = 0
+
+    def _prune(self) -> None:
+        if len(self.counts) > 2 * self.capacity:
+            kept = self.counts.most_common(self.capacity)
+            self.error = max(self.error, kept[-1][1])
+            self.counts = Counter(dict(kept))
+
+    def update(self, values: Iterable[Any]) -> None:
+        """Add a batch of non-null values."""
+        self.counts.update(values)
+        self._prune()
+
+    def merge(self, other: "TopK") -> None:
+        """Combine another top-k into this one."""
+        self.counts.update(other.counts)
+        self.error += other.error
+        self._prune()
+
+    def top(self, k: int) -> List[Tuple[Any, int]]:
+        """The k most frequent values with their counts."""
+        return self.counts.most_common(k)
+
+
+class ColumnInsight:
+    """Running statistics of one result column."""
+
+    __slots__ = ("name", "count", "nulls", "numeric", "distinct", "top")
+
+    def __init__(self, name: str, sketch_size: int, top_capacity: int):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.numeric: Optional[NumericStats] = None
+        self.distinct = DistinctSketch(sketch_size)
+        self.top = TopK(top_capacity)
+
+    def update(self, column: Any) -> None:
+        """Add one chunk of the column."""
+        if column.kind in DTYPES:
+            values = _present(column)
+            self.distinct.update_numbers(values)
+        else:
+            values = column.present()
+            self.distinct.update(values)
+        self.count += len(column)
+        self.nulls += len(column) - len(values)
+        if column.kind in NUMERIC_KINDS:
+            if self.numeric is None:
+                self.numeric = NumericStats()
+            self.numeric.update(values)
+        elif column.kind == "bool":
+            flags, counts = np.unique(values, return_counts=True)
+            self.top.update(dict(zip(map(bool, flags.tolist()), counts.tolist())))
+        else:
+            self.top.update(values)
+
+    def merge(self, other: "ColumnInsight") -> None:
+        """Combine another column's statistics into these."""
+        self.count += other.count
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+        if other.numeric is not None:
+            if self.numeric is None:
+                self.numeric = NumericStats()
+            self.numeric.merge(other.numeric)
+
+    def summary(self, top_k: int) -> Dict[str, Any]:
+        """Get the column summary."""
+        # The sketch estimate can overshoot slightly; there are never more distinct values than values
+        distinct = min(self.distinct.estimate(), self.count - self.nulls)
+        summary: Dict[str, Any] = {"count": self.count, "nulls": self.nulls, "distinct": distinct}
+        # A column is numeric if most of its values were numeric
+        if self.numeric is not None and self.numeric.count >= sum(self.top.counts.values()):
+            summary["type"] = "numeric"
+            summary.update(self.numeric.summary())
+        else:
+            summary["type"] = "categorical"
+            # Values seen once say nothing about the column unless it has only a few values
+            few = len(self.top.counts) <= top_k
+            summary["top"] = [[value, count] for value, count in self.top.top(top_k) if count > 1 or few]
+            if self.top.error:
+                summary["top_count_error"] = self.top.error
+        return summary
+
+
+class CoMoment:
+    """Running co-moment of two numeric columns, for their Pearson correlation."""
+
+    __slots__ = ("count", "mean_x", "mean_y", "m2_x", "m2_y", "c_xy")
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c_xy = 0.0
+
+    def update(self, xs: Sequence[float], ys: Sequence[float]) -> None:
+        """Add a batch of paired non-null values."""
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        count = int(xs.size)
+        if not count:
+            return
+        batch = CoMoment()
+        batch.count = count
+        batch.mean_x = float(np.sum(xs, dtype=np.float64)) / count
+        batch.mean_y = float(np.sum(ys, dtype=np.float64)) / count
+        dx = xs - batch.mean_x
+        dy = ys - batch.mean_y
+        batch.m2_x = float(np.dot(dx, dx))
+        batch.m2_y = float(np.dot(dy, dy))
+        batch.c_xy = float(np.dot(dx, dy))
+        self.merge(batch)
+
+    def merge(self, other: "CoMoment") -> None:
+        """Combine another co-moment into this one."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta_x = other.mean_x - self.mean_x
+        delta_y = other.mean_y - self.mean_y
+        weight = self.count * other.count / count
+        self.c_xy += other.c_xy + delta_x * delta_y * weight
+        self.m2_x += other.m2_x + delta_x * delta_x * weight
+        self.m2_y += other.m2_y + delta_y * delta_y * weight
+        self.mean_x += delta_x * other.count / count
+        self.mean_y += delta_y * other.count / count
+        self.count = count
+
+    def correlation(self) -> Optional[float]:
+        """Pearson correlation, or None if either column is constant."""
+        if self.count < 2 or self.m2_x <= 0 or self.m2_y <= 0:
+            return None
+        return self.c_xy / math.sqrt(self.m2_x * self.m2_y)
+
+
+class GroupStats:
+    """Row count and per-column numeric statistics of one group."""
+
+    __slots__ = ("count", "columns")
+
+    def __init__(self):
+        self.count = 0
+        self.columns: Dict[str, NumericStats] = {}
+
+    def merge(self, other: "GroupStats") -> None:
+        """Combine another group's statistics into these."""
+        self.count += other.count
+        for name, stats in other.columns.items():
+            self.columns.setdefault(name, NumericStats()).merge(stats)
+
+
+def _factorize(column: Any) -> Tuple[List[Any], np.ndarray]:
+    """
+    Number the distinct values of a column.
+
+    Fixed-width columns are compared by value and variable-width ones by
+    their stored text; only the distinct values are decoded.
+
+    Returns:
+        The distinct values, with None last if the column has nulls, and each row's number
+    """
+    if column.kind in DTYPES:
+        uniques, codes = np.unique(_present(column), return_inverse=True)
+        keys = uniques.tolist()
+        if column.kind == "bool":
+            keys = list(map(bool, keys))
+    else:
+        uniques, codes = np.unique(np.array(column.present(), dtype=str), return_inverse=True)
+        keys = list(map(column.decode, uniques.tolist()))
+    codes = codes.reshape(-1)
+    valid = _valid(column)
+    if valid is not None:
+        rows = np.full(len(column), len(keys), dtype=codes.dtype)
+        rows[valid] = codes
+        codes = rows
+        keys.append(None)
+    return keys, codes
+
+
+class InsightAccumulator:
+    """
+    Streaming summary of a query result.
+
+    Chunks are added one at a time and only running aggregates are kept:
+    per-column counts, numeric moments, a distinct-count sketch and top-k
+    counts; per-group counts and numeric statistics for the group-by
+    columns; and pairwise co-moments of the numeric columns. Every
+    aggregate is mergeable, so partial summaries of a result split across
+    workers can be combined with merge(). Work on a chunk is done with
+    NumPy operations over the column buffers rather than a Python loop per
+    value, and memory stays bounded however many rows are added. summary() returns a compact dictionary for the LLM instead of
+    the rows.
+    """
+
+    def __init__(self,
+                 group_by: Optional[Sequence[str]] = None,
+                 top_k: Optional[int] = None,
+                 max_groups: Optional[int] = None,
+                 max_correlation_columns: Optional[int] = None):
+        """
+        Initialize an empty summary.
+
+        Args:
+            group_by: Optional columns to aggregate the numeric columns by
+            top_k: Values reported per categorical column and groups reported, defaults to the configured value
+            max_groups: Groups tracked before the smallest are folded into "(other)", defaults to the configured value
+            max_correlation_columns: Numeric columns correlated pairwise, defaults to the configured value
+        """
+        self.group_by = list(group_by or [])
+        self.top_k = top_k or settings.insight_top_k
+        self.max_groups = max_groups or settings.insight_max_groups
+        self.max_correlation_columns = max_correlation_columns or settings.insight_max_correlation_columns
+        self.sketch_size = settings.insight_distinct_sketch_size
+        self.row_count = 0
+        self.columns: Dict[str, ColumnInsight] = {}
+        self.groups: Dict[Any, GroupStats] = {}
+        self.correlations: Dict[Tuple[str, str], CoMoment] = {}
+
+    def update(self, result: ColumnarResult) -> None:
+        """
+        Add a chunk of rows in columnar form.
+
+        Args:
+            result: The chunk, e.g. a slice of a stored result
+        """
+        if not len(result):
+            return
+        if any(column.kind == "decimal" for column in result.columns):
+            result = ColumnarResult(
+                [_as_float(column) if column.kind == "decimal" else column for column in result.columns], len(result)
+            )
+        self.row_count += len(result)
+        for column in result.columns:
+            insight = self.columns.get(column.name)
+            if insight is None:
+                insight = self.columns[column.name] = ColumnInsight(column.name, self.sketch_size, self.top_k * 100)
+            insight.update(column)
+        numeric = [
+            column for column in result.columns
+            if column.kind in NUMERIC_KINDS and column.name not in self.group_by
+        ]
+        if self.group_by:
+            self._update_groups(result, numeric)
+        self._update_correlations(numeric[:self.max_correlation_columns])
+
+    def update_rows(self, names: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+        """
+        Add a chunk of rows.
+
+        Args:
+            names: Column names
+            rows: Row tuples in column order
+        """
+        self.update(build_result(names, rows))
+
+    def _update_groups(self, result: ColumnarResult, numeric: List[Any]) -> None:
+        """Aggregate the chunk's numeric columns by the group-by key."""
+        key_columns = [result.column(name) for name in self.group_by if name in result.names]
+        if len(key_columns) != len(self.group_by):
+            return
+        factorized = [_factorize(column) for column in key_columns]
+        if len(factorized) == 1:
+            (keys, codes), = factorized
+        else:
+            combined, codes = np.unique(np.stack([codes for _, codes in factorized], axis=1), axis=0, return_inverse=True)
+            codes = codes.reshape(-1)
+            keys = [tuple(values[code] for (values, _), code in zip(factorized, row)) for row in combined.tolist()]
+        size = len(keys)
+        groups = [GroupStats() for _ in range(size)]
+        for group, count in zip(groups, np.bincount(codes, minlength=size).tolist()):
+            group.count = count
+        for column in numeric:
+            valid = _valid(column)
+            values = _present(column)
+            column_stats = _grouped_stats(values, codes if valid is None else codes[valid], size)
+            for group, stats in zip(groups, column_stats):
+                group.columns[column.name] = stats
+        for key, group in zip(keys, groups):
+            if not group.count:
+                # The null key of a slice without nulls
+                continue
+            existing = self.groups.get(key)
+            if existing is None:
+                self.groups[key] = group
+            else:
+                existing.merge(group)
+        self._fold_groups()
+
+    def _fold_groups(self) -> None:
+        """Fold the smallest groups into "(other)" once there are too many."""
+        if len(self.groups) <= 2 * self.max_groups:
+            return
+        ranked = sorted(self.groups.items(), key=lambda item: item[1].count, reverse=True)
+        kept = dict(ranked[:self.max_groups])
+        other = kept.pop(OTHER_GROUP, None) or self.groups.get(OTHER_GROUP) or GroupStats()
+        for key, group in ranked[self.max_groups:]:
+            if key != OTHER_GROUP:
+                other.merge(group)
+        kept[OTHER_GROUP] = other
+        self.groups = kept
+
+    def _update_correlations(self, numeric: List[Any]) -> None:
+        """Add the chunk's rows to the co-moment of each pair of numeric columns."""
+        for position, first in enumerate(numeric):
+            for second in numeric[position + 1:]:
+                xs, ys = _array(first), _array(second)
+                valid = [mask for mask in (_valid(first), _valid(second)) if mask is not None]
+                if valid:
+                    both = np.logical_and.reduce(valid)
+                    xs, ys = xs[both], ys[both]
+                pair = (first.name, second.name)
+                self.correlations.setdefault(pair, CoMoment()).update(xs, ys)
+
+    def merge(self, other: "InsightAccumulator") -> None:
+        """
+        Combine another partial summary of the same result into this one.
+
+        Args:
+            other: Summary of other chunks of the result
+        """
+        self.row_count += other.row_count
+        for name, insight in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(insight)
+            else:
+                self.columns[name] = insight
+        for key, group in other.groups.items():
+            if key in self.groups:
+                self.groups[key].merge(group)
+            else:
+                self.groups[key] = group
+        self._fold_groups()
+        for pair, moment in other.correlations.items():
+            self.correlations.setdefault(pair, CoMoment()).merge(moment)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the compact summary.
+
+        Returns:
+            Dictionary with the row count, per-column statistics, the largest
+            groups and the strongest correlations
+        """
+        summary: Dict[str, Any] = {
+            "row_count": self.row_count,
+            "columns": {name: insight.summary(self.top_k) for name, insight in self.columns.items()},
+        }
+        if self.group_by:
+            largest = heapq.nlargest(self.top_k, self.groups.items(), key=lambda item: item[1].count)
+            summary["groups"] = {
+                "by": self.group_by,
+                "count": len(self.groups),
+                "top": [
+                    dict({"key": key, "count": group.count},
+                         **{name: stats.summary() for name, stats in group.columns.items() if stats.count})
+                    for key, group in largest
+                ],
+            }
+        correlations = [
+            [first, second, round(value, 4)]
+            for (first, second), moment in self.correlations.items()
+            if (value := moment.correlation()) is not None
+        ]
+        correlations.sort(key=lambda item: abs(item[2]), reverse=True)
+        summary["correlations"] = correlations[:self.top_k]
+        return summary
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    """Round a statistic to 6 significant digits for a compact summary."""
+    if value is None or isinstance(value, int):
+        return value
+    return float(f"{value:.6g}")
+
+
+def summarize_result(result: ColumnarResult, chunk_rows: Optional[int] = None, **options: Any) -> Dict[str, Any]:
+    """
+    Summarize a stored result slice by slice.
+
+    Args:
+        result: The result, possibly memory-mapped
+        chunk_rows: Rows per slice, defaults to the configured value
+        **options: InsightAccumulator options (group_by, top_k, ...)
+
+    Returns:
+        The compact summary
+    """
+    chunk_rows = chunk_rows or settings.insight_chunk_rows
+    accumulator = InsightAccumulator(**options)
+    for start in range(0, len(result), chunk_rows):
+        accumulator.update(result.slice(start, start + chunk_rows))
+    return accumulator.summary()
+
+
+async def summarize_stream(chunks: AsyncIterator[RowChunk], **options: Any) -> Dict[str, Any]:
+    """
+    Summarize a streamed query result without keeping its rows.
+
+    Args:
+        chunks: Row chunks, e.g. from SQLExecutor.stream()
+        **options: InsightAccumulator options (group_by, top_k, ...)
+
+    Returns:
+        The compact summary
+    """
+    accumulator = InsightAccumulator(**options)
+    async for chunk in chunks:
+        accumulator.update_rows(chunk.columns, chunk.rows)
+    logger.debug("Summarized {} streamed rows", accumulator.row_count)
+    return accumulator.summary()
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """
+    Render a summary as compact text for an LLM prompt.
+
+    Args:
+        summary: Output of InsightAccumulator.summary()
+
+    Returns:
+        A few lines describing the result
+    """
+    lines = [f"Rows: {summary['row_count']}"]
+    for name, column in summary["columns"].items():
+        nulls = f", {column['nulls']} null" if column["nulls"] else ""
+        if column["type"] == "numeric":
+            lines.append(
+                f"{name}: numeric, mean {column['mean']}, std {column['std']}, "
+                f"min {column['min']}, max {column['max']}, sum {column['sum']}{nulls}"
+            )
+        else:
+            top = ", ".join(f"{value} ({count})" for value, count in column["top"])
+            lines.append(f"{name}: {column['distinct']} distinct{nulls}" + (f"; top: {top}" if top else ""))
+    groups = summary.get("groups")
+    if groups:
+        lines.append(f"Largest of {groups['count']} groups by {', '.join(groups['by'])}:")
+        for group in groups["top"]:
+            measures = ", ".join(
+                f"{name} sum {stats['sum']} mean {stats['mean']}"
+                for name, stats in group.items() if name not in ("key", "count")
+            )
+            lines.append(f"  {group['key']}: {group['count']} rows" + (f"; {measures}" if measures else ""))
+    if summary["correlations"]:
+        lines.append("Correlations: " + ", ".join(f"{a}~{b} {r}" for a, b, r in summary["correlations"]))
+    return "\n".join(lines)
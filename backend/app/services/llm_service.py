@@ -1,90 +1,676 @@
 """
 LLM Service - Handles interactions with language models.
 """
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage
+import asyncio
+import importlib
+import time
+from types import ModuleType
+from typing import TYPE_CHECKING, AsyncIterator, Callable, List, Dict, Any, Optional, Tuple, Union
+import httpx
 from app.config import settings
 from app.utils.logging_utils import get_logger
+from app.services.prompt_registry import PromptRegistry
+from app.services.provider_router import ProviderBackend, ProviderRouter
+from app.utils.metrics import CHAT_STAGE_SECONDS, LLM_COMPLETION_TOKENS, LLM_PROMPT_TOKENS
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
 
 # Get module-specific logger
 logger = get_logger(__name__)
 
+# Builds the LangChain chat client for a provider on an LLMService's connection pools
+ProviderFactory = Callable[["LLMService"], Any]
+
+
+class ProviderSpec:
+    """A registered LLM provider: the SDK module it needs, a client factory and its settings."""
+
+    __slots__ = ("name", "module", "factory", "model_setting", "base_url_setting")
+
+    def __init__(self, name: str, module: str, factory: ProviderFactory, model_setting: str, base_url_setting: str):
+        self.name = name
+        self.module = module
+        self.factory = factory
+        self.model_setting = model_setting
+        self.base_url_setting = base_url_setting
+
+    @property
+    def model(self) -> str:
+        """The configured model name."""
+        return getattr(settings, self.model_setting)
+
+    @property
+    def base_url(self) -> str:
+        """The configured API base URL."""
+        return getattr(settings, self.base_url_setting)
+
+
+# Registered providers by name. SDKs are only imported when a provider is
+# selected, so importing this module never pays for unused providers.
+PROVIDERS: Dict[str, ProviderSpec] = {}
+
+# Seconds spent importing each provider SDK, for the startup report
+PROVIDER_IMPORT_SECONDS: Dict[str, float] = {}
+
+
+def register_provider(name: str,
+                      module: str,
+                      model_setting: str,
+                      base_url_setting: str) -> Callable[[ProviderFactory], ProviderFactory]:
+    """
+    Register a client factory for an LLM provider.
+
+    Args:
+        name: The provider name used in the LLM_PROVIDER(S) settings
+        module: The SDK module imported before the factory is called
+        model_setting: Name of the setting holding the provider's model
+        base_url_setting: Name of the setting holding the provider's API base URL
+
+    Returns:
+        A decorator registering the factory
+    """
+    def decorator(factory: ProviderFactory) -> ProviderFactory:
+        PROVIDERS[name] = ProviderSpec(name, module, factory, model_setting, base_url_setting)
+        return factory
+    return decorator
+
+
+def preload_provider(name: str) -> float:
+    """
+    Import a provider's SDK ahead of its first use.
+
+    Calling this before workers fork (e.g. at import time under gunicorn
+    --preload) lets every worker share the already imported modules.
+
+    Args:
+        name: The provider name
+
+    Returns:
+        Seconds spent importing the SDK, or 0 if it was already imported
+
+    Raises:
+        ValueError: If the provider is not registered
+    """
+    spec = PROVIDERS.get(name)
+    if spec is None:
+        raise ValueError(f"Unsupported LLM provider: {name}")
+    if name in PROVIDER_IMPORT_SECONDS:
+        return 0.0
+    started = time.perf_counter()
+    importlib.import_module(spec.module)
+    elapsed = time.perf_counter() - started
+    PROVIDER_IMPORT_SECONDS[name] = elapsed
+    logger.info("Imported {} provider SDK in {:.3f}s", name, elapsed)
+    return elapsed
+
+
+def _messages() -> ModuleType:
+    """Get the LangChain message classes, importing them on first use."""
+    return importlib.import_module("langchain_core.messages")
+
+
+@register_provider("openai", "langchain_openai", "openai_model_name", "openai_base_url")
+def _create_openai(service: "LLMService") -> Any:
+    """Create the OpenAI chat client on the service's connection pools."""
+    from langchain_openai import ChatOpenAI
+    logger.info("Initializing OpenAI LLM with model: {}", settings.openai_model_name)
+    return ChatOpenAI(
+        model=settings.openai_model_name,
+        base_url=settings.openai_base_url,
+        timeout=service.timeout,
+        http_client=service.http_client,
+        http_async_client=service.http_async_client,
+    )
+
+
+@register_provider("gemma", "langchain_openai", "gemma_model_name", "gemma_base_url")
+def _create_gemma(service: "LLMService") -> Any:
+    """Create a Gemma chat client for an OpenAI-compatible endpoint."""
+    from langchain_openai import ChatOpenAI
+    logger.info("Initializing Gemma LLM with model: {}", settings.gemma_model_name)
+    return ChatOpenAI(
+        model=settings.gemma_model_name,
+        api_key=settings.gemma_api_key,
+        base_url=settings.gemma_base_url,
+        timeout=service.timeout,
+        http_client=service.http_client,
+        http_async_client=service.http_async_client,
+    )
+
+
+class LLMResult:
+    """Generated text and the backend that produced it."""
+
+    __slots__ = ("text", "provider", "model", "hedged", "fallback")
+
+    def __init__(self,
+                 text: str = "",
+                 provider: Optional[str] = None,
+                 model: Optional[str] = None,
+                 hedged: bool = False,
+                 fallback: bool = False):
+        self.text = text
+        self.provider = provider
+        self.model = model
+        self.hedged = hedged
+        self.fallback = fallback
+
+    def metadata(self) -> Dict[str, Any]:
+        """Describe the serving backend for response metadata."""
+        return {"provider": self.provider, "model": self.model, "hedged": self.hedged, "fallback": self.fallback}
+
+
 class LLMService:
     """
     Service for interactions with Language Models.
     Abstracts away the specifics of different LLM providers.
     """
 
+    # Process-wide limit on in-flight async LLM calls, shared by all instances
+    _semaphore: Optional[asyncio.Semaphore] = None
+
     def __init__(self):
-        """Initialize the LLM service with the configured provider."""
-        self.provider = settings.llm_provider.lower()
-        self.llm = self._initialize_llm()
-        logger.info(f"LLM Service initialized with provider: {self.provider}")
+        """
+        Initialize the LLM service with the configured providers.
 
-    def _initialize_llm(self) -> Any:
+        The service owns keep-alive HTTP connection pools that are reused by
+        every call, so it should be created once per application and closed
+        with aclose() on shutdown. Calls are routed across the providers in
+        settings.llm_providers; the first one is the primary, whose name is
+        used for cache keys and metrics of work not tied to a single call.
         """
-        Initialize the LLM client based on the configured provider.
+        self.providers = settings.llm_providers or [settings.llm_provider.lower()]
+        self.provider = self.providers[0]
+        self.timeout = settings.llm_timeout_seconds
+        limits = httpx.Limits(
+            max_connections=settings.llm_pool_max_connections,
+            max_keepalive_connections=settings.llm_pool_max_keepalive,
+            keepalive_expiry=settings.llm_pool_keepalive_expiry,
+        )
+        self.http_client = httpx.Client(limits=limits, timeout=self.timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        backends = []
+        for provider in self.providers:
+            llm = self._initialize_llm(provider)
+            backends.append(ProviderBackend(provider, PROVIDERS[provider].model, llm))
+        self.router = ProviderRouter(backends)
+        self.model_name = self.router.backends[0].model
+        self.prompts = PromptRegistry()
+        logger.info("LLM Service initialized with providers: {}", self.providers)
+
+    @property
+    def llm(self) -> Any:
+        """The primary provider's client."""
+        return self.router.backends[0].llm
+
+    @llm.setter
+    def llm(self, client: Any) -> None:
+        self.router.backends[0].llm = client
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        """
+        Get the shared semaphore bounding concurrent async LLM calls.
+
+        Returns:
+            The process-wide semaphore, created on first use
+        """
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+            logger.info("LLM concurrency limit set to {}", settings.llm_max_concurrency)
+        return cls._semaphore
+
+    def _initialize_llm(self, provider: str) -> Any:
+        """
+        Initialize the LLM client for a provider.
+
+        The provider's SDK is imported here, on first selection, rather than
+        when this module is imported.
+
+        Args:
+            provider: The provider name
 
         Returns:
             An instance of the appropriate LLM client
 
         Raises:
-            ValueError: If the configured LLM provider is not supported
+            ValueError: If the LLM provider is not supported
         """
-        if self.provider == "openai":
-            logger.info(f"Initializing OpenAI LLM with model: {settings.openai_model_name}")
-            return ChatOpenAI(model=settings.openai_model_name)
-        else:
-            logger.error(f"Unsupported LLM provider: {self.provider}")
-            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        spec = PROVIDERS.get(provider)
+        if spec is None:
+            logger.error("Unsupported LLM provider: {}", provider)
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+        preload_provider(provider)
+        return spec.factory(self)
 
-    def generate_response(self,
-                          query: str,
-                          role: Optional[str] = None,
-                          conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+    async def warm_up(self) -> None:
         """
-        Generate a response using the LLM based on the query and optional role.
+        Open pooled connections to each provider ahead of the first request.
+
+        Any HTTP response means the TCP/TLS connection has been established
+        and kept alive, so the status code is ignored. Failures are logged
+        but never prevent startup.
+        """
+        async def connect(base_url: str) -> None:
+            try:
+                logger.info("Warming up LLM connection pool: {}", base_url)
+                await self.http_async_client.get(base_url, timeout=5.0)
+                logger.info("LLM connection pool warm-up complete: {}", base_url)
+            except Exception as e:
+                logger.warning("LLM connection pool warm-up failed for {}: {}", base_url, str(e))
+
+        base_urls = {PROVIDERS[provider].base_url for provider in self.providers}
+        await asyncio.gather(*(connect(base_url) for base_url in base_urls))
+
+    async def aclose(self) -> None:
+        """Close the HTTP connection pools held by the service."""
+        await self.http_async_client.aclose()
+        self.http_client.close()
+        logger.info("LLM Service connection pools closed")
+
+    def get_system_prompt(self, role: Optional[str]) -> Optional[str]:
+        """
+        Get the system prompt used for a role.
+
+        Args:
+            role: Optional role to contextualize the response
+
+        Returns:
+            The system prompt, or None if no role was given
+        """
+        return self.prompts.system_prompt(role)
+
+    def _build_messages(self,
+                        query: str,
+                        role: Optional[str] = None,
+                        conversation_history: Optional[List[Dict[str, str]]] = None,
+                        summary: Optional[str] = None) -> List["BaseMessage"]:
+        """
+        Build the LangChain message list for a request.
+
+        Messages are ordered from the most to the least stable: the role's
+        precomputed system message, the rolling summary, the history and the
+        query. Requests for the same role therefore share a byte-identical
+        prefix, and turns of one conversation extend the previous prompt.
 
         Args:
             query: The user's query
             role: Optional role to contextualize the response
             conversation_history: Optional list of previous messages in the conversation
+            summary: Optional summary of earlier turns not included in the history
 
         Returns:
-            The generated response text
-
-        Raises:
-            Exception: If there's an error generating the response
+            List of messages to send to the LLM
         """
-        try:
-            # Create messages for LangChain
-            messages: List[BaseMessage] = []
+        with CHAT_STAGE_SECONDS.time(stage="message_build", role=role, provider=self.provider):
+            lc = _messages()
+            messages: List["BaseMessage"] = []
 
             # Add system message with role context if provided
-            if role:
-                system_prompt = f"You are a {role}. Answer the user's question from this perspective."
-                messages.append(SystemMessage(content=system_prompt))
-                logger.info(f"Using role-based system prompt for {role}")
+            system_message = self.prompts.system_message(role)
+            if system_message is not None:
+                messages.append(system_message)
+                logger.debug("Using role-based system prompt for {}", role)
+
+            # Add the rolling summary of older turns if provided
+            if summary:
+                messages.append(lc.SystemMessage(content=self.prompts.render("summary_context", summary=summary)))
 
             # Add conversation history if provided
             if conversation_history:
                 for message in conversation_history:
                     if message["role"] == "user":
-                        messages.append(HumanMessage(content=message["content"]))
+                        messages.append(lc.HumanMessage(content=message["content"]))
                     elif message["role"] == "assistant":
-                        messages.append(AIMessage(content=message["content"]))
+                        messages.append(lc.AIMessage(content=message["content"]))
 
             # Add the user's query
-            messages.append(HumanMessage(content=query))
+            messages.append(lc.HumanMessage(content=query))
+            return messages
+
+    def generate_response(self,
+                          query: str,
+                          role: Optional[str] = None,
+                          conversation_history: Optional[List[Dict[str, str]]] = None,
+                          summary: Optional[str] = None) -> str:
+        """
+        Generate a response using the LLM based on the query and optional role.
+
+        This is a blocking call; request handlers should use agenerate_response.
+
+        Args:
+            query: The user's query
+            role: Optional role to contextualize the response
+            conversation_history: Optional list of previous messages in the conversation
+            summary: Optional summary of earlier turns not included in the history
+
+        Returns:
+            The generated response text
+
+        Raises:
+            Exception: If there's an error generating the response
+        """
+        try:
+            messages = self._build_messages(query, role, conversation_history, summary)
 
             # Generate response from LLM
-            logger.info(f"Sending request to {self.provider} LLM")
-            response = self.llm.invoke(messages)
+            logger.info("Sending request to {} LLM", self.provider)
+            with CHAT_STAGE_SECONDS.time(stage="provider", role=role, provider=self.provider):
+                response = self.llm.invoke(messages)
             logger.info("Received response from LLM")
+            self._record_usage(response, role)
 
             return response.content
 
         except Exception as e:
-            logger.error(f"Error generating LLM response: {str(e)}")
+            logger.error("Error generating LLM response: {}", str(e))
+            raise
+
+    def _record_usage(self, response: Any, role: Optional[str], provider: Optional[str] = None) -> None:
+        """
+        Record prompt and completion token counts reported by the provider.
+
+        Args:
+            response: The message returned by the LLM client
+            role: Optional role of the request, used as a metrics label
+            provider: The provider that served the call, defaults to the primary
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            provider = provider or self.provider
+            LLM_PROMPT_TOKENS.inc(usage.get("input_tokens", 0), role=role, provider=provider)
+            LLM_COMPLETION_TOKENS.inc(usage.get("output_tokens", 0), role=role, provider=provider)
+
+    async def _ainvoke(self,
+                       messages: List["BaseMessage"],
+                       timeout: float,
+                       role: Optional[str] = None,
+                       stage: str = "provider") -> LLMResult:
+        """
+        Invoke the LLM asynchronously under the concurrency limit and timeout.
+
+        The call is routed to the fastest healthy provider, with hedging and
+        fallback as configured on the router.
+
+        Args:
+            messages: The messages to send
+            timeout: Timeout in seconds for each provider attempt
+            role: Optional role of the request, used as a metrics label
+            stage: Pipeline stage the call is recorded under
+
+        Returns:
+            LLMResult with the response text and the backend that produced it
+        """
+        async with self._get_semaphore():
+            logger.info("Sending async LLM request, primary provider: {}", self.provider)
+            started = time.perf_counter()
+            routed = None
+            try:
+                routed = await self.router.ainvoke(messages, timeout)
+            finally:
+                CHAT_STAGE_SECONDS.observe(
+                    time.perf_counter() - started,
+                    stage=stage,
+                    role=role,
+                    provider=routed.backend.provider if routed else self.provider,
+                )
+            logger.info("Received response from {} LLM", routed.backend.name)
+        self._record_usage(routed.response, role, routed.backend.provider)
+        return LLMResult(
+            routed.response.content, routed.backend.provider, routed.backend.model, routed.hedged, routed.fallback
+        )
+
+    async def agenerate(self,
+                        query: str,
+                        role: Optional[str] = None,
+                        conversation_history: Optional[List[Dict[str, str]]] = None,
+                        summary: Optional[str] = None,
+                        timeout: Optional[float] = None) -> LLMResult:
+        """
+        Generate a response without blocking the event loop, reporting which backend served it.
+
+        The call waits for a slot under the global concurrency limit and each
+        provider attempt is cancelled if it does not complete within the timeout.
+
+        Args:
+            query: The user's query
+            role: Optional role to contextualize the response
+            conversation_history: Optional list of previous messages in the conversation
+            summary: Optional summary of earlier turns not included in the history
+            timeout: Optional per-attempt timeout in seconds, defaults to the configured value
+
+        Returns:
+            LLMResult with the response text and the serving provider and model
+
+        Raises:
+            asyncio.TimeoutError: If no provider responds within the timeout
+            Exception: If there's an error generating the response
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        try:
+            messages = self._build_messages(query, role, conversation_history, summary)
+            return await self._ainvoke(messages, timeout, role)
+
+        except asyncio.TimeoutError:
+            logger.error("LLM request timed out after {}s", timeout)
+            raise
+        except Exception as e:
+            logger.error("Error generating LLM response: {}", str(e))
+            raise
+
+    async def agenerate_response(self,
+                                 query: str,
+                                 role: Optional[str] = None,
+                                 conversation_history: Optional[List[Dict[str, str]]] = None,
+                                 summary: Optional[str] = None,
+                                 timeout: Optional[float] = None) -> str:
+        """
+        Generate a response without blocking the event loop.
+
+        Args:
+            query: The user's query
+            role: Optional role to contextualize the response
+            conversation_history: Optional list of previous messages in the conversation
+            summary: Optional summary of earlier turns not included in the history
+            timeout: Optional per-attempt timeout in seconds, defaults to the configured value
+
+        Returns:
+            The generated response text
+
+        Raises:
+            asyncio.TimeoutError: If no provider responds within the timeout
+            Exception: If there's an error generating the response
+        """
+        result = await self.agenerate(query, role, conversation_history, summary, timeout)
+        return result.text
+
+    async def astream_response(self,
+                               query: str,
+                               role: Optional[str] = None,
+                               conversation_history: Optional[List[Dict[str, str]]] = None,
+                               summary: Optional[str] = None,
+                               timeout: Optional[float] = None,
+                               result: Optional[LLMResult] = None) -> AsyncIterator[str]:
+        """
+        Stream a response from the LLM, yielding text chunks as they arrive.
+
+        The stream holds a slot under the global concurrency limit until it is
+        exhausted or closed. The timeout applies to the wait for each chunk.
+        Providers that fail before producing a chunk fall back to the next one.
+
+        Args:
+            query: The user's query
+            role: Optional role to contextualize the response
+            conversation_history: Optional list of previous messages in the conversation
+            summary: Optional summary of earlier turns not included in the history
+            timeout: Optional per-chunk timeout in seconds, defaults to the configured value
+            result: Optional LLMResult filled in with the serving provider and the full text
+
+        Yields:
+            Text chunks of the generated response
+
+        Raises:
+            asyncio.TimeoutError: If the LLM stalls for longer than the timeout
+            Exception: If there's an error generating the response
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        try:
+            messages = self._build_messages(query, role, conversation_history, summary)
+
+            result = result if result is not None else LLMResult()
+            async with self._get_semaphore():
+                logger.info("Sending streaming LLM request, primary provider: {}", self.provider)
+                started = time.perf_counter()
+                first = self.router.select()
+                chunks: List[str] = []
+                stream = self.router.astream(messages, timeout)
+                try:
+                    async for backend, chunk in stream:
+                        if result.provider is None:
+                            result.provider, result.model = backend.provider, backend.model
+                            result.fallback = backend is not first
+                        if chunk.content:
+                            chunks.append(chunk.content)
+                            yield chunk.content
+                finally:
+                    await stream.aclose()
+                    result.text = "".join(chunks)
+                    CHAT_STAGE_SECONDS.observe(
+                        time.perf_counter() - started, stage="provider", role=role, provider=result.provider or self.provider
+                    )
+                logger.info("Finished streaming response from {} LLM", result.provider)
+
+        except asyncio.TimeoutError:
+            logger.error("LLM stream stalled for more than {}s", timeout)
+            raise
+        except Exception as e:
+            logger.error("Error streaming LLM response: {}", str(e))
+            raise
+
+    async def asummarize(self,
+                         messages: List[Dict[str, str]],
+                         previous_summary: Optional[str] = None,
+                         timeout: Optional[float] = None,
+                         max_tokens: Optional[int] = None) -> str:
+        """
+        Fold conversation messages into a rolling summary.
+
+        Only the messages not yet covered by the previous summary are sent, so
+        each update costs a small, roughly constant prompt.
+
+        Args:
+            messages: Messages to fold into the summary, oldest first
+            previous_summary: Optional summary the new messages extend
+            timeout: Optional per-call timeout in seconds, defaults to the configured value
+            max_tokens: Optional length limit the summary is asked to keep, defaults to the configured value
+
+        Returns:
+            The updated summary text
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        max_tokens = max_tokens if max_tokens is not None else settings.context_summary_max_tokens
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        prompt = self.prompts.render(
+            "summary_update",
+            previous_summary=previous_summary or "(none)",
+            transcript=transcript,
+            max_tokens=max_tokens,
+        )
+        lc = _messages()
+        messages_for_llm: List["BaseMessage"] = [
+            lc.SystemMessage(content=self.prompts.render("summary_system")),
+            lc.HumanMessage(content=prompt),
+        ]
+        try:
+            result = await self._ainvoke(messages_for_llm, timeout, stage="summary_provider")
+            return result.text
+        except Exception as e:
+            logger.error("Error summarizing conversation: {}", str(e))
             raise
+
+    async def abatch_generate(self,
+                              requests: List[Dict[str, Any]],
+                              max_concurrency: int,
+                              timeout: Optional[float] = None) -> AsyncIterator[Tuple[int, Union[LLMResult, Exception]]]:
+        """
+        Generate responses for many requests with LangChain's async batch API.
+
+        The batch goes to the backend the router currently ranks first. Each
+        call takes a slot under the global concurrency limit and is cancelled
+        if it does not complete within the timeout. Requests that fail are
+        then retried one by one through the router, with its hedging and
+        fallback. Results are yielded as they complete; a request that still
+        fails yields its exception instead of aborting the rest of the batch.
+
+        Args:
+            requests: Dicts with "query" and optional "role", "conversation_history" and "summary"
+            max_concurrency: Maximum number of requests in flight at once, capped at the global limit
+            timeout: Optional per-call timeout in seconds, defaults to the configured value
+
+        Yields:
+            Tuples of request index and the LLMResult or the exception raised
+        """
+        from langchain_core.runnables import RunnableLambda
+
+        timeout = timeout if timeout is not None else self.timeout
+        max_concurrency = max(1, min(max_concurrency, settings.llm_max_concurrency))
+        inputs = [
+            self._build_messages(
+                request["query"],
+                request.get("role"),
+                request.get("conversation_history"),
+                request.get("summary"),
+            )
+            for request in requests
+        ]
+        backend = self.router.select()
+
+        async def call(index: int) -> Any:
+            async with self._get_semaphore():
+                started = time.perf_counter()
+                response = await self.router.attempt(backend, inputs[index], timeout)
+                # Failed calls are not recorded here; their retry through _ainvoke() records the item
+                CHAT_STAGE_SECONDS.observe(
+                    time.perf_counter() - started,
+                    stage="provider_batch",
+                    role=requests[index].get("role"),
+                    provider=backend.provider,
+                )
+                return response
+
+        logger.info("Sending batch of {} requests to {} LLM", len(inputs), backend.name)
+        failed: List[int] = []
+        async for index, response in RunnableLambda(call).abatch_as_completed(
+            range(len(inputs)),
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        ):
+            if isinstance(response, Exception):
+                logger.warning("Batch item {} failed on {} LLM, retrying: {}", index, backend.name, repr(response))
+                failed.append(index)
+                continue
+            self._record_usage(response, requests[index].get("role"), backend.provider)
+            yield index, LLMResult(response.content, backend.provider, backend.model)
+
+        if failed:
+            limit = asyncio.Semaphore(max_concurrency)
+
+            async def retry(index: int) -> Tuple[int, Union[LLMResult, Exception]]:
+                async with limit:
+                    try:
+                        return index, await self._ainvoke(
+                            inputs[index], timeout, requests[index].get("role"), stage="provider_batch"
+                        )
+                    except Exception as e:
+                        logger.error("Error generating LLM response for batch item {}: {}", index, repr(e))
+                        return index, e
+
+            tasks = [asyncio.ensure_future(retry(index)) for index in failed]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+        logger.info("Received all batch responses from LLM")
@@ -0,0 +1,228 @@
+"""
+Mongo Conversation Store - Persists conversation history to MongoDB.
+"""
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from app.config import settings
+from app.services.conversation_store import ConversationStore
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+
+class MongoConversationStore:
+    """
+    Conversation store backed by MongoDB with a hot in-memory tier.
+
+    Active conversations are served from the in-memory ConversationStore.
+    Appends are queued and written behind in batches with insert_many, so the
+    request path never waits on a database round trip. Conversations that are
+    not in memory are loaded from MongoDB by ensure_loaded(). Each message
+    is stored with the conversation's epoch and its sequence number, so a
+    reloaded conversation keeps its version and message cursors.
+
+    Any object exposing motor's async collection API (insert_many, find,
+    create_index) can be passed as the collection, which keeps the store
+    testable against an in-process fake as well as a local mongod.
+    """
+
+    def __init__(self, collection: Optional[Any] = None, hot_tier: Optional[ConversationStore] = None):
+        """
+        Initialize the Mongo conversation store.
+
+        Args:
+            collection: Optional async collection. If not provided, one is created from settings.mongodb_uri.
+            hot_tier: Optional in-memory store for active conversations. Defaults to the shared store.
+        """
+        self._client = None
+        if collection is None:
+            try:
+                from motor.motor_asyncio import AsyncIOMotorClient
+            except ImportError as e:
+                raise ImportError("motor is required for the mongo conversation store backend") from e
+            self._client = AsyncIOMotorClient(settings.mongodb_uri)
+            collection = self._client.get_default_database()[settings.mongo_conversations_collection]
+        self.collection = collection
+        self.hot_tier = hot_tier or ConversationStore()
+        self.batch_size = settings.mongo_write_batch_size
+        self.flush_interval = settings.mongo_write_flush_interval
+        self.max_pending = settings.mongo_write_queue_max
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self.write_stats = {"written": 0, "batches": 0, "failed_batches": 0, "dropped": 0}
+        logger.info("Mongo conversation store initialized")
+
+    async def start(self) -> None:
+        """Create indexes and start the background write-behind task."""
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        try:
+            await self.collection.create_index([("conversation_id", 1), ("timestamp", 1), ("seq", 1)])
+        except Exception as e:
+            logger.warning("Could not create conversation index: {}", str(e))
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info("Mongo conversation store write-behind started")
+
+    async def close(self) -> None:
+        """Stop the background task and flush every pending message."""
+        if self._flush_task is not None:
+            # The flag stops the loop even if wait_for swallows the cancellation
+            self._closing = True
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        while self._pending:
+            if not await self.flush():
+                logger.error("Dropping {} unflushed messages on shutdown", len(self._pending))
+                self.write_stats["dropped"] += len(self._pending)
+                self._pending.clear()
+        if self._client is not None:
+            self._client.close()
+        logger.info("Mongo conversation store closed")
+
+    async def _flush_loop(self) -> None:
+        """Flush pending messages when a batch fills up or the interval elapses."""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                if not await self.flush():
+                    # Back off before retrying a failing database
+                    await asyncio.sleep(self.flush_interval)
+                    break
+
+    async def flush(self) -> bool:
+        """
+        Write one batch of pending messages to MongoDB.
+
+        Returns:
+            True if the batch was written (or nothing was pending), False on failure
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                await self.collection.insert_many(batch, ordered=True)
+                self.write_stats["written"] += len(batch)
+                self.write_stats["batches"] += 1
+                logger.debug("Flushed {} conversation messages to MongoDB", len(batch))
+                return True
+            except Exception as e:
+                # Put the batch back in front so ordering is preserved on retry
+                self._pending.extendleft(reversed(batch))
+                self.write_stats["failed_batches"] += 1
+                logger.error("Error flushing conversation messages to MongoDB: {}", str(e))
+                return False
+
+    def add_message(self, conversation_id: str, role: str, content: str) -> None:
+        """
+        Add a message to the hot tier and queue it for persistence.
+
+        Args:
+            conversation_id: The ID of the conversation
+            role: The role of the message sender ("user" or "assistant")
+            content: The message content
+        """
+        epoch, seq, timestamp = self.hot_tier.add_message(conversation_id, role, content)
+        if len(self._pending) >= self.max_pending:
+            self.write_stats["dropped"] += 1
+            logger.error("Write-behind queue full, message for {} not persisted", conversation_id)
+            return
+        self._pending.append({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            # The hot tier's timestamp, so a reloaded message keeps the one clients saw
+            "timestamp": timestamp,
+            "epoch": epoch,
+            "seq": seq,
+        })
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def ensure_loaded(self, conversation_id: str) -> None:
+        """
+        Load a conversation from MongoDB into the hot tier if it is not there.
+
+        Args:
+            conversation_id: The ID of the conversation
+        """
+        if self.hot_tier.has_conversation(conversation_id):
+            return
+        # Messages still waiting to be written must be visible to the read
+        while any(doc["conversation_id"] == conversation_id for doc in self._pending):
+            if not await self.flush():
+                break
+        try:
+            cursor = self.collection.find(
+                {"conversation_id": conversation_id},
+                {"_id": 0, "role": 1, "content": 1, "timestamp": 1, "epoch": 1, "seq": 1},
+            ).sort([("timestamp", -1), ("seq", -1), ("_id", -1)]).limit(self.hot_tier.max_messages)
+            documents = await cursor.to_list(length=self.hot_tier.max_messages)
+        except Exception as e:
+            logger.error("Error loading conversation {} from MongoDB: {}", conversation_id, str(e))
+            raise
+        if documents and not self.hot_tier.has_conversation(conversation_id):
+            documents.reverse()
+            # Documents written before sequence numbers were stored restore as new messages
+            latest = documents[-1]
+            self.hot_tier.restore_conversation(
+                conversation_id,
+                [(doc["role"], doc["content"], doc["timestamp"]) for doc in documents],
+                epoch=latest.get("epoch"),
+                appended=latest.get("seq"),
+            )
+            logger.info("Loaded {} messages for conversation {} from MongoDB", len(documents), conversation_id)
+
+    def get_conversation(self, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get all messages for a conversation from the hot tier."""
+        return self.hot_tier.get_conversation(conversation_id)
+
+    def get_version(self, conversation_id: str) -> Optional[str]:
+        """Get the version tag of a conversation from the hot tier."""
+        return self.hot_tier.get_version(conversation_id)
+
+    def get_conversation_page(self,
+                              conversation_id: str,
+                              cursor: Optional[int] = None,
+                              since: Optional[float] = None,
+                              limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get a page of a conversation's messages from the hot tier."""
+        return self.hot_tier.get_conversation_page(conversation_id, cursor, since, limit)
+
+    def get_conversation_messages_for_llm(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        """Get role/content messages for the LLM from the hot tier."""
+        return self.hot_tier.get_conversation_messages_for_llm(conversation_id)
+
+    def get_message_offset(self, conversation_id: str) -> int:
+        """Get how many of a conversation's oldest messages the hot tier has trimmed."""
+        return self.hot_tier.get_message_offset(conversation_id)
+
+    def get_all_conversations(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Get all conversations currently held in the hot tier."""
+        return self.hot_tier.get_all_conversations()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hot-tier and write-behind statistics.
+
+        Returns:
+            Dictionary with hot-tier usage and persistence counters
+        """
+        stats = self.hot_tier.get_stats()
+        stats["write_behind"] = dict(self.write_stats, pending=len(self._pending))
+        return stats
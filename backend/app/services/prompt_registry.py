@@ -0,0 +1,228 @@
+"""
+Prompt Registry - Loads prompt templates from disk and caches the rendered system messages.
+"""
+import string
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+from app.config import settings
+from app.services.roles_service import RolesService
+from app.utils.logging_utils import get_logger
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Template for the role system prompt; "role_system.<Role>" overrides it for one role
+ROLE_SYSTEM_TEMPLATE = "role_system"
+
+# File extension of prompt templates
+TEMPLATE_SUFFIX = ".txt"
+
+
+class PromptTemplate:
+    """A prompt template parsed once, with the names of the fields it needs."""
+
+    __slots__ = ("name", "text", "fields")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.fields = frozenset(
+            field for _, field, _, _ in string.Formatter().parse(text) if field
+        )
+
+    def render(self, **values: Any) -> str:
+        """
+        Fill in the template.
+
+        Args:
+            **values: Values for the template's fields
+
+        Returns:
+            The rendered prompt
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        if not self.fields:
+            return self.text
+        return self.text.format(**values)
+
+
+class PromptRegistry:
+    """
+    Registry of the prompt templates in the prompts directory.
+
+    Templates are read and parsed once. The system message of every
+    available role is rendered up front and the same message object is
+    reused for each request, so the leading system prompt is byte-identical
+    across requests and provider-side prompt caching can reuse it. With hot
+    reload enabled the directory is checked for changes at most once per
+    reload interval and the templates and role messages are rebuilt when a
+    file changed.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, hot_reload: Optional[bool] = None):
+        """
+        Initialize the registry and load the templates.
+
+        Args:
+            directory: Directory holding the *.txt templates, defaults to the configured one
+            hot_reload: Whether to pick up edited templates, defaults to the configured value
+        """
+        self.directory = Path(directory or settings.prompts_dir)
+        self.hot_reload = settings.prompt_hot_reload if hot_reload is None else hot_reload
+        self.reload_interval = settings.prompt_reload_interval_seconds
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._role_prompts: Dict[str, str] = {}
+        self._role_messages: Dict[str, "BaseMessage"] = {}
+        self._fingerprint: Tuple[Tuple[str, int, int], ...] = ()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def _scan(self) -> Tuple[Tuple[str, int, int], ...]:
+        """Get the name, size and modification time of every template file."""
+        return tuple(sorted(
+            (path.name, stat.st_size, stat.st_mtime_ns)
+            for path in self.directory.glob(f"*{TEMPLATE_SUFFIX}")
+            for stat in (path.stat(),)
+        ))
+
+    def load(self) -> None:
+        """
+        Read and parse every template, then render the role system messages.
+
+        Raises:
+            FileNotFoundError: If the prompts directory does not exist
+            KeyError: If the role system template is missing
+        """
+        if not self.directory.is_dir():
+            raise FileNotFoundError(f"Prompts directory not found: {self.directory}")
+        fingerprint = self._scan()
+        templates = {}
+        for path in sorted(self.directory.glob(f"*{TEMPLATE_SUFFIX}")):
+            # Drop the file's trailing newline so prompts render exactly as written
+            name = path.name[:-len(TEMPLATE_SUFFIX)]
+            templates[name] = PromptTemplate(name, path.read_text(encoding="utf-8").rstrip("\n"))
+        if ROLE_SYSTEM_TEMPLATE not in templates:
+            raise KeyError(f"Prompt template not found: {ROLE_SYSTEM_TEMPLATE}")
+
+        role_prompts = {role: self._render_role(templates, role) for role in RolesService.AVAILABLE_ROLES}
+        from langchain_core.messages import SystemMessage
+        role_messages = {role: SystemMessage(content=prompt) for role, prompt in role_prompts.items()}
+
+        with self._lock:
+            self._templates = templates
+            self._role_prompts = role_prompts
+            self._role_messages = role_messages
+            self._fingerprint = fingerprint
+            self._checked_at = time.monotonic()
+        logger.info("Loaded {} prompt templates from {}", len(templates), self.directory)
+
+    @staticmethod
+    def _render_role(templates: Dict[str, PromptTemplate], role: str) -> str:
+        """Render a role's system prompt from its own template or the shared one."""
+        template = templates.get(f"{ROLE_SYSTEM_TEMPLATE}.{role}") or templates[ROLE_SYSTEM_TEMPLATE]
+        return template.render(role=role)
+
+    def _maybe_reload(self) -> None:
+        """Reload the templates if hot reload is on and a file changed since the last check."""
+        if not self.hot_reload:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            if self._scan() != self._fingerprint:
+                logger.info("Prompt templates changed, reloading")
+                self.load()
+        except Exception as e:
+            # Keep serving the last good templates
+            logger.error("Error reloading prompt templates: {}", str(e))
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        Get a template by name.
+
+        Args:
+            name: Template file name without the extension
+
+        Returns:
+            The parsed template
+
+        Raises:
+            KeyError: If no such template exists
+        """
+        self._maybe_reload()
+        return self._templates[name]
+
+    def render(self, name: str, **values: Any) -> str:
+        """
+        Render a template by name.
+
+        Args:
+            name: Template file name without the extension
+            **values: Values for the template's fields
+
+        Returns:
+            The rendered prompt
+        """
+        return self.get(name).render(**values)
+
+    def system_prompt(self, role: Optional[str]) -> Optional[str]:
+        """
+        Get the system prompt for a role.
+
+        Args:
+            role: Optional role to contextualize the response
+
+        Returns:
+            The system prompt, or None if no role was given
+        """
+        if not role:
+            return None
+        self._maybe_reload()
+        prompt = self._role_prompts.get(role)
+        return prompt if prompt is not None else self._render_role(self._templates, role)
+
+    def system_message(self, role: Optional[str]) -> Optional["BaseMessage"]:
+        """
+        Get the system message for a role.
+
+        Available roles get their precomputed message; other roles are
+        rendered on each call.
+
+        Args:
+            role: Optional role to contextualize the response
+
+        Returns:
+            The system message, or None if no role was given
+        """
+        if not role:
+            return None
+        self._maybe_reload()
+        message = self._role_messages.get(role)
+        if message is None:
+            from langchain_core.messages import SystemMessage
+            message = SystemMessage(content=self._render_role(self._templates, role))
+        return message
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the loaded templates and reload settings.
+
+        Returns:
+            Dictionary with the template names, precomputed roles and hot reload state
+        """
+        return {
+            "directory": str(self.directory),
+            "templates": sorted(self._templates),
+            "roles": sorted(self._role_messages),
+            "hot_reload": self.hot_reload,
+        }
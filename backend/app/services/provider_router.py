@@ -0,0 +1,333 @@
+"""
+Provider Router - Routes LLM calls across providers by observed latency and health.
+"""
+import asyncio
+from collections import deque
+import time
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import LLM_FALLBACKS, LLM_HEDGES
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Weight of the newest observation in the moving latency and error averages
+EWMA_ALPHA = 0.2
+
+# Latency samples kept per backend for the p95 hedge delay
+LATENCY_WINDOW = 200
+
+# Samples needed before the p95 replaces the configured hedge delay
+MIN_HEDGE_SAMPLES = 20
+
+# Floor on the success rate a backend's latency is divided by when ranking
+MIN_SUCCESS_RATE = 0.05
+
+
+class ProviderBackend:
+    """One provider/model pair, its client and moving latency/error statistics."""
+
+    def __init__(self, provider: str, model: str, llm: Any):
+        self.provider = provider
+        self.model = model
+        self.llm = llm
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def name(self) -> str:
+        """Provider and model, as reported in stats."""
+        return f"{self.provider}:{self.model}"
+
+    def is_healthy(self, now: float) -> bool:
+        """Check whether the backend is outside its failure cooldown."""
+        return now >= self.unhealthy_until
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        """
+        Record a successful call.
+
+        Args:
+            latency: Seconds the call took, if it should count towards the latency stats
+        """
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.error_rate *= 1 - EWMA_ALPHA
+        if latency is not None:
+            self.record_latency(latency)
+
+    def record_latency(self, latency: float) -> None:
+        """
+        Add a latency sample to the moving average and the p95 window.
+
+        Args:
+            latency: Seconds the call took, or had taken when it was abandoned
+        """
+        self.latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += EWMA_ALPHA * (latency - self.latency_ewma)
+
+    def record_failure(self, failure_threshold: int, cooldown: float) -> None:
+        """
+        Record a failed or timed-out call, taking the backend out of rotation
+        for the cooldown after too many consecutive failures.
+
+        Args:
+            failure_threshold: Consecutive failures that mark the backend unhealthy
+            cooldown: Seconds an unhealthy backend is skipped
+        """
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate += EWMA_ALPHA * (1.0 - self.error_rate)
+        if self.consecutive_failures >= failure_threshold:
+            self.unhealthy_until = time.monotonic() + cooldown
+            logger.warning("LLM backend {} marked unhealthy for {}s", self.name, cooldown)
+
+    def expected_latency(self) -> float:
+        """
+        Moving average latency per successful answer.
+
+        A failed call is retried on another backend, so the latency is
+        scaled up by the error rate. A backend without latency samples ranks
+        as fastest so it gets tried.
+        """
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma / max(1.0 - self.error_rate, MIN_SUCCESS_RATE)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of recent latencies, or None without enough samples."""
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the backend's statistics."""
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "healthy": self.is_healthy(time.monotonic()),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2) if self.latency_ewma is not None else None,
+            "latency_p95_ms": round(self.p95() * 1000, 2) if self.p95() is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class RouteResult:
+    """The response of a routed call and how it was obtained."""
+
+    __slots__ = ("response", "backend", "hedged", "fallback")
+
+    def __init__(self, response: Any, backend: ProviderBackend, hedged: bool, fallback: bool):
+        self.response = response
+        self.backend = backend
+        self.hedged = hedged
+        self.fallback = fallback
+
+
+class ProviderRouter:
+    """
+    Routes LLM calls to the fastest healthy backend.
+
+    Backends are ranked by their moving average latency, penalized by their
+    moving error rate; backends that
+    failed repeatedly sit out a cooldown and are only used as a last resort.
+    A call that fails or times out falls back to the next backend. When
+    hedging is enabled and the chosen backend has not answered within its
+    p95 latency, the same request is also sent to the next backend and the
+    first answer wins.
+    """
+
+    def __init__(self, backends: List[ProviderBackend]):
+        """
+        Initialize the router.
+
+        Args:
+            backends: Backends in configured order of preference
+        """
+        self.backends = backends
+        self.hedge_enabled = settings.llm_hedge_enabled and len(backends) > 1
+        self.hedge_delay = settings.llm_hedge_delay_seconds
+        self.failure_threshold = settings.llm_router_failure_threshold
+        self.cooldown = settings.llm_router_cooldown_seconds
+        logger.info(
+            "Provider router initialized - backends: {}, hedging: {}",
+            [backend.name for backend in backends], self.hedge_enabled,
+        )
+
+    def ranked(self) -> List[ProviderBackend]:
+        """
+        Order the backends for a call.
+
+        Healthy backends come first, by latency penalized by their error
+        rate (see ProviderBackend.expected_latency). Ties keep the
+        configured order.
+
+        Returns:
+            Backends in the order they should be tried
+        """
+        now = time.monotonic()
+        healthy = [backend for backend in self.backends if backend.is_healthy(now)]
+        unhealthy = [backend for backend in self.backends if not backend.is_healthy(now)]
+        healthy.sort(key=ProviderBackend.expected_latency)
+        unhealthy.sort(key=lambda backend: backend.unhealthy_until)
+        return healthy + unhealthy
+
+    def _hedge_delay(self, backend: ProviderBackend) -> float:
+        """Seconds to wait for a backend before hedging, from its p95 latency."""
+        p95 = backend.p95()
+        return p95 if p95 is not None else self.hedge_delay
+
+    async def attempt(self, backend: ProviderBackend, messages: List[Any], timeout: float) -> Any:
+        """Call one backend, without fallback, and record the outcome in its statistics."""
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(backend.llm.ainvoke(messages), timeout=timeout)
+        except asyncio.CancelledError:
+            # Another backend answered first. The elapsed time is a lower bound
+            # on this backend's latency; recording it keeps a backend that keeps
+            # losing hedges from ranking as fast forever.
+            backend.record_latency(time.perf_counter() - started)
+            raise
+        except Exception:
+            backend.record_failure(self.failure_threshold, self.cooldown)
+            raise
+        backend.record_success(time.perf_counter() - started)
+        return response
+
+    async def ainvoke(self, messages: List[Any], timeout: float) -> RouteResult:
+        """
+        Invoke the best backend, hedging and falling back as configured.
+
+        Args:
+            messages: The messages to send
+            timeout: Timeout in seconds for each backend attempt
+
+        Returns:
+            RouteResult with the response and the backend that produced it
+
+        Raises:
+            Exception: The last backend's error if every backend failed
+        """
+        candidates = self.ranked()
+        first = candidates[0]
+        queue = list(candidates)
+        pending: Dict[asyncio.Future, ProviderBackend] = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> ProviderBackend:
+            backend = queue.pop(0)
+            pending[asyncio.ensure_future(self.attempt(backend, messages, timeout))] = backend
+            return backend
+
+        launch()
+        try:
+            while pending:
+                wait_timeout = None
+                if self.hedge_enabled and not hedged and queue and len(pending) == 1:
+                    wait_timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    backend = launch()
+                    LLM_HEDGES.inc(provider=backend.provider)
+                    logger.info("Hedging LLM request to {} after {:.3f}s", backend.name, wait_timeout)
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("LLM backend {} failed: {}", backend.name, repr(e))
+                        continue
+                    if backend is not first:
+                        LLM_FALLBACKS.inc(provider=backend.provider)
+                    return RouteResult(response, backend, hedged, backend is not first)
+                if not pending and queue:
+                    logger.info("Falling back to LLM backend {}", queue[0].name)
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+
+    async def astream(self, messages: List[Any], timeout: float) -> AsyncIterator[Tuple[ProviderBackend, Any]]:
+        """
+        Stream from the best backend, falling back until one produces a chunk.
+
+        Once a backend has produced its first chunk the stream is committed to
+        it; later failures are raised to the caller. The timeout applies to
+        the wait for each chunk.
+
+        Args:
+            messages: The messages to send
+            timeout: Per-chunk timeout in seconds
+
+        Yields:
+            Tuples of the serving backend and each chunk
+
+        Raises:
+            Exception: The last backend's error if no backend produced a chunk
+        """
+        candidates = self.ranked()
+        last_error: Optional[BaseException] = None
+        for backend in candidates:
+            stream = backend.llm.astream(messages).__aiter__()
+            try:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    backend.record_success()
+                    return
+                except Exception as e:
+                    backend.record_failure(self.failure_threshold, self.cooldown)
+                    last_error = e
+                    logger.warning("LLM backend {} failed to start streaming: {}", backend.name, repr(e))
+                    continue
+                if backend is not candidates[0]:
+                    LLM_FALLBACKS.inc(provider=backend.provider)
+                yield backend, chunk
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    except Exception:
+                        backend.record_failure(self.failure_threshold, self.cooldown)
+                        raise
+                    yield backend, chunk
+                backend.record_success()
+                return
+            finally:
+                await stream.aclose()
+        raise last_error
+
+    def select(self) -> ProviderBackend:
+        """Get the backend calls would currently be sent to first."""
+        return self.ranked()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-backend routing statistics.
+
+        Returns:
+            Dictionary with the backends in current ranking order and the hedging settings
+        """
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "backends": [backend.get_stats() for backend in self.ranked()],
+        }
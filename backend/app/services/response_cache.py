@@ -0,0 +1,208 @@
+"""
+Response Cache - Caches LLM responses for repeated prompts.
+"""
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Disk-tier writes between purges of expired entries
+EXPIRE_EVERY_WRITES = 256
+
+
+def _normalize(text: str) -> str:
+    """Normalize message text so trivially different prompts share a key."""
+    return " ".join(text.split()).casefold()
+
+
+class ResponseCache:
+    """
+    Two-tier TTL cache of LLM responses.
+
+    Entries are kept in an in-memory LRU and, when a cache directory is
+    configured, in an SQLite file that survives restarts. Keys cover the
+    provider, model, system prompt and normalized message list, so a hit is
+    only served for an equivalent prompt. Expired disk entries are never
+    served and are purged every EXPIRE_EVERY_WRITES writes.
+    """
+
+    def __init__(self):
+        """Initialize the response cache from settings."""
+        self.enabled = settings.response_cache_enabled
+        self.ttl = settings.response_cache_ttl_seconds
+        self.max_entries = settings.response_cache_max_entries
+        self.disabled_roles = set(settings.response_cache_disabled_roles)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+        if self.enabled and settings.response_cache_dir:
+            cache_dir = Path(settings.response_cache_dir)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self._disk = sqlite3.connect(cache_dir / "responses.sqlite", check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            self._disk.commit()
+            logger.info("Response cache disk tier at: {}", cache_dir.absolute())
+        logger.info("Response cache initialized - enabled: {}, ttl: {}s", self.enabled, self.ttl)
+
+    def is_enabled_for(self, role: Optional[str]) -> bool:
+        """
+        Check whether responses for a role may be cached.
+
+        Args:
+            role: The role of the request, if any
+
+        Returns:
+            True if caching applies to the role
+        """
+        return self.enabled and role not in self.disabled_roles
+
+    @staticmethod
+    def make_key(provider: str,
+                 model: str,
+                 system_prompt: Optional[str],
+                 messages: List[Dict[str, str]]) -> str:
+        """
+        Build a cache key for a prompt.
+
+        Args:
+            provider: The LLM provider name
+            model: The model name
+            system_prompt: The system prompt sent with the request, if any
+            messages: The role/content messages sent, including the query
+
+        Returns:
+            A hex digest identifying the prompt
+        """
+        payload = [
+            provider,
+            model,
+            system_prompt or "",
+            [(message["role"], _normalize(message["content"])) for message in messages],
+        ]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        """Read an entry from the disk tier."""
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _disk_set(self, key: str, expires_at: float, value: str) -> None:
+        """Write an entry to the disk tier, dropping expired ones every EXPIRE_EVERY_WRITES writes."""
+        with self._disk_lock:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._disk_writes += 1
+            expired = 0
+            if self._disk_writes % EXPIRE_EVERY_WRITES == 0:
+                expired = self._disk.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),)).rowcount
+            self._disk.commit()
+        if expired:
+            with self._lock:
+                self.stats["expired"] += expired
+
+    def _memory_set(self, key: str, expires_at: float, value: str) -> None:
+        """Store an entry in the in-memory LRU, evicting the oldest when full."""
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: The cache key from make_key()
+
+        Returns:
+            The cached response text, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        if self._disk is not None:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key)
+            except Exception as e:
+                logger.warning("Response cache disk read failed: {}", str(e))
+                entry = None
+            if entry is not None and entry[0] > now:
+                self._memory_set(key, entry[0], entry[1])
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return entry[1]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        """
+        Store a response in the cache.
+
+        Args:
+            key: The cache key from make_key()
+            value: The response text
+        """
+        expires_at = time.time() + self.ttl
+        self._memory_set(key, expires_at, value)
+        with self._lock:
+            self.stats["stores"] += 1
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk_set, key, expires_at, value)
+            except Exception as e:
+                logger.warning("Response cache disk write failed: {}", str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics.
+
+        Returns:
+            Dictionary with hit, miss and size counters and the hit ratio
+        """
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.close()
+            self._disk = None
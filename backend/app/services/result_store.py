@@ -0,0 +1,695 @@
+"""
+Result Store - Holds intermediate step results in columnar buffers, spilling large ones to disk.
+"""
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from array import array
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+from itertools import accumulate, compress, islice, repeat
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.config import settings
+from app.services.sql_executor import RowChunk
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# array typecode of each fixed-width column kind
+NUMERIC_TYPECODES = {"int": "q", "float": "d", "bool": "b"}
+
+# Exact value type a batch must have to be copied into a fixed-width column at once
+BATCH_TYPES = {"int": int, "float": float, "bool": bool}
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+# Variable-width kinds stored as their exact text, with the function that parses it back
+TEXT_KINDS: Dict[str, Optional[Callable[[str], Any]]] = {
+    "str": None,
+    "decimal": Decimal,
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "time": time.fromisoformat,
+}
+
+# Kind a column takes when values of two numeric kinds are mixed
+NUMERIC_WIDENING = {frozenset(("int", "float")): "float", frozenset(("int", "decimal")): "decimal"}
+
+# Rows transposed into columns at a time when building from rows
+BUILD_BATCH_ROWS = 1024
+
+# Spilled buffers start on 8-byte boundaries so they can be cast to 64-bit views
+BUFFER_ALIGNMENT = 8
+
+
+class Column:
+    """
+    One column of a result, backed by contiguous buffers.
+
+    Fixed-width kinds (int, float, bool) keep their values in a typed buffer.
+    Variable-width kinds keep UTF-8 bytes in one buffer and row boundaries
+    in an offsets buffer of length + 1: str, decimal and the temporal kinds
+    (datetime, date, time) as their exact text, and object as JSON for
+    values of any other type. A validity buffer with one byte per row
+    marks present values; it is None when the column has no nulls. Slicing
+    returns a Column over views of the same buffers, without copying.
+    """
+
+    __slots__ = ("name", "kind", "length", "data", "offsets", "validity")
+
+    def __init__(self,
+                 name: str,
+                 kind: str,
+                 length: int,
+                 data: memoryview,
+                 offsets: Optional[memoryview] = None,
+                 validity: Optional[memoryview] = None):
+        self.name = name
+        self.kind = kind
+        self.length = length
+        self.data = data
+        self.offsets = offsets
+        self.validity = validity
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column's buffers."""
+        return sum(buffer.nbytes for buffer in self.buffers())
+
+    def buffers(self) -> List[memoryview]:
+        """The column's buffers: data, then offsets and validity if present."""
+        return [buffer for buffer in (self.data, self.offsets, self.validity) if buffer is not None]
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("column index out of range")
+        if self.validity is not None and not self.validity[index]:
+            return None
+        if self.kind in NUMERIC_TYPECODES:
+            value = self.data[index]
+            return bool(value) if self.kind == "bool" else value
+        raw = self.data[self.offsets[index]:self.offsets[index + 1]]
+        return _decode(self.kind, str(raw, "utf-8"))
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self[index] for index in range(self.length))
+
+    def slice(self, start: int, stop: int) -> "Column":
+        """
+        Get rows [start, stop) as a view over the same buffers.
+
+        Args:
+            start: First row
+            stop: Row after the last one
+
+        Returns:
+            Column sharing this column's memory
+        """
+        start, stop, _ = slice(start, stop).indices(self.length)
+        stop = max(start, stop)
+        validity = self.validity[start:stop] if self.validity is not None else None
+        if self.kind in NUMERIC_TYPECODES:
+            return Column(self.name, self.kind, stop - start, self.data[start:stop], None, validity)
+        # Offsets stay absolute positions in the shared data buffer
+        return Column(self.name, self.kind, stop - start, self.data, self.offsets[start:stop + 1], validity)
+
+    def to_list(self, decode_objects: bool = True) -> List[Any]:
+        """
+        Get every value as a Python list, decoding the buffers in bulk.
+
+        Args:
+            decode_objects: Whether non-str values are decoded or returned as their stored text
+
+        Returns:
+            List of values with None for nulls
+        """
+        if self.kind in NUMERIC_TYPECODES:
+            values = list(map(bool, self.data)) if self.kind == "bool" else self.data.tolist()
+        else:
+            data = bytes(self.data[self.offsets[0]:self.offsets[self.length]]) if self.length else b""
+            base = self.offsets[0] if self.length else 0
+            starts = map(base.__rsub__, self.offsets[:self.length])
+            stops = map(base.__rsub__, self.offsets[1:self.length + 1])
+            values = list(map(str, map(data.__getitem__, map(slice, starts, stops)), repeat("utf-8")))
+            if self.kind != "str" and decode_objects:
+                # Null rows hold empty text, which does not parse
+                decode = _DECODERS[self.kind]
+                values = list(map(decode if self.validity is None else (lambda text: decode(text) if text else None), values))
+        if self.validity is not None:
+            values = [value if present else None for value, present in zip(values, self.validity)]
+        return values
+
+    def present(self) -> List[Any]:
+        """Get the non-null values as a Python list, decoded like to_list(decode_objects=False)."""
+        if self.validity is None:
+            return self.to_list(decode_objects=False)
+        validity, self.validity = self.validity, None
+        try:
+            return list(compress(self.to_list(decode_objects=False), validity))
+        finally:
+            self.validity = validity
+
+    def decode(self, text: str) -> Any:
+        """Parse the stored text of one of this variable-width column's values."""
+        return _decode(self.kind, text)
+
+    def values(self) -> memoryview:
+        """
+        Get the typed value buffer of a fixed-width column without copying.
+
+        Null rows hold 0 in this buffer; check validity to tell them apart.
+
+        Returns:
+            Memoryview of 64-bit ints, doubles or bool bytes
+
+        Raises:
+            TypeError: If the column is variable-width
+        """
+        if self.kind not in NUMERIC_TYPECODES:
+            raise TypeError(f"Column {self.name} of kind {self.kind} has no fixed-width values")
+        return self.data
+
+
+class ColumnarResult:
+    """A tabular step result stored column by column."""
+
+    __slots__ = ("columns", "row_count", "spill_path")
+
+    def __init__(self, columns: List[Column], row_count: int, spill_path: Optional[Path] = None):
+        self.columns = columns
+        self.row_count = row_count
+        self.spill_path = spill_path
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """Column names in order."""
+        return tuple(column.name for column in self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by every column's buffers."""
+        return sum(column.nbytes for column in self.columns)
+
+    def column(self, name: str) -> Column:
+        """
+        Get a column by name.
+
+        Raises:
+            KeyError: If the result has no such column
+        """
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError(name)
+
+    def slice(self, start: int, stop: int) -> "ColumnarResult":
+        """Get rows [start, stop) as a result sharing this result's memory."""
+        columns = [column.slice(start, stop) for column in self.columns]
+        return ColumnarResult(columns, len(columns[0]) if columns else 0, self.spill_path)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        """Iterate rows [start, stop) as tuples."""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        for index in range(start, stop):
+            yield tuple(column[index] for column in self.columns)
+
+    def to_dicts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get up to limit rows as dictionaries keyed by column name."""
+        names = self.names
+        return [dict(zip(names, row)) for row in self.rows(0, limit)]
+
+
+def _kind_of(value: Any) -> str:
+    """The column kind a non-null value belongs to."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, Decimal):
+        return "decimal"
+    # datetime is a subclass of date, so it is checked first
+    if isinstance(value, datetime):
+        return "datetime"
+    if isinstance(value, date):
+        return "date"
+    if isinstance(value, time):
+        return "time"
+    return "object"
+
+
+def _to_text(value: Any) -> str:
+    """Exact text of a decimal or temporal value."""
+    return str(value) if isinstance(value, (Decimal, int)) else value.isoformat()
+
+
+def _encode_default(value: Any) -> Any:
+    """JSON encoding of values json cannot encode; decimal and temporal values are tagged to decode exactly."""
+    kind = _kind_of(value)
+    if kind in TEXT_KINDS:
+        return {"$" + kind: _to_text(value)}
+    return str(value)
+
+
+def _decode_tagged(document: Dict[str, Any]) -> Any:
+    """Turn a tagged decimal or temporal value back into its type."""
+    if len(document) == 1:
+        (key, text), = document.items()
+        parse = TEXT_KINDS.get(key[1:]) if key.startswith("$") else None
+        if parse is not None and isinstance(text, str):
+            return parse(text)
+    return document
+
+
+def _encode_object(value: Any) -> str:
+    """Encode a value of an object column as JSON."""
+    return json.dumps(value, default=_encode_default)
+
+
+def _decode_object(text: str) -> Any:
+    """Decode a value of an object column."""
+    return json.loads(text, object_hook=_decode_tagged)
+
+
+# Function that parses the stored text of each variable-width kind
+_DECODERS: Dict[str, Callable[[str], Any]] = dict(
+    {kind: parse for kind, parse in TEXT_KINDS.items() if parse is not None}, object=_decode_object
+)
+
+
+def _decode(kind: str, text: str) -> Any:
+    """Parse the stored text of a variable-width value."""
+    return text if kind == "str" else _DECODERS[kind](text)
+
+
+class ColumnBuilder:
+    """
+    Appends values to one column's buffers, widening its kind when needed.
+
+    The kind is taken from the first non-null value. An int column becomes
+    float when a float arrives and decimal when a Decimal arrives; any other
+    mismatch (or an int too large for 64 bits) turns the column into
+    JSON-encoded objects. Decimals and temporal values stay exact in either
+    case.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._reset()
+
+    def _reset(self) -> None:
+        """Drop every appended value."""
+        self.kind: Optional[str] = None
+        self.length = 0
+        self.nulls = 0
+        self.validity = bytearray()
+        self.values: Optional[array] = None
+        self.blob: Optional[bytearray] = None
+        self.offsets: Optional[array] = None
+
+    def _start(self, kind: str) -> None:
+        """Create the buffers for a kind, with placeholders for the nulls seen so far."""
+        self.kind = kind
+        if kind in NUMERIC_TYPECODES:
+            self.values = array(NUMERIC_TYPECODES[kind], bytes(self.length * 8 if kind != "bool" else self.length))
+        else:
+            self.blob = bytearray()
+            self.offsets = array("q", [0] * (self.length + 1))
+
+    def _restart(self, kind: str) -> None:
+        """Rebuild the column as another kind from the values appended so far."""
+        existing = list(self.finish())
+        self._reset()
+        self._start(kind)
+        for value in existing:
+            self.append(value)
+
+    def append(self, value: Any) -> None:
+        """Append one value; None is stored as null."""
+        if value is None:
+            self.nulls += 1
+            self.validity.append(0)
+            # Before the kind is known, _start() adds the placeholders
+            if self.values is not None:
+                self.values.append(0)
+            elif self.offsets is not None:
+                self.offsets.append(len(self.blob))
+            self.length += 1
+            return
+
+        kind = _kind_of(value)
+        if self.kind is None:
+            self._start(kind)
+        elif kind != self.kind and self.kind != "object":
+            widened = NUMERIC_WIDENING.get(frozenset((self.kind, kind)))
+            if widened is None:
+                self._restart("object")
+            elif widened != self.kind:
+                self._restart(widened)
+
+        if self.values is not None:
+            try:
+                self.values.append(float(value) if self.kind == "float" else value)
+            except OverflowError:
+                self._restart("object")
+                self.append(value)
+                return
+        else:
+            if self.kind == "str":
+                text = value
+            elif self.kind == "object":
+                text = _encode_object(value)
+            else:
+                text = _to_text(value)
+            self.blob += text.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        self.validity.append(1)
+        self.length += 1
+
+    def extend(self, values: Sequence[Any]) -> None:
+        """
+        Append a batch of values.
+
+        A batch without nulls whose values all have the column's exact type
+        is added to the buffers in one operation; anything else goes through
+        append() value by value.
+        """
+        if self.kind is not None and values and None not in values:
+            types = set(map(type, values))
+            if self.kind in NUMERIC_TYPECODES and types == {BATCH_TYPES[self.kind]} and (
+                    self.kind != "int" or (INT64_MIN <= min(values) and max(values) <= INT64_MAX)):
+                self.values.extend(values)
+                self._extend_valid(len(values))
+                return
+            if self.kind == "str" and types == {str}:
+                start = len(self.blob)
+                encoded = [value.encode("utf-8") for value in values]
+                self.blob += b"".join(encoded)
+                self.offsets.extend(accumulate(map(len, encoded), initial=start))
+                # accumulate() repeats the starting offset, which is already stored
+                self.offsets.pop(len(self.offsets) - len(encoded) - 1)
+                self._extend_valid(len(values))
+                return
+        for value in values:
+            self.append(value)
+
+    def _extend_valid(self, count: int) -> None:
+        """Record count present values."""
+        self.validity += b"\x01" * count
+        self.length += count
+
+    def finish(self) -> Column:
+        """Get the column built so far; the builder must not be appended to afterwards."""
+        if self.kind is None:
+            # Only nulls (or no rows): store as an object column of nulls
+            self._start("object")
+        validity = memoryview(self.validity) if self.nulls else None
+        if self.values is not None:
+            return Column(self.name, self.kind, self.length, memoryview(self.values), None, validity)
+        return Column(self.name, self.kind, self.length, memoryview(self.blob), memoryview(self.offsets), validity)
+
+
+def build_result(names: Sequence[str], rows: Iterable[Sequence[Any]]) -> ColumnarResult:
+    """
+    Build a columnar result from rows.
+
+    Args:
+        names: Column names
+        rows: Row tuples in column order
+
+    Returns:
+        The columnar result
+    """
+    builders = [ColumnBuilder(name) for name in names]
+    count = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BUILD_BATCH_ROWS))
+        if not batch:
+            break
+        for builder, values in zip(builders, zip(*batch)):
+            builder.extend(values)
+        count += len(batch)
+    return ColumnarResult([builder.finish() for builder in builders], count)
+
+
+class _Entry:
+    """A stored result and the mapping backing it, if spilled."""
+
+    __slots__ = ("result", "mapping", "in_memory_bytes")
+
+    def __init__(self, result: ColumnarResult, mapping: Optional[mmap.mmap], in_memory_bytes: int):
+        self.result = result
+        self.mapping = mapping
+        self.in_memory_bytes = in_memory_bytes
+
+
+class ResultStore:
+    """
+    Store for the intermediate results of a query execution.
+
+    Results are grouped by execution context and kept in columnar buffers
+    rather than as per-row objects. A result larger than the spill threshold,
+    or one that would take the store past its memory budget, is written to a
+    file in a per-process directory and memory-mapped, so its pages are read
+    from disk on demand and can be dropped by the OS under memory pressure.
+    Slices of a stored result are views over its buffers and copy nothing.
+    All results of a context are evicted, and spill files deleted, when the
+    context ends.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Initialize the result store.
+
+        Args:
+            directory: Optional parent directory for spill files. Defaults to settings.result_store_dir.
+        """
+        self.root = Path(directory or settings.result_store_dir)
+        self.spill_bytes = settings.result_store_spill_bytes
+        self.max_memory_bytes = settings.result_store_max_memory_bytes
+        self._directory: Optional[Path] = None
+        self._contexts: Dict[str, Dict[str, _Entry]] = {}
+        self._lock = threading.Lock()
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.stats = {"stored": 0, "spilled": 0, "released_contexts": 0}
+        logger.info("Result store initialized - spill threshold: {} bytes, spill directory: {}", self.spill_bytes, self.root)
+
+    def _spill_directory(self) -> Path:
+        """Create this process's spill directory on first use."""
+        if self._directory is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._directory = Path(tempfile.mkdtemp(prefix=f"worker-{os.getpid()}-", dir=self.root))
+        return self._directory
+
+    def _spill(self, result: ColumnarResult) -> Tuple[ColumnarResult, mmap.mmap]:
+        """Write a result's buffers to a file and rebuild it over a read-only mapping."""
+        path = self._spill_directory() / f"{uuid.uuid4().hex}.col"
+        layout: List[List[Tuple[int, int, str]]] = []
+        position = 0
+        with open(path, "wb") as file:
+            for column in result.columns:
+                placements = []
+                for buffer in column.buffers():
+                    padding = -position % BUFFER_ALIGNMENT
+                    file.write(bytes(padding))
+                    position += padding
+                    file.write(buffer)
+                    placements.append((position, buffer.nbytes, buffer.format))
+                    position += buffer.nbytes
+                layout.append(placements)
+            if position == 0:
+                # mmap cannot map an empty file
+                file.write(bytes(BUFFER_ALIGNMENT))
+
+        with open(path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        columns = []
+        for column, placements in zip(result.columns, layout):
+            buffers = iter(view[offset:offset + size].cast(fmt) for offset, size, fmt in placements)
+            data = next(buffers)
+            offsets = next(buffers) if column.offsets is not None else None
+            validity = next(buffers) if column.validity is not None else None
+            columns.append(Column(column.name, column.kind, column.length, data, offsets, validity))
+        return ColumnarResult(columns, result.row_count, path), mapping
+
+    def put(self, context_id: str, key: str, result: ColumnarResult) -> ColumnarResult:
+        """
+        Store a result, spilling it to disk if it is large.
+
+        Args:
+            context_id: Execution context the result belongs to
+            key: Name of the result within the context, e.g. the step ID
+            result: The result to store
+
+        Returns:
+            The stored result, which is memory-mapped if it was spilled
+        """
+        size = result.nbytes
+        mapping = None
+        with self._lock:
+            # Reserve the budget under the lock, so concurrent puts cannot both fit into the same room
+            spill = size > self.spill_bytes or self.memory_bytes + size > self.max_memory_bytes
+            if not spill:
+                self.memory_bytes += size
+        if spill:
+            result, mapping = self._spill(result)
+        with self._lock:
+            previous = self._contexts.setdefault(context_id, {}).pop(key, None)
+            if previous is not None:
+                self._free(previous)
+            self._contexts[context_id][key] = _Entry(result, mapping, 0 if mapping else size)
+            self.stats["stored"] += 1
+            if mapping is not None:
+                self.stats["spilled"] += 1
+                self.spilled_bytes += size
+        logger.debug("Stored result {}/{} - rows: {}, bytes: {}, spilled: {}", context_id, key, len(result), size, mapping is not None)
+        return result
+
+    def put_rows(self, context_id: str, key: str, names: Sequence[str], rows: Iterable[Sequence[Any]]) -> ColumnarResult:
+        """
+        Build and store a result from rows.
+
+        Args:
+            context_id: Execution context the result belongs to
+            key: Name of the result within the context
+            names: Column names
+            rows: Row tuples in column order
+
+        Returns:
+            The stored result
+        """
+        return self.put(context_id, key, build_result(names, rows))
+
+    async def write(self, context_id: str, key: str, chunks: AsyncIterator[RowChunk]) -> ColumnarResult:
+        """
+        Build and store a result from a stream of row chunks.
+
+        Rows go straight into the column buffers as each chunk arrives, so
+        a streamed query result is never held as row objects.
+
+        Args:
+            context_id: Execution context the result belongs to
+            key: Name of the result within the context
+            chunks: Row chunks, e.g. from SQLExecutor.stream()
+
+        Returns:
+            The stored result
+        """
+        builders: Optional[List[ColumnBuilder]] = None
+        count = 0
+        async for chunk in chunks:
+            if builders is None:
+                builders = [ColumnBuilder(name) for name in chunk.columns]
+            for builder, values in zip(builders, zip(*chunk.rows)):
+                builder.extend(values)
+            count += len(chunk)
+        result = ColumnarResult([builder.finish() for builder in builders or []], count)
+        return await asyncio.to_thread(self.put, context_id, key, result)
+
+    def get(self, context_id: str, key: str) -> ColumnarResult:
+        """
+        Get a stored result.
+
+        Raises:
+            KeyError: If no such result is stored
+        """
+        return self._contexts[context_id][key].result
+
+    def keys(self, context_id: str) -> List[str]:
+        """Get the keys of the results stored for a context."""
+        return list(self._contexts.get(context_id, ()))
+
+    def _free(self, entry: _Entry) -> None:
+        """Release an entry's memory accounting, mapping and spill file."""
+        self.memory_bytes -= entry.in_memory_bytes
+        if entry.mapping is None:
+            return
+        self.spilled_bytes -= entry.result.nbytes
+        path = entry.result.spill_path
+        entry.result = None
+        try:
+            entry.mapping.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is unmapped when it is dropped
+            pass
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning("Could not remove spill file {}: {}", path, str(e))
+
+    def release(self, context_id: str) -> None:
+        """
+        Evict every result of a context and delete its spill files.
+
+        Args:
+            context_id: The execution context that ended
+        """
+        with self._lock:
+            entries = self._contexts.pop(context_id, {})
+            for entry in entries.values():
+                self._free(entry)
+            if entries:
+                self.stats["released_contexts"] += 1
+        logger.debug("Released {} results of context {}", len(entries), context_id)
+
+    @asynccontextmanager
+    async def context(self, context_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Scope results to a block, evicting them when it exits.
+
+        Args:
+            context_id: Optional context ID, generated if not given
+
+        Yields:
+            The context ID to store results under
+        """
+        context_id = context_id or uuid.uuid4().hex
+        try:
+            yield context_id
+        finally:
+            self.release(context_id)
+
+    def close(self) -> None:
+        """Evict every context and remove the spill directory."""
+        for context_id in list(self._contexts):
+            self.release(context_id)
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+        logger.info("Result store closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the store's size and counters.
+
+        Returns:
+            Dictionary with context and result counts, in-memory and spilled bytes and counters
+        """
+        return dict(
+            self.stats,
+            contexts=len(self._contexts),
+            results=sum(len(entries) for entries in self._contexts.values()),
+            memory_bytes=self.memory_bytes,
+            spilled_bytes=self.spilled_bytes,
+        )
@@ -25,7 +25,7 @@ class RolesService:
         Returns:
             List of available role names
         """
-        logger.info(f"Returning {len(cls.AVAILABLE_ROLES)} available roles")
+        logger.info("Returning {} available roles", len(cls.AVAILABLE_ROLES))
         return cls.AVAILABLE_ROLES
 
     @classmethod
@@ -41,5 +41,5 @@ class RolesService:
         """
         is_valid = role in cls.AVAILABLE_ROLES
         if not is_valid:
-            logger.warning(f"Invalid role requested: {role}")
+            logger.warning("Invalid role requested: {}", role)
         return is_valid
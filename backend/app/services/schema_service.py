@@ -0,0 +1,454 @@
+"""
+Schema Service - Caches database schema metadata for query planning.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.services.sql_executor import SQLExecutor
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# Bumped when the snapshot layout changes; older snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+# One cheap query per dialect returning (table, fingerprint) rows. A table's
+# fingerprint changes whenever its columns or constraints change, so only those
+# tables need to be introspected again.
+FINGERPRINT_QUERIES = {
+    "sqlite": (
+        "SELECT name, sql FROM sqlite_master "
+        "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+    ),
+    "postgresql": (
+        "SELECT t.table_name, md5(coalesce(c.fp, '') || '|' || coalesce(k.fp, '')) "
+        "FROM information_schema.tables t "
+        "LEFT JOIN (SELECT table_name, string_agg(column_name || ':' || data_type || ':' || is_nullable, ',' "
+        "ORDER BY ordinal_position) AS fp FROM information_schema.columns "
+        "WHERE table_schema = coalesce(:schema, current_schema()) GROUP BY table_name) c "
+        "ON c.table_name = t.table_name "
+        "LEFT JOIN (SELECT table_name, string_agg(constraint_name || ':' || constraint_type, ',' "
+        "ORDER BY constraint_name) AS fp FROM information_schema.table_constraints "
+        "WHERE table_schema = coalesce(:schema, current_schema()) GROUP BY table_name) k "
+        "ON k.table_name = t.table_name "
+        "WHERE t.table_schema = coalesce(:schema, current_schema())"
+    ),
+    "mysql": (
+        "SELECT t.table_name, md5(concat(coalesce(c.fp, ''), '|', coalesce(k.fp, ''))) "
+        "FROM information_schema.tables t "
+        "LEFT JOIN (SELECT table_name, group_concat(concat(column_name, ':', column_type, ':', is_nullable) "
+        "ORDER BY ordinal_position) AS fp FROM information_schema.columns "
+        "WHERE table_schema = coalesce(:schema, database()) GROUP BY table_name) c "
+        "ON c.table_name = t.table_name "
+        "LEFT JOIN (SELECT table_name, group_concat(concat(constraint_name, ':', constraint_type) "
+        "ORDER BY constraint_name) AS fp FROM information_schema.table_constraints "
+        "WHERE table_schema = coalesce(:schema, database()) GROUP BY table_name) k "
+        "ON k.table_name = t.table_name "
+        "WHERE t.table_schema = coalesce(:schema, database())"
+    ),
+}
+
+
+class ColumnInfo:
+    """A column's name, type, nullability and primary-key membership."""
+
+    __slots__ = ("name", "type", "nullable", "primary_key")
+
+    def __init__(self, name: str, type: str, nullable: bool, primary_key: bool):
+        self.name = name
+        self.type = type
+        self.nullable = nullable
+        self.primary_key = primary_key
+
+
+class ForeignKey:
+    """A foreign key from columns of one table to columns of another."""
+
+    __slots__ = ("columns", "referred_table", "referred_columns")
+
+    def __init__(self, columns: Tuple[str, ...], referred_table: str, referred_columns: Tuple[str, ...]):
+        self.columns = columns
+        self.referred_table = referred_table
+        self.referred_columns = referred_columns
+
+
+class TableInfo:
+    """A table's columns and foreign keys, with the fingerprint they were read at."""
+
+    __slots__ = ("name", "columns", "foreign_keys", "fingerprint")
+
+    def __init__(self,
+                 name: str,
+                 columns: List[ColumnInfo],
+                 foreign_keys: List[ForeignKey],
+                 fingerprint: Optional[str]):
+        self.name = name
+        self.columns = columns
+        self.foreign_keys = foreign_keys
+        self.fingerprint = fingerprint
+
+    def get_column(self, name: str) -> Optional[ColumnInfo]:
+        """Get a column by case-insensitive name."""
+        name = name.lower()
+        return next((column for column in self.columns if column.name.lower() == name), None)
+
+    def describe(self) -> str:
+        """
+        Render the table as one compact line for an LLM prompt.
+
+        Returns:
+            Text like "orders(id INTEGER PK, customer_id INTEGER -> customers.id)"
+        """
+        references = {
+            column: f"{key.referred_table}.{referred}"
+            for key in self.foreign_keys
+            for column, referred in zip(key.columns, key.referred_columns)
+        }
+        parts = []
+        for column in self.columns:
+            part = f"{column.name} {column.type}"
+            if column.primary_key:
+                part += " PK"
+            if column.name in references:
+                part += f" -> {references[column.name]}"
+            parts.append(part)
+        return f"{self.name}({', '.join(parts)})"
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Get the table as JSON-serializable data."""
+        return {
+            "name": self.name,
+            "fingerprint": self.fingerprint,
+            "columns": [[c.name, c.type, c.nullable, c.primary_key] for c in self.columns],
+            "foreign_keys": [[list(k.columns), k.referred_table, list(k.referred_columns)] for k in self.foreign_keys],
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "TableInfo":
+        """Rebuild a table from to_snapshot() data."""
+        return cls(
+            data["name"],
+            [ColumnInfo(*column) for column in data["columns"]],
+            [ForeignKey(tuple(columns), table, tuple(referred)) for columns, table, referred in data["foreign_keys"]],
+            data["fingerprint"],
+        )
+
+
+class SchemaService:
+    """
+    Cached schema metadata of the reporting database.
+
+    The schema is introspected once and kept as a compact in-memory index:
+    tables by lower-cased name and, for each lower-cased column name, the
+    tables that have it. A snapshot is written to disk after every change
+    and loaded on startup, so a restarted worker can answer lookups before
+    it has talked to the database.
+
+    Refreshes are incremental. One fingerprint query returns a checksum of
+    every table's columns and constraints; only new or changed tables are
+    introspected again and dropped tables are removed. A refresh runs in the
+    background when the index is older than the TTL, while lookups keep
+    using the current index.
+    """
+
+    def __init__(self, executor: SQLExecutor, snapshot_path: Optional[str] = None):
+        """
+        Initialize the schema service.
+
+        Args:
+            executor: SQL executor whose engine is introspected
+            snapshot_path: Optional snapshot file. Defaults to settings.schema_snapshot_path.
+        """
+        self.executor = executor
+        self.schema = settings.sql_schema or None
+        self.ttl = settings.schema_refresh_ttl_seconds
+        self.snapshot_path = Path(snapshot_path or settings.schema_snapshot_path)
+        # Snapshots are only reused for the same database; the password is not part of the key
+        source = executor.engine.url.render_as_string(hide_password=True)
+        self.source = hashlib.sha256(f"{source}|{self.schema}".encode()).hexdigest()[:16]
+        self._tables: Dict[str, TableInfo] = {}
+        self._columns: Dict[str, List[str]] = {}
+        self.refreshed_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {"refreshes": 0, "tables_introspected": 0, "tables_dropped": 0, "failed_refreshes": 0}
+
+    async def start(self) -> None:
+        """Load the snapshot, or introspect the database if there is none."""
+        if not await asyncio.to_thread(self._load_snapshot):
+            await self.refresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+
+    async def close(self) -> None:
+        """Wait for a running background refresh to finish."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+
+    def is_stale(self) -> bool:
+        """Check whether the index is older than the refresh TTL."""
+        return time.time() - self.refreshed_at >= self.ttl
+
+    def _refresh_in_background(self) -> None:
+        """Start a refresh unless one is already running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    def _index(self, tables: Dict[str, TableInfo]) -> None:
+        """Replace the table and column indexes."""
+        columns: Dict[str, List[str]] = {}
+        for key, table in tables.items():
+            for column in table.columns:
+                columns.setdefault(column.name.lower(), []).append(key)
+        self._tables = tables
+        self._columns = columns
+
+    async def _fingerprints(self) -> Optional[Dict[str, Optional[str]]]:
+        """Get every table's fingerprint, or None if the dialect has no fingerprint query."""
+        query = FINGERPRINT_QUERIES.get(self.executor.dialect)
+        if query is None:
+            return None
+        params = {"schema": self.schema} if ":schema" in query else None
+        _, rows, _ = await self.executor.fetch(query, params, max_rows=1_000_000)
+        fingerprints = {}
+        for name, fingerprint in rows:
+            if fingerprint is not None and self.executor.dialect == "sqlite":
+                fingerprint = hashlib.md5(fingerprint.encode()).hexdigest()
+            fingerprints[name] = fingerprint
+        return fingerprints
+
+    async def _introspect(self, names: Optional[Iterable[str]]) -> Tuple[List[str], Dict[str, TableInfo]]:
+        """
+        Read table metadata through the SQLAlchemy inspector.
+
+        Args:
+            names: Tables to introspect, or None for every table
+
+        Returns:
+            Tuple of every table name in the schema and the introspected tables
+        """
+        from sqlalchemy import inspect
+
+        schema = self.schema
+
+        def read(sync_connection: Any) -> Tuple[List[str], Dict[str, TableInfo]]:
+            inspector = inspect(sync_connection)
+            all_names = inspector.get_table_names(schema=schema) + inspector.get_view_names(schema=schema)
+            tables = {}
+            for name in (all_names if names is None else [n for n in names if n in all_names]):
+                primary_key = set(inspector.get_pk_constraint(name, schema=schema).get("constrained_columns") or [])
+                columns = [
+                    ColumnInfo(column["name"], str(column["type"]), bool(column["nullable"]), column["name"] in primary_key)
+                    for column in inspector.get_columns(name, schema=schema)
+                ]
+                foreign_keys = [
+                    ForeignKey(tuple(key["constrained_columns"]), key["referred_table"], tuple(key["referred_columns"]))
+                    for key in inspector.get_foreign_keys(name, schema=schema)
+                ]
+                tables[name] = TableInfo(name, columns, foreign_keys, None)
+            return all_names, tables
+
+        async with self.executor.engine.connect() as connection:
+            return await connection.run_sync(read)
+
+    async def refresh(self) -> bool:
+        """
+        Bring the index up to date with the database.
+
+        Concurrent calls share one refresh. Failures are logged and the
+        current index is kept.
+
+        Returns:
+            True if any table was added, changed or dropped
+        """
+        async with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                fingerprints = await self._fingerprints()
+                current = {table.name: table for table in self._tables.values()}
+                if fingerprints is None:
+                    # Without fingerprints every table is read again
+                    names, changed_tables = await self._introspect(None)
+                    changed = set(changed_tables)
+                else:
+                    names = list(fingerprints)
+                    changed = {
+                        name for name, fingerprint in fingerprints.items()
+                        if fingerprint is None or name not in current or current[name].fingerprint != fingerprint
+                    }
+                    _, changed_tables = await self._introspect(changed) if changed else ([], {})
+                    for name, table in changed_tables.items():
+                        table.fingerprint = fingerprints[name]
+                dropped = set(current) - set(names)
+                if not changed and not dropped:
+                    self.refreshed_at = time.time()
+                    return False
+
+                tables = {name: table for name, table in current.items() if name not in dropped}
+                tables.update(changed_tables)
+                self._index({name.lower(): table for name, table in sorted(tables.items())})
+                self.refreshed_at = time.time()
+                self.stats["refreshes"] += 1
+                self.stats["tables_introspected"] += len(changed_tables)
+                self.stats["tables_dropped"] += len(dropped)
+                await asyncio.to_thread(self._save_snapshot)
+                logger.info(
+                    "Schema refreshed in {:.1f}ms - {} tables, {} introspected, {} dropped",
+                    (time.perf_counter() - started) * 1000, len(tables), len(changed_tables), len(dropped),
+                )
+                return True
+            except Exception as e:
+                self.stats["failed_refreshes"] += 1
+                logger.error("Error refreshing schema metadata: {}", str(e))
+                return False
+
+    def _save_snapshot(self) -> None:
+        """Write the index to the snapshot file atomically."""
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "source": self.source,
+            "refreshed_at": self.refreshed_at,
+            "tables": [table.to_snapshot() for table in self._tables.values()],
+        }
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.snapshot_path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(temporary, self.snapshot_path)
+        except OSError as e:
+            logger.warning("Could not write schema snapshot {}: {}", self.snapshot_path, str(e))
+
+    def _load_snapshot(self) -> bool:
+        """Load the index from the snapshot file if it belongs to this database."""
+        try:
+            data = json.loads(self.snapshot_path.read_text())
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable schema snapshot {}: {}", self.snapshot_path, str(e))
+            return False
+        if data.get("version") != SNAPSHOT_VERSION or data.get("source") != self.source:
+            logger.info("Ignoring schema snapshot from another database or version")
+            return False
+        tables = [TableInfo.from_snapshot(table) for table in data["tables"]]
+        self._index({table.name.lower(): table for table in tables})
+        self.refreshed_at = data["refreshed_at"]
+        logger.info("Loaded schema snapshot with {} tables", len(tables))
+        return True
+
+    def _check_stale(self) -> None:
+        """Schedule a background refresh if the index is past its TTL."""
+        if self.is_stale():
+            try:
+                self._refresh_in_background()
+            except RuntimeError:
+                # No running event loop; the next async caller will refresh
+                pass
+
+    def get_table(self, name: str) -> Optional[TableInfo]:
+        """
+        Look up a table by case-insensitive name.
+
+        Args:
+            name: Table name
+
+        Returns:
+            The table, or None if there is no such table
+        """
+        self._check_stale()
+        return self._tables.get(name.lower())
+
+    def find_column(self, name: str) -> List[Tuple[TableInfo, ColumnInfo]]:
+        """
+        Find every table that has a column of this name.
+
+        Args:
+            name: Case-insensitive column name
+
+        Returns:
+            List of (table, column) pairs
+        """
+        self._check_stale()
+        tables = (self._tables[key] for key in self._columns.get(name.lower(), ()))
+        return [(table, table.get_column(name)) for table in tables]
+
+    def search(self, term: str, limit: int = 20) -> List[TableInfo]:
+        """
+        Find tables whose name or column names contain a term.
+
+        Args:
+            term: Case-insensitive substring
+            limit: Maximum tables to return
+
+        Returns:
+            Matching tables, table-name matches first
+        """
+        self._check_stale()
+        term = term.lower()
+        matches = [key for key in self._tables if term in key]
+        seen = set(matches)
+        for column, keys in self._columns.items():
+            if term in column:
+                for key in keys:
+                    if key not in seen:
+                        seen.add(key)
+                        matches.append(key)
+        return [self._tables[key] for key in matches[:limit]]
+
+    def relationships(self, name: str) -> List[Tuple[str, ForeignKey]]:
+        """
+        Get the foreign keys from and to a table.
+
+        Args:
+            name: Case-insensitive table name
+
+        Returns:
+            List of (owning table name, foreign key) pairs
+        """
+        self._check_stale()
+        name = name.lower()
+        return [
+            (table.name, key)
+            for key_name, table in self._tables.items()
+            for key in table.foreign_keys
+            if key_name == name or key.referred_table.lower() == name
+        ]
+
+    def describe(self, names: Optional[Iterable[str]] = None) -> str:
+        """
+        Render tables as compact lines for an LLM prompt.
+
+        Args:
+            names: Tables to include, defaults to every table
+
+        Returns:
+            One line per table
+        """
+        self._check_stale()
+        tables = self._tables.values() if names is None else filter(None, map(self.get_table, names))
+        return "\n".join(table.describe() for table in tables)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the index size and refresh counters.
+
+        Returns:
+            Dictionary with table and column counts, the index age and refresh counters
+        """
+        return dict(
+            self.stats,
+            tables=len(self._tables),
+            columns=sum(len(table.columns) for table in self._tables.values()),
+            age_seconds=round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            snapshot=str(self.snapshot_path),
+        )
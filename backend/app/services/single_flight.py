@@ -0,0 +1,57 @@
+"""
+Single Flight - Coalesces identical concurrent calls into one.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same result instead of starting their own. The call
+    runs as a task, so it completes for the remaining callers even if the
+    one that started it is cancelled.
+    """
+
+    def __init__(self):
+        """Initialize the single-flight group."""
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identifies equivalent calls
+            fn: Coroutine function performing the call
+
+        Returns:
+            Tuple of the call result and whether it was shared from another caller
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.stats["coalesced"] += 1
+            logger.debug("Joining in-flight call {}", key[:12])
+        else:
+            self.stats["calls"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get call counters.
+
+        Returns:
+            Dictionary with started, coalesced and in-flight call counts
+        """
+        return dict(self.stats, in_flight=len(self._calls))
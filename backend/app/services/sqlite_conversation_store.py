@@ -0,0 +1,432 @@
+"""
+SQLite Conversation Store - Conversation history shared by all worker processes on a host.
+"""
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.conversation_store import StoredMessage, message_timestamp
+from app.utils.logging_utils import get_logger
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    appended INTEGER NOT NULL,
+    epoch INTEGER NOT NULL,
+    last_write REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_last_write ON conversations (last_write);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class _CachedConversation:
+    """Messages of a conversation as last read by this process, and the version they reflect."""
+
+    __slots__ = ("epoch", "appended", "messages")
+
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.appended = 0
+        self.messages: List[StoredMessage] = []
+
+    @property
+    def version(self) -> str:
+        """Version tag of the cached state."""
+        return f"{self.epoch:x}-{self.appended}"
+
+
+class SQLiteConversationStore:
+    """
+    Conversation store shared by every worker process on a host.
+
+    Conversations live in an SQLite database in WAL mode, so readers in any
+    process never block the single writer and a follow-up message sees the
+    same history whichever worker it lands on. Each message gets a
+    per-conversation sequence number and the conversation row keeps the
+    number of messages ever appended, which serves as its version.
+
+    Reads are served from a per-process cache that is validated against
+    that version with a single primary-key lookup; only messages appended
+    since the cached version are fetched. On the event loop the database is
+    only touched from worker threads: ensure_loaded() refreshes the cache,
+    the getters read the cache alone, and add_message() queues the write,
+    which runs in order per conversation and is awaited by the next
+    ensure_loaded() of that conversation. Without a running loop every call
+    goes to the database directly. Conversations keep at most a fixed
+    number of messages and are removed after the idle TTL (measured from
+    their last write) or, oldest first, when there are too many.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the SQLite conversation store.
+
+        Args:
+            path: Optional database file. Defaults to settings.conversation_sqlite_path.
+        """
+        self.path = Path(path or settings.conversation_sqlite_path)
+        self.max_conversations = settings.conversation_max_count
+        self.max_messages = settings.conversation_max_messages
+        self.idle_ttl = settings.conversation_idle_ttl_seconds
+        self.sweep_interval = settings.conversation_sqlite_sweep_interval
+        self._cache: "OrderedDict[str, _CachedConversation]" = OrderedDict()
+        self._max_cached = settings.conversation_sqlite_cache_count
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.RLock()
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Latest queued write per conversation; each write waits for the one before it
+        self._writes: Dict[str, asyncio.Task] = {}
+        self.write_stats = {"written": 0, "failed": 0}
+        self.cache_stats = {"hits": 0, "refreshes": 0, "misses": 0}
+        self.evictions = {"ttl": 0, "count": 0, "trimmed_messages": 0}
+        logger.info("SQLite conversation store configured at: {}", self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use, creating the schema if needed."""
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+                    db.execute("PRAGMA journal_mode=WAL")
+                    db.execute("PRAGMA synchronous=NORMAL")
+                    db.executescript(_SCHEMA)
+                    self._db = db
+        return self._db
+
+    async def start(self) -> None:
+        """Open the database and start the periodic expiry sweep."""
+        await asyncio.to_thread(self._connect)
+        self._sweep_task = asyncio.create_task(self._sweep_loop())
+        logger.info("SQLite conversation store started")
+
+    async def close(self) -> None:
+        """Stop the sweep, finish queued writes and close the database."""
+        if self._writes:
+            await asyncio.wait(list(self._writes.values()))
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        logger.info("SQLite conversation store closed")
+
+    async def _sweep_loop(self) -> None:
+        """Periodically remove expired and excess conversations."""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error("Error sweeping SQLite conversation store: {}", str(e))
+
+    def sweep(self) -> None:
+        """Remove conversations idle past the TTL, then the oldest beyond the count limit."""
+        db = self._connect()
+        with self._db_lock:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                expired = [row[0] for row in db.execute(
+                    "SELECT id FROM conversations WHERE last_write < ?", (time.time() - self.idle_ttl,)
+                )]
+                excess = [row[0] for row in db.execute(
+                    "SELECT id FROM conversations WHERE last_write >= ? ORDER BY last_write DESC LIMIT -1 OFFSET ?",
+                    (time.time() - self.idle_ttl, self.max_conversations),
+                )]
+                for conversation_id in expired + excess:
+                    db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+                    db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self.evictions["ttl"] += len(expired)
+            self.evictions["count"] += len(excess)
+            for conversation_id in expired + excess:
+                self._cache.pop(conversation_id, None)
+        if expired or excess:
+            logger.info("Removed {} idle and {} excess conversations", len(expired), len(excess))
+
+    def _append(self, conversation_id: str, new_messages: List[Tuple[str, str, float]]) -> None:
+        """
+        Append messages in one transaction, trimming the oldest beyond the limit.
+
+        Args:
+            conversation_id: The ID of the conversation
+            new_messages: (role, content, timestamp) tuples, oldest first
+        """
+        db = self._connect()
+        now = time.time()
+        with self._db_lock:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT appended FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                start = row[0] if row else 0
+                appended = start + len(new_messages)
+                if row:
+                    db.execute(
+                        "UPDATE conversations SET appended = ?, last_write = ? WHERE id = ?",
+                        (appended, now, conversation_id),
+                    )
+                else:
+                    db.execute(
+                        "INSERT INTO conversations (id, appended, epoch, last_write) VALUES (?, ?, ?, ?)",
+                        (conversation_id, appended, int(now * 1_000_000), now),
+                    )
+                db.executemany(
+                    "INSERT INTO messages (conversation_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (conversation_id, start + index, role, content, timestamp)
+                        for index, (role, content, timestamp) in enumerate(new_messages)
+                    ],
+                )
+                trimmed = db.execute(
+                    "DELETE FROM messages WHERE conversation_id = ? AND seq < ?",
+                    (conversation_id, appended - self.max_messages),
+                ).rowcount
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            if trimmed > 0:
+                self.evictions["trimmed_messages"] += trimmed
+
+    def _read(self, conversation_id: str) -> Optional[_CachedConversation]:
+        """
+        Get a conversation's current messages, refreshing this process's cache if stale.
+
+        A refresh replaces the cache entry rather than updating it, so a
+        reader holding the previous entry always sees a consistent one.
+
+        Args:
+            conversation_id: The ID of the conversation
+
+        Returns:
+            The up-to-date cached conversation, or None if not found
+        """
+        db = self._connect()
+        with self._db_lock:
+            row = db.execute(
+                "SELECT epoch, appended FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if row is None:
+                self._cache.pop(conversation_id, None)
+                self.cache_stats["misses"] += 1
+                return None
+            epoch, appended = row
+            cached = self._cache.get(conversation_id)
+            if cached is not None and cached.epoch != epoch:
+                # The conversation was removed and recreated since it was cached
+                cached = None
+            if cached is not None:
+                self._cache.move_to_end(conversation_id)
+                if cached.appended == appended:
+                    self.cache_stats["hits"] += 1
+                    return cached
+            start = cached.appended if cached is not None else 0
+
+            # Fetch only what was appended since the cached version
+            rows = db.execute(
+                "SELECT role, content, timestamp FROM messages "
+                "WHERE conversation_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (conversation_id, max(start, appended - self.max_messages), appended),
+            ).fetchall()
+            self.cache_stats["refreshes"] += 1
+            refreshed = _CachedConversation(epoch)
+            refreshed.messages = ((cached.messages if cached is not None else []) + [
+                StoredMessage(sys.intern(role), content, timestamp) for role, content, timestamp in rows
+            ])[-self.max_messages:]
+            refreshed.appended = appended
+            self._cache[conversation_id] = refreshed
+            while len(self._cache) > self._max_cached:
+                self._cache.popitem(last=False)
+        return refreshed
+
+    def _cached(self, conversation_id: str) -> Optional[_CachedConversation]:
+        """Get a conversation for reading: from the cache on the event loop, else from the database."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self._read(conversation_id)
+        return self._cache.get(conversation_id)
+
+    async def _write(self, conversation_id: str, message: Tuple[str, str, float], previous: Optional[asyncio.Task]) -> None:
+        """Append a queued message on a worker thread once the conversation's previous write is done."""
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await asyncio.to_thread(self._append, conversation_id, [message])
+            self.write_stats["written"] += 1
+        except Exception as e:
+            self.write_stats["failed"] += 1
+            logger.error("Error writing message of conversation {}: {}", conversation_id, str(e))
+        finally:
+            if self._writes.get(conversation_id) is asyncio.current_task():
+                del self._writes[conversation_id]
+
+    def add_message(self, conversation_id: str, role: str, content: str) -> None:
+        """
+        Add a message to a conversation's history.
+
+        Args:
+            conversation_id: The ID of the conversation
+            role: The role of the message sender ("user" or "assistant")
+            content: The message content
+        """
+        message = (role, content, message_timestamp())
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._append(conversation_id, [message])
+        else:
+            self._writes[conversation_id] = asyncio.create_task(
+                self._write(conversation_id, message, self._writes.get(conversation_id))
+            )
+        logger.debug("Added message to conversation {}", conversation_id)
+
+    def restore_conversation(self, conversation_id: str, messages: List[Tuple[str, str, float]]) -> None:
+        """
+        Load previously persisted messages into the store.
+
+        Args:
+            conversation_id: The ID of the conversation
+            messages: (role, content, timestamp) tuples, oldest first
+        """
+        self._append(conversation_id, messages)
+        logger.debug("Restored {} messages for conversation {}", len(messages), conversation_id)
+
+    def has_conversation(self, conversation_id: str) -> bool:
+        """Check whether a conversation exists in the shared store."""
+        db = self._connect()
+        with self._db_lock:
+            return db.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone() is not None
+
+    def get_conversation(self, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get all messages for a conversation."""
+        cached = self._cached(conversation_id)
+        if cached is None:
+            return None
+        return [message.to_dict() for message in cached.messages]
+
+    def get_version(self, conversation_id: str) -> Optional[str]:
+        """Get a version tag that changes whenever the conversation changes."""
+        cached = self._cached(conversation_id)
+        return cached.version if cached is not None else None
+
+    def get_conversation_page(self,
+                              conversation_id: str,
+                              cursor: Optional[int] = None,
+                              since: Optional[float] = None,
+                              limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get a page of a conversation's messages; see ConversationStore.get_conversation_page."""
+        cached = self._cached(conversation_id)
+        if cached is None:
+            return None
+        messages = cached.messages
+        offset = cached.appended - len(messages)
+        start = max((cursor or 0) - offset, 0)
+        if since is not None:
+            while start < len(messages) and messages[start].timestamp <= since:
+                start += 1
+        end = len(messages) if limit is None else min(len(messages), start + limit)
+        return {
+            "messages": [message.to_dict() for message in messages[start:end]],
+            "version": cached.version,
+            "next_cursor": offset + max(end, start),
+            "has_more": end < len(messages),
+        }
+
+    def get_conversation_messages_for_llm(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        """Get role/content messages for the LLM."""
+        cached = self._cached(conversation_id)
+        if cached is None or not cached.messages:
+            return None
+        return [{"role": message.role, "content": message.content} for message in cached.messages]
+
+    def get_message_offset(self, conversation_id: str) -> int:
+        """Get how many of a conversation's oldest messages have been trimmed."""
+        cached = self._cached(conversation_id)
+        if cached is None:
+            return 0
+        return cached.appended - len(cached.messages)
+
+    def get_all_conversations(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Get all stored conversations, as copies of their messages."""
+        db = self._connect()
+        with self._db_lock:
+            rows = db.execute(
+                "SELECT conversation_id, role, content, timestamp FROM messages ORDER BY conversation_id, seq"
+            ).fetchall()
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for conversation_id, role, content, timestamp in rows:
+            result.setdefault(conversation_id, []).append(StoredMessage(role, content, timestamp).to_dict())
+        return result
+
+    async def ensure_loaded(self, conversation_id: str) -> None:
+        """
+        Bring this process's cache of a conversation up to date with the shared database.
+
+        Waits for the conversation's queued writes first, so a request
+        reads its own writes. The database work runs on a worker thread.
+
+        Args:
+            conversation_id: The ID of the conversation
+        """
+        write = self._writes.get(conversation_id)
+        if write is not None:
+            await asyncio.wait([write])
+        await asyncio.to_thread(self._read, conversation_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get store size, limits, eviction and per-process cache counters.
+
+        Returns:
+            Dictionary with current usage, limits and counters
+        """
+        db = self._connect()
+        with self._db_lock:
+            conversations = db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+            messages = db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            page_count = db.execute("PRAGMA page_count").fetchone()[0]
+            page_size = db.execute("PRAGMA page_size").fetchone()[0]
+            cached = len(self._cache)
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "conversations": conversations,
+            "messages": messages,
+            "database_bytes": page_count * page_size,
+            "limits": {
+                "max_conversations": self.max_conversations,
+                "max_messages": self.max_messages,
+                "idle_ttl_seconds": self.idle_ttl,
+            },
+            "evictions": dict(self.evictions),
+            "process_cache": dict(self.cache_stats, conversations=cached),
+            "writes": dict(self.write_stats, pending=len(self._writes)),
+        }
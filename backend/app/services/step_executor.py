@@ -0,0 +1,418 @@
+"""
+Step Executor - Runs a plan of query steps as a dependency graph, independent steps in parallel.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from app.config import settings
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import PLAN_STEP_SECONDS
+
+# Get module-specific logger
+logger = get_logger(__name__)
+
+# How a step runs: awaited on the event loop (I/O-bound), on a worker thread
+# (blocking I/O), or in the process pool (CPU-heavy transforms)
+STEP_KINDS = ("async", "thread", "process")
+
+# Step outcomes
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+SKIPPED = "skipped"
+
+
+class PlanError(ValueError):
+    """Raised when a plan is not a valid dependency graph."""
+
+
+class StepTimeoutError(Exception):
+    """Raised when a step runs longer than its timeout."""
+
+
+class Step:
+    """
+    One step of a plan.
+
+    The step's function is called with a single dictionary holding the plan
+    inputs and the output of each dependency under the dependency's name.
+    Async steps must be coroutine functions; process steps must be
+    module-level functions whose inputs and output can be pickled.
+    """
+
+    __slots__ = ("name", "func", "depends_on", "kind", "timeout", "retries")
+
+    def __init__(self,
+                 name: str,
+                 func: Callable[[Dict[str, Any]], Any],
+                 depends_on: Sequence[str] = (),
+                 kind: str = "async",
+                 timeout: Optional[float] = None,
+                 retries: Optional[int] = None):
+        """
+        Define a step.
+
+        Args:
+            name: Unique name of the step within its plan
+            func: Function computing the step's output from its inputs
+            depends_on: Names of the steps whose outputs this step needs
+            kind: "async", "thread" or "process"
+            timeout: Seconds allowed per attempt, defaults to the configured step timeout
+            retries: Extra attempts after a failure, defaults to the configured retries
+
+        Raises:
+            PlanError: If the kind is unknown
+        """
+        if kind not in STEP_KINDS:
+            raise PlanError(f"Unknown kind {kind!r} for step {name!r}")
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.kind = kind
+        self.timeout = settings.plan_step_timeout_seconds if timeout is None else timeout
+        self.retries = settings.plan_step_retries if retries is None else retries
+
+
+class StepResult:
+    """Outcome, output and timing of one step."""
+
+    __slots__ = ("name", "kind", "status", "output", "error", "attempts", "ready_at", "started_at", "finished_at")
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.status = SKIPPED
+        self.output: Any = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.ready_at = 0.0
+        self.started_at = 0.0
+        self.finished_at = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == SUCCEEDED
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the first attempt's start to the step's end, including retries."""
+        return self.finished_at - self.started_at
+
+    def metadata(self, origin: float) -> Dict[str, Any]:
+        """
+        Get the step's execution metadata.
+
+        Args:
+            origin: Monotonic time the plan started, to express times as offsets
+
+        Returns:
+            Dictionary with the outcome, attempts and timings in milliseconds
+        """
+        metadata: Dict[str, Any] = {
+            "name": self.name,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+        }
+        if self.attempts:
+            metadata.update(
+                queued_ms=round((self.started_at - self.ready_at) * 1000, 2),
+                started_ms=round((self.started_at - origin) * 1000, 2),
+                duration_ms=round(self.duration * 1000, 2),
+            )
+        if self.error is not None:
+            metadata["error"] = self.error
+        return metadata
+
+
+class PlanResult:
+    """Results of every step of a plan, in plan order."""
+
+    __slots__ = ("steps", "started_at", "finished_at")
+
+    def __init__(self, steps: Dict[str, StepResult], started_at: float, finished_at: float):
+        self.steps = steps
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.steps.values())
+
+    @property
+    def outputs(self) -> Dict[str, Any]:
+        """Outputs of the steps that succeeded."""
+        return {name: result.output for name, result in self.steps.items() if result.ok}
+
+    def metadata(self) -> Dict[str, Any]:
+        """
+        Get the plan's execution metadata.
+
+        Parallelism is the summed step time over the plan's wall time; 1.0
+        means the steps effectively ran one after another.
+
+        Returns:
+            Dictionary with the overall timing and the metadata of each step
+        """
+        duration = self.finished_at - self.started_at
+        busy = sum(result.duration for result in self.steps.values() if result.attempts)
+        return {
+            "ok": self.ok,
+            "duration_ms": round(duration * 1000, 2),
+            "parallelism": round(busy / duration, 2) if duration > 0 else 0.0,
+            "steps": [result.metadata(self.started_at) for result in self.steps.values()],
+        }
+
+
+def validate_plan(steps: Iterable[Step]) -> Dict[str, Step]:
+    """
+    Check that steps form a dependency graph that can run to completion.
+
+    Args:
+        steps: The steps of the plan
+
+    Returns:
+        The steps keyed by name, in plan order
+
+    Raises:
+        PlanError: On duplicate names, unknown dependencies or a dependency cycle
+    """
+    by_name: Dict[str, Step] = {}
+    for step in steps:
+        if step.name in by_name:
+            raise PlanError(f"Duplicate step name: {step.name!r}")
+        by_name[step.name] = step
+    for step in by_name.values():
+        for dependency in step.depends_on:
+            if dependency not in by_name:
+                raise PlanError(f"Step {step.name!r} depends on unknown step {dependency!r}")
+
+    # Kahn's algorithm: every step must become ready once its dependencies are done
+    remaining = {name: len(set(step.depends_on)) for name, step in by_name.items()}
+    dependents = _dependents(by_name)
+    ready = [name for name, count in remaining.items() if count == 0]
+    visited = 0
+    while ready:
+        name = ready.pop()
+        visited += 1
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+    if visited != len(by_name):
+        cycle = sorted(name for name, count in remaining.items() if count > 0)
+        raise PlanError(f"Dependency cycle between steps: {', '.join(cycle)}")
+    return by_name
+
+
+def _dependents(by_name: Dict[str, Step]) -> Dict[str, List[str]]:
+    """Map each step to the steps that depend on it."""
+    dependents: Dict[str, List[str]] = {name: [] for name in by_name}
+    for step in by_name.values():
+        for dependency in set(step.depends_on):
+            dependents[dependency].append(step.name)
+    return dependents
+
+
+class StepExecutor:
+    """
+    Runs plans of steps as dependency graphs.
+
+    A step starts as soon as all of its dependencies have succeeded, so
+    independent steps (for example queries against different sources) run
+    concurrently and the plan takes as long as its slowest dependency chain
+    rather than the sum of its steps. Async steps run on the event loop,
+    thread steps on the loop's default executor and process steps in a
+    process pool that is created on first use. At most max_concurrency
+    steps run at a time.
+
+    Each attempt of a step is bounded by the step's timeout and failed
+    attempts are retried with exponential backoff; a step waiting to retry
+    does not count against max_concurrency. When a step fails for
+    good, the steps depending on it are skipped while independent branches
+    of the plan keep running. A timed-out thread or process step cannot be
+    interrupted; its result is discarded when it eventually finishes.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, process_workers: Optional[int] = None):
+        """
+        Initialize the executor.
+
+        Args:
+            max_concurrency: Steps allowed to run at once, defaults to the configured limit
+            process_workers: Size of the process pool, defaults to the configured size
+        """
+        self.max_concurrency = max_concurrency or settings.plan_max_concurrency
+        self.process_workers = process_workers or settings.plan_process_workers or None
+        self.retry_backoff = settings.plan_retry_backoff_seconds
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.plans_run = 0
+        self.steps_run = 0
+        self.steps_failed = 0
+        self.retries = 0
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Get the process pool, creating it on first use."""
+        with self._pool_lock:
+            if self._process_pool is None:
+                # Forking a process that runs threads (the log queue, database drivers)
+                # can deadlock the child, so workers come from a fork server where available
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver") if "forkserver" in methods else None
+                self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers, mp_context=context)
+                logger.info("Step process pool started with {} workers", self._process_pool._max_workers)
+            return self._process_pool
+
+    async def _call(self, step: Step, inputs: Dict[str, Any]) -> Any:
+        """Run one attempt of a step according to its kind."""
+        if step.kind == "async":
+            return await step.func(inputs)
+        loop = asyncio.get_running_loop()
+        if step.kind == "thread":
+            return await loop.run_in_executor(None, step.func, inputs)
+        # Starting the pool and its worker processes blocks, so it is kept off the event loop
+        pool = self._process_pool or await loop.run_in_executor(None, self._get_process_pool)
+        future = await loop.run_in_executor(None, pool.submit, step.func, inputs)
+        return await asyncio.wrap_future(future)
+
+    async def _run_step(self, step: Step, inputs: Dict[str, Any], result: StepResult) -> StepResult:
+        """
+        Run a step with its timeout and retries, recording the outcome in its result.
+
+        Args:
+            step: The step to run
+            inputs: Plan inputs and dependency outputs passed to the step
+            result: The step's result, filled in place
+
+        Returns:
+            The step's result
+        """
+        for attempt in range(step.retries + 1):
+            # The slot is held per attempt, so a step backing off leaves it to other steps
+            async with self._semaphore:
+                if not attempt:
+                    result.started_at = time.monotonic()
+                result.attempts = attempt + 1
+                attempt_started = time.monotonic()
+                try:
+                    result.output = await asyncio.wait_for(self._call(step, inputs), step.timeout)
+                    result.status = SUCCEEDED
+                    result.error = None
+                except asyncio.TimeoutError:
+                    result.status = TIMED_OUT
+                    result.error = str(StepTimeoutError(f"Step {step.name!r} timed out after {step.timeout}s"))
+                except Exception as e:
+                    result.status = FAILED
+                    result.error = f"{type(e).__name__}: {e}"
+                PLAN_STEP_SECONDS.observe(time.monotonic() - attempt_started, kind=step.kind, outcome=result.status)
+            if result.ok:
+                break
+            if attempt < step.retries:
+                self.retries += 1
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(
+                    "Step {} attempt {} {}: {}; retrying in {:.2f}s",
+                    step.name, attempt + 1, result.status, result.error, delay,
+                )
+                await asyncio.sleep(delay)
+        result.finished_at = time.monotonic()
+        self.steps_run += 1
+        if not result.ok:
+            self.steps_failed += 1
+            logger.error("Step {} {} after {} attempts: {}", step.name, result.status, result.attempts, result.error)
+        return result
+
+    async def run(self, steps: Iterable[Step], inputs: Optional[Dict[str, Any]] = None) -> PlanResult:
+        """
+        Run a plan.
+
+        Args:
+            steps: The steps of the plan, in any order that lists each step once
+            inputs: Plan inputs passed to every step alongside its dependency outputs
+
+        Returns:
+            The result of every step; failed steps do not raise
+
+        Raises:
+            PlanError: If the steps do not form a valid dependency graph
+        """
+        by_name = validate_plan(steps)
+        dependents = _dependents(by_name)
+        remaining = {name: len(set(step.depends_on)) for name, step in by_name.items()}
+        results = {name: StepResult(name, step.kind) for name, step in by_name.items()}
+        base_inputs = dict(inputs or {})
+        running: Dict["asyncio.Task[StepResult]", str] = {}
+        started_at = time.monotonic()
+
+        def launch(name: str) -> None:
+            step = by_name[name]
+            step_inputs = dict(base_inputs)
+            step_inputs.update((dependency, results[dependency].output) for dependency in step.depends_on)
+            results[name].ready_at = time.monotonic()
+            running[asyncio.create_task(self._run_step(step, step_inputs, results[name]))] = name
+
+        def skip(name: str, reason: str) -> None:
+            # A failed step takes every step downstream of it with it
+            pending = [name]
+            while pending:
+                skipped = results[pending.pop()]
+                if skipped.error is None:
+                    skipped.error = reason
+                    pending.extend(dependents[skipped.name])
+
+        for name, count in remaining.items():
+            if count == 0:
+                launch(name)
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    if not task.result().ok:
+                        for dependent in dependents[name]:
+                            skip(dependent, f"Dependency {name!r} {results[name].status}")
+                        continue
+                    for dependent in dependents[name]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            launch(dependent)
+        finally:
+            # Stop the rest of the plan if the caller was cancelled
+            for task in running:
+                task.cancel()
+
+        self.plans_run += 1
+        plan = PlanResult(results, started_at, time.monotonic())
+        logger.info(
+            "Plan of {} steps finished in {:.1f}ms ({} failed)",
+            len(results), (plan.finished_at - started_at) * 1000,
+            sum(1 for result in results.values() if not result.ok),
+        )
+        return plan
+
+    def close(self) -> None:
+        """Shut down the process pool, abandoning queued process steps."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get executor statistics.
+
+        Returns:
+            Dictionary with the limits and counts of plans, steps, failures and retries
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "process_pool_started": self._process_pool is not None,
+            "plans_run": self.plans_run,
+            "steps_run": self.steps_run,
+            "steps_failed": self.steps_failed,
+            "retries": self.retries,
+        }
@@ -0,0 +1,64 @@
+"""
+Shared fixtures for the backend tests.
+"""
+import os
+
+# Settings are read when app.config is imported, so test defaults must be set first
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LLM_WARMUP_ENABLED", "false")
+os.environ.setdefault("CONVERSATION_SNAPSHOT_ENABLED", "false")
+
+import pytest  # noqa: E402
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+from app.services.conversation_store import ConversationStore  # noqa: E402
+from app.services.llm_service import LLMService  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_singletons():
+    """Give every test a fresh conversation store and LLM concurrency limit."""
+    ConversationStore._instance = None
+    LLMService._semaphore = None
+    yield
+    ConversationStore._instance = None
+    LLMService._semaphore = None
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """
+    Serve every provider with a fast deterministic fake chat model.
+
+    Returns:
+        Function that creates an LLMService; keyword arguments configure the fake model
+    """
+    def create(**options) -> LLMService:
+        options.setdefault("latency", 0.0)
+        options.setdefault("token_rate", 1e6)
+        options.setdefault("response_tokens", 5)
+        monkeypatch.setattr(LLMService, "_initialize_llm", lambda self, provider: FakeChatModel(**options))
+        return LLMService()
+
+    return create
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """
+    A test client for the application, with the fake model serving every provider.
+
+    Yields:
+        TestClient whose lifespan has started; it is shut down after the test
+    """
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.main import app
+
+    monkeypatch.setattr(settings, "result_store_dir", str(tmp_path / "results"))
+    monkeypatch.setattr(
+        LLMService, "_initialize_llm",
+        lambda self, provider: FakeChatModel(latency=0.0, token_rate=1e6, response_tokens=5),
+    )
+    with TestClient(app) as test_client:
+        yield test_client
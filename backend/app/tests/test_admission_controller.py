@@ -0,0 +1,196 @@
+"""
+Tests for admission control and how the chat endpoints identify and admit callers.
+"""
+import asyncio
+import ipaddress
+import pytest
+from starlette.requests import Request
+from app.config import settings
+from app.routers import chat
+from app.services.admission_controller import BATCH_LANE, AdmissionController, AdmissionRejected
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    """Create a controller with one slot, a small queue and no per-user limit."""
+    def create(**overrides) -> AdmissionController:
+        options = {
+            "admission_enabled": True,
+            "admission_max_active": 1,
+            "admission_max_queue": 2,
+            "admission_queue_timeout_seconds": 5.0,
+            "admission_user_rate": 0.0,
+            "admission_role_priorities": "Executive=0,DataAnalyst=1",
+        }
+        options.update(overrides)
+        for name, value in options.items():
+            monkeypatch.setattr(settings, name, value)
+        return AdmissionController()
+
+    return create
+
+
+async def _queued(controller: AdmissionController, role: str) -> asyncio.Task:
+    """Start an acquire that has to wait and let it join the queue."""
+    task = asyncio.create_task(controller.acquire("user", role))
+    await asyncio.sleep(0)
+    return task
+
+
+async def test_admits_immediately_while_slots_are_free(controller):
+    admission = controller(admission_max_active=2)
+
+    first = await admission.acquire("user", "Executive")
+    await admission.acquire("user", "Executive")
+
+    assert admission.active == 2
+    admission.release(first)
+    admission.release(first)
+    assert admission.active == 1
+
+
+async def test_waiters_are_admitted_by_priority_on_release(controller):
+    admission = controller(admission_max_queue=3)
+    ticket = await admission.acquire("user", "Executive")
+
+    batch = await _queued(admission, BATCH_LANE)
+    analyst = await _queued(admission, "DataAnalyst")
+    executive = await _queued(admission, "Executive")
+    assert admission.get_stats()["waiting"] == 3
+
+    admission.release(ticket)
+    next_ticket = await executive
+    assert not analyst.done() and not batch.done()
+    admission.release(next_ticket)
+    admission.release(await analyst)
+    admission.release(await batch)
+
+    assert admission.active == 0
+    assert admission.get_stats()["admitted"] == 4
+
+
+async def test_batch_lane_ranks_after_every_role(controller):
+    admission = controller()
+
+    assert admission.priority_of(BATCH_LANE) > admission.priority_of("DataAnalyst")
+    assert admission.priority_of(BATCH_LANE) > admission.priority_of(None)
+
+
+async def test_full_queue_displaces_the_lowest_priority_waiter(controller):
+    admission = controller()
+    ticket = await admission.acquire("user", "Executive")
+    batch = await _queued(admission, BATCH_LANE)
+    analyst = await _queued(admission, "DataAnalyst")
+
+    executive = await _queued(admission, "Executive")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await batch
+    assert (rejected.value.status_code, rejected.value.reason) == (503, "queue_full")
+    assert admission.get_stats()["displaced"] == 1
+
+    admission.release(ticket)
+    admission.release(await executive)
+    admission.release(await analyst)
+    assert admission.active == 0
+
+
+async def test_full_queue_rejects_a_request_that_outranks_nobody(controller):
+    admission = controller()
+    ticket = await admission.acquire("user", "Executive")
+    waiting = [await _queued(admission, "Executive") for _ in range(2)]
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("user", BATCH_LANE)
+
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 1
+    admission.release(ticket)
+    for task in waiting:
+        admission.release(await task)
+
+
+async def test_queue_timeout_rejects_and_leaves_the_queue(controller):
+    admission = controller(admission_queue_timeout_seconds=0.05)
+    ticket = await admission.acquire("user", "Executive")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("user", "DataAnalyst")
+
+    assert (rejected.value.status_code, rejected.value.reason) == (503, "queue_timeout")
+    assert admission.get_stats()["waiting"] == 0
+    admission.release(ticket)
+    assert admission.active == 0
+
+
+async def test_timeout_of_a_displaced_waiter_is_rejected_cleanly(controller):
+    admission = controller(admission_max_queue=1, admission_queue_timeout_seconds=0.05)
+    ticket = await admission.acquire("user", "Executive")
+    batch = await _queued(admission, BATCH_LANE)
+
+    # Displace the batch waiter right before its wait times out
+    await asyncio.sleep(0.045)
+    executive = await _queued(admission, "Executive")
+
+    with pytest.raises(AdmissionRejected):
+        await batch
+    admission.release(ticket)
+    admission.release(await executive)
+    assert admission.get_stats()["waiting"] == 0
+
+
+async def test_user_rate_limit_rejects_with_429(controller):
+    admission = controller(admission_max_active=10, admission_user_rate=1.0, admission_user_burst=2.0)
+
+    await admission.acquire("alice")
+    await admission.acquire("alice")
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("alice")
+    await admission.acquire("bob")
+
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+
+
+def _request(host: str, user_id: str = "alice") -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(b"x-user-id", user_id.encode())],
+        "client": (host, 12345),
+    })
+
+
+def test_user_id_header_is_ignored_from_untrusted_clients(monkeypatch):
+    monkeypatch.setattr(chat, "TRUSTED_PROXIES", [])
+
+    assert chat.get_user_id(_request("203.0.113.7")) == "203.0.113.7"
+
+
+def test_user_id_header_is_honoured_from_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(chat, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+    assert chat.get_user_id(_request("10.1.2.3")) == "alice"
+    assert chat.get_user_id(_request("192.0.2.1")) == "192.0.2.1"
+    assert chat.get_user_id(_request("testclient")) == "testclient"
+
+
+def test_batch_endpoint_goes_through_admission(client):
+    admission = client.app.state.admission_controller
+    admitted = admission.get_stats()["admitted"]
+
+    response = client.post("/api/chat/batch", json={"items": [{"query": "hello"}]})
+
+    assert response.status_code == 200
+    assert admission.get_stats()["admitted"] == admitted + 1
+    assert admission.active == 0
+
+
+def test_batch_endpoint_is_rejected_when_admission_is_full(client, monkeypatch):
+    admission = client.app.state.admission_controller
+    monkeypatch.setattr(admission, "max_active", 0)
+    monkeypatch.setattr(admission, "max_queue", 0)
+
+    response = client.post("/api/chat/batch", json={"items": [{"query": "hello"}], "stream": True})
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
@@ -0,0 +1,63 @@
+"""
+Tests for the benchmark harness and its fake LLM.
+"""
+import argparse
+import time
+from langchain_core.messages import HumanMessage
+from app.config import settings
+from benchmarks import run_load
+from benchmarks.fake_llm import FakeChatModel
+
+
+async def test_fake_model_is_deterministic_and_reports_usage():
+    model = FakeChatModel(latency=0.0, token_rate=1e6, response_tokens=8)
+    first = await model.ainvoke([HumanMessage(content="Revenue by region")])
+    second = await model.ainvoke([HumanMessage(content="Revenue by region")])
+    other = await model.ainvoke([HumanMessage(content="Churn by cohort")])
+    assert first.content == second.content != other.content
+    assert len(first.content.split()) == 8
+    assert first.usage_metadata["output_tokens"] == 8
+    assert first.usage_metadata["input_tokens"] == 3
+
+
+async def test_fake_model_simulates_latency():
+    model = FakeChatModel(latency=0.05, token_rate=100.0, response_tokens=5)
+    started = time.perf_counter()
+    await model.ainvoke([HumanMessage(content="hello")])
+    assert time.perf_counter() - started >= 0.1
+
+
+async def test_fake_model_streams_tokens():
+    model = FakeChatModel(latency=0.0, token_rate=1e6, response_tokens=4)
+    chunks = [chunk.content async for chunk in model.astream([HumanMessage(content="hello")]) if chunk.content]
+    assert len(chunks) == 4
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert run_load._percentile(values, 50) == 50.0
+    assert run_load._percentile(values, 99) == 99.0
+    assert run_load._percentile(values, 99.5) == 100.0
+    assert run_load._percentile([1.0, 2.0, 3.0], 50) == 2.0
+    assert run_load._percentile([], 95) == 0.0
+
+
+def test_compare_reports_relative_change():
+    def results(rps, p50):
+        return {"results": {"requests_per_s": rps, "peak_rss_mb": 100.0, "latency_ms": {"p50": p50, "p95": p50, "p99": p50}}}
+
+    lines = run_load.compare(results(150.0, 10.0), results(100.0, 20.0))
+    assert any("requests_per_s" in line and "+50.0%" in line for line in lines)
+    assert any("latency_p50_ms" in line and "-50.0%" in line for line in lines)
+
+
+async def test_run_drives_the_app(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "result_store_dir", str(tmp_path))
+    args = argparse.Namespace(
+        endpoint="chat", concurrency=2, conversations=3, turns=2, role="DataAnalyst", repeat_queries=False,
+        latency=0.0, token_rate=1e6, tokens=5,
+    )
+    results = await run_load.run(args)
+    assert results["results"]["requests"] == 6
+    assert results["results"]["errors"] == 0
+    assert results["config"]["fake_llm"]["response_tokens"] == 5
@@ -0,0 +1,144 @@
+"""
+Tests for batch chat generation.
+"""
+import asyncio
+import json
+from typing import Dict, List
+from benchmarks.fake_llm import FakeChatModel
+from app.services.chat_service import ChatService
+from app.services.llm_service import LLMResult, LLMService
+from app.utils.metrics import CHAT_STAGE_SECONDS
+
+
+class FlakyChatModel(FakeChatModel):
+    """Fake model whose first call for a "flaky" query fails and for a "stuck" query hangs."""
+
+    calls: Dict[str, int] = {}
+    in_flight: int = 0
+    peak: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        query = str(messages[-1].content)
+        attempt = self.calls[query] = self.calls.get(query, 0) + 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if attempt == 1 and "flaky" in query:
+                raise ConnectionError("connection reset")
+            if attempt == 1 and "stuck" in query:
+                await asyncio.sleep(3600)
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def _service(fake_llm, **options) -> LLMService:
+    service = fake_llm()
+    service.llm = FlakyChatModel(latency=0.01, token_rate=1e6, response_tokens=3, calls={}, **options)
+    return service
+
+
+async def _collect(service: LLMService, queries: List[str], max_concurrency: int = 4, timeout: float = 5.0):
+    results = {}
+    async for index, outcome in service.abatch_generate([{"query": q} for q in queries], max_concurrency, timeout):
+        assert index not in results
+        results[index] = outcome
+    return results
+
+
+async def test_batch_returns_every_result(fake_llm):
+    service = _service(fake_llm)
+    results = await _collect(service, [f"query {i}" for i in range(10)])
+    assert sorted(results) == list(range(10))
+    assert all(isinstance(result, LLMResult) and result.text for result in results.values())
+
+
+async def test_failed_item_is_retried_through_the_router(fake_llm):
+    service = _service(fake_llm)
+    results = await _collect(service, ["query 0", "flaky query", "query 2"])
+    assert all(isinstance(result, LLMResult) for result in results.values())
+    assert service.llm.calls["flaky query"] == 2
+
+
+async def test_stuck_item_times_out_and_is_retried(fake_llm):
+    service = _service(fake_llm)
+    results = await asyncio.wait_for(_collect(service, ["query 0", "stuck query"], timeout=0.2), 5)
+    assert isinstance(results[1], LLMResult)
+    assert service.llm.calls["stuck query"] == 2
+
+
+async def test_item_failing_twice_yields_its_error(fake_llm, monkeypatch):
+    service = _service(fake_llm)
+
+    async def down(*args, **kwargs):
+        raise ConnectionError("provider down")
+
+    monkeypatch.setattr(service, "_ainvoke", down)
+    results = await _collect(service, ["query 0", "flaky query"])
+    assert isinstance(results[0], LLMResult)
+    assert isinstance(results[1], ConnectionError)
+
+
+async def test_batch_stays_within_global_concurrency_limit(fake_llm):
+    service = _service(fake_llm)
+    LLMService._semaphore = asyncio.Semaphore(2)
+    await _collect(service, [f"query {i}" for i in range(12)], max_concurrency=8)
+    assert service.llm.peak == 2
+
+
+async def test_context_preparation_is_bounded(fake_llm, monkeypatch):
+    chat_service = ChatService(llm_service=fake_llm())
+    chat_service.batch_max_concurrency = 3
+    active = peak = 0
+    build = chat_service.context_builder.build
+
+    async def slow_build(*args, **kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return await build(*args, **kwargs)
+
+    monkeypatch.setattr(chat_service.context_builder, "build", slow_build)
+    items = [{"query": f"query {i}"} for i in range(12)]
+    results = [result async for result in chat_service.process_batch(items)]
+    assert len(results) == 12
+    assert peak == 3
+
+
+def test_batch_endpoint_keeps_request_order(client):
+    items = [{"query": f"question {i}", "role": "DataAnalyst"} for i in range(5)]
+    items[2]["role"] = "Astronaut"
+    response = client.post("/api/chat/batch", json={"items": items})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == list(range(5))
+    assert "Invalid role" in results[2]["error"]
+    assert results[0]["response"]["query"] == "question 0"
+
+
+def test_batch_endpoint_streams_ndjson(client):
+    items = [{"query": f"question {i}"} for i in range(3)]
+    response = client.post("/api/chat/batch", json={"items": items, "stream": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+
+
+def _batch_observations():
+    """Count and sum of the provider_batch stage observations so far."""
+    data = [values for key, values in CHAT_STAGE_SECONDS._values.items() if key[0] == "provider_batch"]
+    return sum(values[-1] for values in data), sum(values[-2] for values in data)
+
+
+async def test_batch_latency_is_recorded_once_per_item(fake_llm):
+    service = _service(fake_llm)
+    count_before, sum_before = _batch_observations()
+
+    await _collect(service, [f"query {i}" for i in range(9)] + ["flaky query"], max_concurrency=1)
+
+    count, total = _batch_observations()
+    assert count - count_before == 10
+    # Ten calls of about 10ms each, not each item's time since the batch started
+    assert total - sum_before < 0.3
@@ -0,0 +1,59 @@
+"""
+Tests for the server-sent events chat endpoint.
+"""
+import json
+from typing import List, Tuple
+from app.main import app
+
+
+def _events(body: str) -> List[Tuple[str, dict]]:
+    """Parse a text/event-stream body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _stream(client, payload: dict) -> List[Tuple[str, dict]]:
+    with client.stream("POST", "/api/chat/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return _events("".join(response.iter_text()))
+
+
+def test_stream_emits_tokens_then_done(client):
+    events = _stream(client, {"query": "Summarize revenue", "role": "DataAnalyst"})
+    names = [name for name, _ in events]
+    assert names[-1] == "done"
+    assert names[:-1] and set(names[:-1]) == {"token"}
+
+    done = events[-1][1]
+    text = "".join(data["content"] for name, data in events if name == "token")
+    assert done["result"] == text
+    assert done["query"] == "Summarize revenue"
+    assert done["conversation_id"]
+
+
+def test_streamed_turn_is_stored(client):
+    events = _stream(client, {"query": "Top regions", "role": "DataAnalyst"})
+    done = events[-1][1]
+    conversation = client.get(f"/api/chat/conversation/{done['conversation_id']}").json()
+    assert [message["role"] for message in conversation["messages"]] == ["user", "assistant"]
+    assert conversation["messages"][1]["content"] == done["result"]
+
+
+def test_stream_reports_errors_as_events(client, monkeypatch):
+    async def failing(*args, **kwargs):
+        raise RuntimeError("provider down")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(app.state.llm_service, "astream_response", failing)
+    events = _stream(client, {"query": "Anything", "role": "DataAnalyst"})
+    assert events[-1][0] == "error"
+    assert "provider down" in events[-1][1]["detail"]
+
+
+def test_stream_rejects_unknown_role(client):
+    response = client.post("/api/chat/stream", json={"query": "hi", "role": "Astronaut"})
+    assert response.status_code == 400
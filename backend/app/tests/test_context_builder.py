@@ -0,0 +1,117 @@
+"""
+Tests for the token-budgeted context builder.
+"""
+import asyncio
+from typing import Dict, List
+import pytest
+from app.services.context_builder import MESSAGE_TOKEN_OVERHEAD, ContextBuilder, count_tokens, truncate_tokens
+
+
+def _history(count: int, words: int = 40) -> List[Dict[str, str]]:
+    return [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": f"turn {index} " + "word " * words}
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def builder(fake_llm, monkeypatch):
+    service = fake_llm()
+    builder = ContextBuilder(service)
+    builder.max_tokens = 600
+    builder.summary_max_tokens = 50
+    builder.summarized: List[List[Dict[str, str]]] = []
+
+    async def summarize(messages, previous_summary=None, timeout=None, max_tokens=None):
+        builder.summarized.append(messages)
+        # Deliberately longer than the summary limit
+        return (previous_summary or "") + " summary" * 200
+
+    monkeypatch.setattr(service, "asummarize", summarize)
+    yield builder
+
+
+def _prompt_tokens(builder: ContextBuilder, window, query: str, role: str) -> int:
+    """Count the tokens of the messages actually sent for a window."""
+    prompts = builder.llm_service.prompts
+    parts = [builder.llm_service.get_system_prompt(role), query]
+    parts += [message["content"] for message in window.history]
+    if window.summary:
+        parts.append(prompts.render("summary_context", summary=window.summary))
+    return sum(count_tokens(part) + MESSAGE_TOKEN_OVERHEAD for part in parts)
+
+
+async def test_short_history_is_kept_verbatim(builder):
+    history = _history(3, words=5)
+    window = await builder.build("c1", history, "What changed?", "DataAnalyst")
+    assert window.history == history
+    assert window.summary is None
+    assert builder.summarized == []
+
+
+async def test_window_fits_budget_including_system_prompt_and_query(builder):
+    query = "Break revenue down by region " * 20
+    window = await builder.build("c1", _history(40), query, "DataAnalyst")
+    assert window.summary is not None
+    assert window.tokens == _prompt_tokens(builder, window, query, "DataAnalyst")
+    assert window.tokens <= builder.max_tokens
+
+
+async def test_long_query_leaves_less_room_for_history(builder):
+    history = _history(40)
+    short = await builder.build("c1", history, "Why?", "DataAnalyst")
+    long = await builder.build("c2", history, "Why? " * 200, "DataAnalyst")
+    assert len(long.history) < len(short.history)
+
+
+async def test_summary_is_limited_to_summary_max_tokens(builder):
+    window = await builder.build("c1", _history(40), "Why?", "DataAnalyst")
+    assert count_tokens(window.summary) <= builder.summary_max_tokens
+
+
+async def test_summary_is_extended_incrementally(builder):
+    history = _history(40)
+    first = await builder.build("c1", history, "Why?", "DataAnalyst")
+    folded = first.summarized_messages
+    assert sum(len(batch) for batch in builder.summarized) == folded
+
+    history += _history(4)
+    second = await builder.build("c1", history, "Why?", "DataAnalyst")
+    # Only the messages that left the window since the last build are sent
+    assert len(builder.summarized) == 2
+    assert len(builder.summarized[1]) == second.summarized_messages - folded
+
+
+async def test_failed_summary_falls_back_to_the_window(builder, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise ConnectionError("provider down")
+
+    monkeypatch.setattr(builder.llm_service, "asummarize", fail)
+    history = _history(40)
+    window = await builder.build("c1", history, "Why?", "DataAnalyst")
+
+    assert window.summary is None and window.summarized_messages == 0
+    assert window.history == history[-len(window.history):]
+    assert window.tokens <= builder.max_tokens
+
+
+async def test_concurrent_turns_summarize_once(builder, monkeypatch):
+    summarize = builder.llm_service.asummarize
+
+    async def slow_summarize(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await summarize(*args, **kwargs)
+
+    monkeypatch.setattr(builder.llm_service, "asummarize", slow_summarize)
+    history = _history(40)
+    windows = await asyncio.gather(*(builder.build("c1", history, "Why?", "DataAnalyst") for _ in range(5)))
+
+    assert len(builder.summarized) == 1
+    assert len({window.summary for window in windows}) == 1
+    assert builder._summary_locks == {}
+
+
+def test_truncate_tokens():
+    text = "word " * 500
+    assert count_tokens(truncate_tokens(text, 20)) <= 20
+    assert truncate_tokens("short", 20) == "short"
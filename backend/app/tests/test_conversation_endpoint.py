@@ -0,0 +1,59 @@
+"""
+Tests for reading conversations through GET /api/chat/conversation.
+"""
+from datetime import datetime, timezone
+import time
+import pytest
+from fastapi import HTTPException
+from app.routers.chat import _parse_since
+
+EPOCH = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("value", [
+    str(EPOCH),
+    "2024-05-01T12:00:00Z",
+    "2024-05-01T12:00:00+00:00",
+    "2024-05-01T14:00:00+02:00",
+    "2024-05-01T12:00:00",
+])
+def test_since_accepts_timestamps_and_iso_datetimes_as_utc(value):
+    assert _parse_since(value) == EPOCH
+
+
+def test_since_rejects_invalid_values():
+    with pytest.raises(HTTPException) as error:
+        _parse_since("yesterday")
+    assert error.value.status_code == 400
+
+
+def test_since_with_z_suffix_filters_messages(client):
+    store = client.app.state.conversation_store
+    store.add_message("c1", "user", "hello")
+
+    response = client.get("/api/chat/conversation/c1", params={"since": "1970-01-01T00:00:00Z"})
+    later = client.get("/api/chat/conversation/c1", params={"since": "2999-01-01T00:00:00Z"})
+
+    assert [m["content"] for m in response.json()["messages"]] == ["hello"]
+    assert later.json()["messages"] == []
+
+
+@pytest.fixture
+def local_time_west_of_utc(monkeypatch):
+    """Run the test on a host whose local time is behind UTC."""
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_returned_timestamp_round_trips_through_since(client, local_time_west_of_utc):
+    store = client.app.state.conversation_store
+    for content in ("first", "second", "third"):
+        store.add_message("c2", "user", content)
+
+    messages = client.get("/api/chat/conversation/c2").json()["messages"]
+    after_first = client.get("/api/chat/conversation/c2", params={"since": messages[0]["timestamp"]}).json()
+
+    assert [message["content"] for message in after_first["messages"]] == ["second", "third"]
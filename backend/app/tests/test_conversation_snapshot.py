@@ -0,0 +1,171 @@
+"""
+Tests for restoring the in-memory conversation store from snapshots and the journal.
+"""
+import os
+import pytest
+from app.services.conversation_snapshot import JOURNAL_MAGIC, SNAPSHOT_FILE, ConversationPersistence, fcntl
+from app.services.conversation_store import ConversationStore
+
+
+@pytest.fixture(autouse=True)
+def close_files():
+    """Release the journal and lock files of the store a test left open."""
+    yield
+    store = ConversationStore._instance
+    if store is not None and store.persistence is not None:
+        _crash(store)
+
+
+def _open(directory) -> ConversationStore:
+    """Start a fresh store persisting to the directory, as a new worker would."""
+    ConversationStore._instance = None
+    store = ConversationStore()
+    persistence = ConversationPersistence(store, str(directory))
+    assert persistence._acquire_directory()
+    persistence.load()
+    store.persistence = persistence
+    return store
+
+
+def _crash(store: ConversationStore) -> None:
+    """Stop without a final snapshot, keeping what was flushed to the journal."""
+    persistence = store.persistence
+    persistence.flush()
+    persistence._journal.close()
+    if persistence._lock_file is not None:
+        persistence._lock_file.close()
+    store.persistence = None
+
+
+def _contents(store: ConversationStore):
+    return {
+        conversation_id: (store.get_version(conversation_id), [(m["role"], m["content"]) for m in messages])
+        for conversation_id, messages in store.get_all_conversations().items()
+    }
+
+
+def _journals(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("journal."))
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    store = _open(tmp_path)
+    for index in range(3):
+        store.add_message("c1", "user", f"message {index}")
+    store.add_message("c2", "user", "hello")
+    before = _contents(store)
+    _crash(store)
+
+    restored = _open(tmp_path)
+
+    assert _contents(restored) == before
+    assert restored.persistence.stats["replayed_messages"] == 4
+
+
+def test_snapshot_plus_journal_replay_after_a_truncated_record(tmp_path):
+    store = _open(tmp_path)
+    store.add_message("c1", "user", "in the snapshot")
+    store.persistence.snapshot()
+    store.add_message("c1", "assistant", "in the journal")
+    store.add_message("c2", "user", "also in the journal")
+    expected = _contents(store)
+    store.add_message("c1", "user", "cut off by the crash")
+    _crash(store)
+
+    # The crash cut the last record short
+    segment = tmp_path / _journals(tmp_path)[-1]
+    with open(segment, "r+b") as file:
+        file.truncate(os.path.getsize(segment) - 5)
+
+    restored = _open(tmp_path)
+
+    assert _contents(restored) == expected
+    assert restored.persistence.stats["restored_conversations"] == 1
+    assert restored.persistence.stats["replayed_messages"] == 2
+    # New writes go to a new segment, never after the torn record
+    assert restored.persistence.generation > int(segment.name.split(".")[1])
+    restored.add_message("c1", "user", "after the restart")
+    _crash(restored)
+    assert _open(tmp_path).get_conversation("c1")[-1]["content"] == "after the restart"
+
+
+def test_corrupt_record_stops_the_replay(tmp_path):
+    store = _open(tmp_path)
+    store.add_message("c1", "user", "first")
+    store.add_message("c1", "user", "second")
+    _crash(store)
+
+    segment = tmp_path / _journals(tmp_path)[-1]
+    data = bytearray(segment.read_bytes())
+    # Flip a byte in the last record's payload so its checksum no longer matches
+    data[-2] ^= 0xFF
+    segment.write_bytes(bytes(data))
+
+    assert [m["content"] for m in _open(tmp_path).get_conversation("c1")] == ["first"]
+
+
+def test_snapshot_compacts_the_journal(tmp_path):
+    store = _open(tmp_path)
+    for index in range(5):
+        store.add_message(f"c{index}", "user", "hello")
+    before = _contents(store)
+
+    store.persistence.snapshot()
+    _crash(store)
+
+    assert len(_journals(tmp_path)) == 1
+    assert (tmp_path / _journals(tmp_path)[0]).read_bytes() == JOURNAL_MAGIC
+    restored = _open(tmp_path)
+    assert _contents(restored) == before
+    assert restored.persistence.stats["replayed_messages"] == 0
+
+
+def test_entries_in_both_snapshot_and_journal_apply_once(tmp_path):
+    store = _open(tmp_path)
+    store.add_message("c1", "user", "one")
+    store.add_message("c1", "user", "two")
+    _crash(store)
+    # Copy the journal so it is replayed on top of a snapshot holding the same messages
+    journal = (tmp_path / _journals(tmp_path)[-1]).read_bytes()
+
+    store = _open(tmp_path)
+    store.persistence.snapshot()
+    _crash(store)
+    (tmp_path / _journals(tmp_path)[-1]).write_bytes(journal)
+
+    restored = _open(tmp_path)
+    assert [m["content"] for m in restored.get_conversation("c1")] == ["one", "two"]
+    assert restored.get_version("c1").endswith("-2")
+
+
+def test_unreadable_snapshot_falls_back_to_the_journal(tmp_path):
+    store = _open(tmp_path)
+    store.add_message("c1", "user", "journaled")
+    _crash(store)
+    (tmp_path / SNAPSHOT_FILE).write_bytes(b"not a snapshot")
+
+    assert [m["content"] for m in _open(tmp_path).get_conversation("c1")] == ["journaled"]
+
+
+@pytest.mark.skipif(fcntl is None, reason="directory locking needs fcntl")
+def test_second_worker_does_not_share_the_directory(tmp_path):
+    store = _open(tmp_path)
+
+    other = ConversationPersistence(store, str(tmp_path))
+
+    assert not other._acquire_directory()
+    _crash(store)
+    assert other._acquire_directory()
+    other._lock_file.close()
+
+
+async def test_close_writes_a_final_snapshot(tmp_path):
+    store = _open(tmp_path)
+    store.add_message("c1", "user", "hello")
+    before = _contents(store)
+
+    await store.close()
+
+    restored = _open(tmp_path)
+    assert _contents(restored) == before
+    assert restored.persistence.stats["replayed_messages"] == 0
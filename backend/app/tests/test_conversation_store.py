@@ -0,0 +1,93 @@
+"""
+Tests for the memory-bounded conversation store.
+"""
+import time
+import pytest
+from app.services.conversation_store import ConversationStore
+
+
+@pytest.fixture
+def store():
+    store = ConversationStore()
+    store.max_conversations = 3
+    store.max_messages = 4
+    store.max_bytes = 10 * 1024 * 1024
+    store.idle_ttl = 3600
+    return store
+
+
+def test_messages_are_returned_in_order(store):
+    store.add_message("c1", "user", "hello")
+    store.add_message("c1", "assistant", "hi")
+    assert [m["content"] for m in store.get_conversation("c1")] == ["hello", "hi"]
+    assert store.get_conversation_messages_for_llm("c1") == [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+    ]
+
+
+def test_least_recently_used_conversation_is_evicted(store):
+    for conversation_id in ("c1", "c2", "c3"):
+        store.add_message(conversation_id, "user", "hello")
+    # Reading c1 makes c2 the least recently used
+    store.get_conversation("c1")
+    store.add_message("c4", "user", "hello")
+    assert not store.has_conversation("c2")
+    assert all(store.has_conversation(c) for c in ("c1", "c3", "c4"))
+    assert store.evictions["lru"] == 1
+
+
+def test_idle_conversation_expires(store, monkeypatch):
+    store.add_message("c1", "user", "hello")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + store.idle_ttl + 1)
+    assert store.get_conversation("c1") is None
+    assert store.evictions["ttl"] == 1
+
+
+def test_byte_budget_evicts_oldest(store):
+    store.add_message("c1", "user", "x" * 2000)
+    store.max_bytes = store.total_bytes + 100
+    store.add_message("c2", "user", "y" * 2000)
+    assert not store.has_conversation("c1")
+    assert store.has_conversation("c2")
+    assert store.evictions["bytes"] == 1
+    assert store.total_bytes == store.conversations["c2"].size
+
+
+def test_long_conversation_is_trimmed(store):
+    for index in range(6):
+        store.add_message("c1", "user", f"message {index}")
+    assert [m["content"] for m in store.get_conversation("c1")] == [f"message {i}" for i in range(2, 6)]
+    assert store.get_message_offset("c1") == 2
+    assert store.evictions["trimmed_messages"] == 2
+
+
+def test_append_retries_when_evicted_before_locking(store):
+    store.add_message("c1", "user", "first")
+    touch = store._touch
+    calls = []
+
+    def evicting_touch(conversation_id, create=False):
+        conversation = touch(conversation_id, create)
+        if not calls:
+            # Another request evicts the conversation before the append takes its lock
+            with store._store_lock:
+                store._remove(conversation_id, "lru")
+        calls.append(conversation_id)
+        return conversation
+
+    store._touch = evicting_touch
+    store.add_message("c1", "assistant", "second")
+    del store._touch
+
+    assert len(calls) == 2
+    assert [m["content"] for m in store.get_conversation("c1")] == ["second"]
+
+
+def test_version_changes_on_every_write(store):
+    store.add_message("c1", "user", "hello")
+    first = store.get_version("c1")
+    store.add_message("c1", "assistant", "hi")
+    assert store.get_version("c1") != first
+    assert store.get_version("missing") is None
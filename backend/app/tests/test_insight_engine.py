@@ -0,0 +1,87 @@
+"""
+Tests for the streaming result summaries.
+"""
+from datetime import date
+from decimal import Decimal
+from app.services.insight_engine import DistinctSketch, InsightAccumulator, format_summary, summarize_result
+from app.services.result_store import build_result
+
+
+def test_decimal_columns_are_summarized_as_numbers():
+    rows = [(f"r{index % 2}", Decimal(index) / 4, date(2024, 1, 1 + index % 3)) for index in range(8)]
+
+    summary = summarize_result(build_result(["region", "amount", "day"], rows), chunk_rows=3, group_by=["region"])
+
+    amount = summary["columns"]["amount"]
+    assert amount["type"] == "numeric"
+    assert (amount["min"], amount["max"], amount["sum"]) == (0.0, 1.75, 7.0)
+    assert summary["columns"]["day"]["distinct"] == 3
+    assert {group["key"]: group["amount"]["sum"] for group in summary["groups"]["top"]} == {"r0": 3.0, "r1": 4.0}
+
+
+def test_distinct_estimate_of_repeated_integers():
+    rows = [(index % 2000,) for index in range(100_000)]
+
+    summary = summarize_result(build_result(["value"], rows), chunk_rows=4096)
+
+    assert abs(summary["columns"]["value"]["distinct"] - 2000) <= 2000 * 0.1
+
+
+def test_distinct_count_is_exact_below_the_sketch_size():
+    sketch = DistinctSketch(1024)
+    sketch.update([index % 300 for index in range(10_000)])
+    sketch.update([f"label {index}" for index in range(200)])
+
+    assert sketch.estimate() == 500
+
+
+def test_merged_sketches_match_one_sketch_of_all_values():
+    values = [index * 7919 % 50_000 for index in range(50_000)]
+    whole, first, second = DistinctSketch(512), DistinctSketch(512), DistinctSketch(512)
+    whole.update(values)
+    first.update(values[:20_000])
+    second.update(values[20_000:])
+
+    first.merge(second)
+
+    assert first.hashes.tolist() == whole.hashes.tolist()
+    assert abs(whole.estimate() - 50_000) <= 50_000 * 0.15
+
+
+def test_partial_summaries_merge_into_the_full_summary():
+    rows = [(f"r{index % 3}", float(index), index % 5 or None) for index in range(300)]
+    names = ["region", "x", "y"]
+    whole = InsightAccumulator(group_by=["region"])
+    whole.update_rows(names, rows)
+    merged = InsightAccumulator(group_by=["region"])
+    for start in range(0, 300, 70):
+        part = InsightAccumulator(group_by=["region"])
+        part.update_rows(names, rows[start:start + 70])
+        merged.merge(part)
+
+    assert merged.summary() == whole.summary()
+    assert merged.summary()["columns"]["y"]["nulls"] == 60
+    assert format_summary(merged.summary()).startswith("Rows: 300")
+
+
+def test_groups_by_several_keys_with_nulls():
+    rows = [(["a", "b", None][index % 3], index % 2 == 0, index, float(index) if index % 4 else None) for index in range(12)]
+
+    summary = summarize_result(build_result(["label", "even", "n", "x"], rows), chunk_rows=5, group_by=["label", "even"])
+
+    groups = {group["key"]: group for group in summary["groups"]["top"]}
+    assert summary["groups"]["count"] == 6
+    assert groups[(None, True)]["count"] == 2
+    assert (groups[(None, True)]["n"]["sum"], groups[(None, True)]["n"]["max"]) == (10.0, 8)
+    assert groups[("a", True)]["x"]["sum"] == 6.0
+
+
+def test_numeric_columns_and_python_values_hash_alike():
+    accumulator = InsightAccumulator()
+    accumulator.update_rows(["value"], [(float(index % 50),) for index in range(1000)])
+    sketch = DistinctSketch(1024)
+    sketch.update(list(range(50)))
+
+    sketch.merge(accumulator.columns["value"].distinct)
+
+    assert sketch.estimate() == 50
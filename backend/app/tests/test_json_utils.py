@@ -0,0 +1,99 @@
+"""
+Tests for response serialization.
+"""
+import argparse
+import json
+import pytest
+from benchmarks import serialization
+from app.utils import json_utils
+
+PAYLOAD = {
+    "id": "c1",
+    "messages": [{"role": "user", "content": "Umsatz über 5 € — 増加", "timestamp": "2024-05-01T12:00:00"}],
+    "next_cursor": 1,
+    "has_more": False,
+    "score": 0.25,
+    "extra": None,
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Run a test with orjson and with the standard library fallback."""
+    if request.param == "json":
+        monkeypatch.setattr(json_utils, "orjson", None)
+    elif json_utils.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_dumps_is_compact_utf8_json(encoder):
+    encoded = json_utils.dumps(PAYLOAD)
+
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == PAYLOAD
+    assert "über 5 € — 増加".encode("utf-8") in encoded
+    assert b": " not in encoded and b", " not in encoded
+
+
+def test_encoders_agree(monkeypatch):
+    if json_utils.orjson is None:
+        pytest.skip("orjson is not installed")
+    fast = json_utils.dumps(PAYLOAD)
+    monkeypatch.setattr(json_utils, "orjson", None)
+
+    assert json_utils.dumps(PAYLOAD) == fast
+
+
+def test_non_string_keys_are_encoded_as_strings(encoder):
+    assert json.loads(json_utils.dumps({1: "a", "b": {2: True}})) == {"1": "a", "b": {"2": True}}
+
+
+def test_chat_response_is_validated_from_a_plain_dict(client):
+    response = client.post("/api/chat", json={"query": "hello"})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert set(body) >= {"query", "result", "conversation_id", "metadata"}
+    assert body["query"] == "hello"
+
+
+def test_conversation_page_is_gzipped_when_large(client, monkeypatch):
+    from app.config import settings
+
+    store = client.app.state.conversation_store
+    for index in range(20):
+        store.add_message("c1", "user", f"message {index} " * 20)
+
+    monkeypatch.setattr(settings, "conversation_gzip_min_bytes", 512)
+    compressed = client.get("/api/chat/conversation/c1", headers={"Accept-Encoding": "gzip"})
+    monkeypatch.setattr(settings, "conversation_gzip_min_bytes", 1 << 30)
+    plain = client.get("/api/chat/conversation/c1", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.json() == plain.json()
+    assert len(compressed.json()["messages"]) == 20
+
+
+def test_unchanged_conversation_poll_gets_304(client):
+    store = client.app.state.conversation_store
+    store.add_message("c1", "user", "hello")
+
+    first = client.get("/api/chat/conversation/c1")
+    again = client.get("/api/chat/conversation/c1", headers={"If-None-Match": first.headers["ETag"]})
+    store.add_message("c1", "assistant", "hi")
+    changed = client.get("/api/chat/conversation/c1", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304 and again.content == b""
+    assert changed.status_code == 200 and len(changed.json()["messages"]) == 2
+
+
+def test_serialization_benchmark_runs(capsys, monkeypatch):
+    # Call each case once instead of timing it
+    monkeypatch.setattr(serialization, "_time", lambda func, min_seconds=0.5: (func(), 1e-6)[1])
+
+    serialization.run(argparse.Namespace(messages=[10], batch=5))
+
+    output = capsys.readouterr().out
+    assert "conversation (10 msgs)" in output and "batch (5 items)" in output
@@ -0,0 +1,58 @@
+"""
+Tests for the async LLM call path.
+"""
+import asyncio
+import pytest
+from benchmarks.fake_llm import FakeChatModel
+from app.services.llm_service import LLMService
+
+
+class CountingChatModel(FakeChatModel):
+    """Fake model that records the highest number of calls in flight at once."""
+
+    in_flight: int = 0
+    peak: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+async def test_agenerate_reports_serving_backend(fake_llm):
+    service = fake_llm()
+    result = await service.agenerate("How did revenue change?", role="DataAnalyst")
+    assert result.text
+    assert result.provider == service.provider
+    assert result.model == service.model_name
+    assert not result.fallback
+    await service.aclose()
+
+
+async def test_agenerate_is_deterministic(fake_llm):
+    service = fake_llm()
+    first = await service.agenerate_response("Top products by margin")
+    second = await service.agenerate_response("Top products by margin")
+    assert first == second
+    await service.aclose()
+
+
+async def test_semaphore_bounds_concurrent_calls(fake_llm):
+    service = fake_llm()
+    model = CountingChatModel(latency=0.02, token_rate=1e6, response_tokens=3)
+    service.llm = model
+    LLMService._semaphore = asyncio.Semaphore(3)
+    results = await asyncio.gather(*(service.agenerate(f"query {index}") for index in range(12)))
+    assert len(results) == 12
+    assert model.peak == 3
+    await service.aclose()
+
+
+async def test_agenerate_times_out(fake_llm):
+    service = fake_llm(latency=1.0)
+    with pytest.raises(asyncio.TimeoutError):
+        await service.agenerate("slow query", timeout=0.05)
+    await service.aclose()
@@ -0,0 +1,45 @@
+"""
+Tests for the logging utilities.
+"""
+import random
+import pytest
+from app.utils import logging_utils
+from app.utils.logging_utils import get_logger, should_log_access
+
+
+@pytest.fixture
+def rates(monkeypatch):
+    monkeypatch.setattr(logging_utils, "ACCESS_LOG_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(logging_utils, "ACCESS_LOG_ROUTE_SAMPLE_RATES", {"/api/health": 0.0, "/api/chat": 0.5})
+
+
+def test_server_errors_are_always_logged(rates):
+    assert should_log_access("/api/health", 503)
+
+
+def test_route_rate_overrides_global_rate(rates):
+    assert not any(should_log_access("/api/health", 200) for _ in range(100))
+    assert all(should_log_access("/api/roles", 200) for _ in range(100))
+
+
+def test_longest_matching_prefix_wins(rates, monkeypatch):
+    monkeypatch.setitem(logging_utils.ACCESS_LOG_ROUTE_SAMPLE_RATES, "/api/chat/stream", 1.0)
+    assert all(should_log_access("/api/chat/stream", 200) for _ in range(100))
+
+
+def test_partial_rate_samples(rates):
+    random.seed(7)
+    logged = sum(should_log_access("/api/chat", 200) for _ in range(2000))
+    assert 800 < logged < 1200
+
+
+def test_lazy_formatting_skips_filtered_records():
+    class Expensive:
+        formatted = False
+
+        def __format__(self, spec):
+            Expensive.formatted = True
+            return "expensive"
+
+    get_logger(__name__).trace("value: {}", Expensive())
+    assert not Expensive.formatted
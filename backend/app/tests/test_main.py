@@ -0,0 +1,37 @@
+"""
+Tests for the application lifecycle.
+"""
+from fastapi.testclient import TestClient
+from app.main import app
+
+
+def test_health(client):
+    assert client.get("/api/health").json() == {"status": "healthy"}
+
+
+def test_services_are_built_once_per_app(client):
+    llm_service = app.state.llm_service
+    chat_service = app.state.chat_service
+    for index in range(3):
+        response = client.post("/api/chat", json={"query": f"question {index}", "role": "DataAnalyst"})
+        assert response.status_code == 200
+    assert app.state.llm_service is llm_service
+    assert app.state.chat_service is chat_service
+    assert chat_service.llm_service is llm_service
+
+
+def test_startup_report_lists_phases(client):
+    report = app.state.startup_report
+    assert {"import", "llm_service", "conversation_store", "chat_service", "total"} <= set(report)
+    assert report["total"] >= report["import"]
+
+
+def test_shutdown_closes_connection_pools(client):
+    llm_service = app.state.llm_service
+    assert not llm_service.http_async_client.is_closed
+    # A second app instance gets its own service, closed when it shuts down
+    with TestClient(app):
+        restarted = app.state.llm_service
+        assert restarted is not llm_service
+        assert not restarted.http_async_client.is_closed
+    assert restarted.http_async_client.is_closed
@@ -0,0 +1,58 @@
+"""
+Tests for the Prometheus metrics and the metrics endpoint.
+"""
+from app.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_counter_renders_per_label_set():
+    counter = Counter("requests_total", "Requests", ("role",))
+    counter.inc(role="Executive")
+    counter.inc(2, role="Executive")
+    counter.inc(role=None)
+    lines = counter.render().splitlines()
+    assert lines[:2] == ["# HELP requests_total Requests", "# TYPE requests_total counter"]
+    assert 'requests_total{role="Executive"} 3.0' in lines
+    assert 'requests_total{role="none"} 1.0' in lines
+
+
+def test_gauge_goes_up_and_down():
+    gauge = Gauge("in_flight", "In flight", ("endpoint",))
+    gauge.inc(3, endpoint="chat")
+    gauge.dec(endpoint="chat")
+    assert 'in_flight{endpoint="chat"} 2.0' in gauge.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="provider")
+    lines = histogram.render().splitlines()
+    assert 'latency_seconds_bucket{stage="provider",le="0.1"} 1.0' in lines
+    assert 'latency_seconds_bucket{stage="provider",le="1.0"} 3.0' in lines
+    assert 'latency_seconds_bucket{stage="provider",le="+Inf"} 4.0' in lines
+    assert 'latency_seconds_sum{stage="provider"} 6.05' in lines
+    assert 'latency_seconds_count{stage="provider"} 4.0' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ("detail",))
+    counter.inc(detail='say "hi"\n')
+    assert 'errors_total{detail="say \\"hi\\"\\n"} 1.0' in counter.render()
+
+
+def test_registry_renders_every_metric():
+    registry = MetricsRegistry()
+    registry.register(Counter("a_total", "A")).inc()
+    registry.register(Gauge("b", "B")).set(4.0)
+    assert registry.render() == "# HELP a_total A\n# TYPE a_total counter\na_total 1.0\n# HELP b B\n# TYPE b gauge\nb 4.0\n"
+
+
+def test_metrics_endpoint_reports_chat_stages(client):
+    client.post("/api/chat", json={"query": "Revenue by region", "role": "DataAnalyst"})
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for stage in ("store_read", "context_build", "provider", "store_write"):
+        assert f'stage="{stage}"' in body
+    assert "llm_prompt_tokens_total" in body
@@ -0,0 +1,173 @@
+"""
+Tests for the MongoDB-backed conversation store, against an in-process fake collection.
+"""
+import asyncio
+from typing import Any, Dict, List
+import pytest
+from app.services.chat_service import ChatService
+from app.services.conversation_store import ConversationStore
+from app.services.mongo_conversation_store import MongoConversationStore
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]], projection: Dict[str, int]):
+        self.documents = documents
+        self.projection = projection
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents = sorted(self.documents, key=lambda document: document.get(field, 0), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length: int) -> List[Dict[str, Any]]:
+        fields = [field for field, include in self.projection.items() if include]
+        return [{field: document[field] for field in fields if field in document} for document in self.documents[:length]]
+
+
+class FakeCollection:
+    """Implements the subset of motor's collection API the store uses."""
+
+    def __init__(self):
+        self.documents: List[Dict[str, Any]] = []
+        self.insert_calls = 0
+        self.find_calls = 0
+        self.fail_inserts = 0
+
+    async def create_index(self, keys):
+        pass
+
+    async def insert_many(self, documents, ordered=True):
+        self.insert_calls += 1
+        if self.fail_inserts:
+            self.fail_inserts -= 1
+            raise ConnectionError("mongod unavailable")
+        for document in documents:
+            self.documents.append(dict(document, _id=len(self.documents)))
+
+    def find(self, query, projection):
+        self.find_calls += 1
+        matching = [d for d in self.documents if d["conversation_id"] == query["conversation_id"]]
+        return FakeCursor(matching, projection)
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection()
+
+
+@pytest.fixture
+async def store(collection):
+    store = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+    store.batch_size = 3
+    store.flush_interval = 0.01
+    await store.start()
+    yield store
+    await store.close()
+
+
+async def test_messages_are_written_behind_in_batches(store, collection):
+    for index in range(7):
+        store.add_message("c1", "user", f"message {index}")
+    # The request path never waits on the database
+    assert collection.documents == []
+    assert [m["content"] for m in store.get_conversation("c1")][-1] == "message 6"
+
+    await asyncio.sleep(0.1)
+    assert [d["content"] for d in collection.documents] == [f"message {i}" for i in range(7)]
+    assert store.write_stats["batches"] == 3
+
+
+async def test_failed_batch_is_retried_in_order(collection):
+    # Not started, so only the explicit flushes below write
+    store = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+    collection.fail_inserts = 1
+    for index in range(3):
+        store.add_message("c1", "user", f"message {index}")
+    assert not await store.flush()
+    assert await store.flush()
+    assert [d["content"] for d in collection.documents] == ["message 0", "message 1", "message 2"]
+    assert store.write_stats["failed_batches"] == 1
+
+
+async def test_close_flushes_pending_messages(collection):
+    store = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+    store.flush_interval = 60
+    await store.start()
+    store.add_message("c1", "user", "hello")
+    await store.close()
+    assert [d["content"] for d in collection.documents] == ["hello"]
+
+
+async def test_full_queue_drops_persistence_only(store):
+    store.max_pending = 2
+    for index in range(3):
+        store.add_message("c1", "user", f"message {index}")
+    assert store.write_stats["dropped"] == 1
+    assert len(store.get_conversation("c1")) == 3
+
+
+async def test_conversation_is_loaded_from_mongo(store, collection):
+    for index in range(4):
+        store.add_message("c1", "user", f"message {index}")
+    while store._pending:
+        await store.flush()
+
+    ConversationStore._instance = None
+    reloaded = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+    assert reloaded.get_conversation("c1") is None
+    await reloaded.ensure_loaded("c1")
+    assert [m["content"] for m in reloaded.get_conversation("c1")] == [f"message {i}" for i in range(4)]
+
+
+async def test_reloaded_conversation_keeps_version_and_cursors(collection):
+    store = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+    store.hot_tier.max_messages = 3
+    for index in range(5):
+        store.add_message("c1", "user", f"message {index}")
+    while store._pending:
+        await store.flush()
+    version = store.get_version("c1")
+    page = store.get_conversation_page("c1", cursor=3)
+    assert [m["content"] for m in page["messages"]] == ["message 3", "message 4"]
+
+    ConversationStore._instance = None
+    reloaded = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+    reloaded.hot_tier.max_messages = 3
+    await reloaded.ensure_loaded("c1")
+
+    assert reloaded.get_version("c1") == version
+    assert reloaded.get_conversation("c1") == store.get_conversation("c1")
+    assert reloaded.get_message_offset("c1") == 2
+    reloaded_page = reloaded.get_conversation_page("c1", cursor=3)
+    assert [m["content"] for m in reloaded_page["messages"]] == ["message 3", "message 4"]
+    assert reloaded_page["next_cursor"] == page["next_cursor"]
+    reloaded.add_message("c1", "assistant", "message 5")
+    assert reloaded.get_version("c1") == version.replace("-5", "-6")
+    assert reloaded._pending[-1]["seq"] == 6
+
+
+async def test_documents_without_sequence_numbers_still_load(collection):
+    collection.documents = [
+        {"_id": index, "conversation_id": "c1", "role": "user", "content": f"legacy {index}", "timestamp": float(index)}
+        for index in range(2)
+    ]
+    store = MongoConversationStore(collection=collection, hot_tier=ConversationStore())
+
+    await store.ensure_loaded("c1")
+
+    assert [m["content"] for m in store.get_conversation("c1")] == ["legacy 0", "legacy 1"]
+    assert store.get_version("c1").endswith("-2")
+
+
+async def test_new_conversation_is_not_looked_up(store, collection, fake_llm):
+    chat_service = ChatService(llm_service=fake_llm(), conversation_store=store)
+
+    response = await chat_service.process_chat("hello")
+    assert collection.find_calls == 0
+
+    await chat_service.process_chat("again", conversation_id=response["conversation_id"])
+    assert [m["content"] for m in store.get_conversation(response["conversation_id"])][::2] == ["hello", "again"]
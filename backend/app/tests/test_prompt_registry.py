@@ -0,0 +1,94 @@
+"""
+Tests for the prompt registry and the messages built from it.
+"""
+import shutil
+import pytest
+from app.config import settings
+from app.services.prompt_registry import PromptRegistry
+from app.services.roles_service import RolesService
+
+
+@pytest.fixture
+def directory(tmp_path):
+    """A writable copy of the shipped prompts."""
+    target = tmp_path / "prompts"
+    shutil.copytree(settings.prompts_dir, target)
+    return target
+
+
+def test_role_messages_are_precomputed_and_reused(directory):
+    registry = PromptRegistry(directory, hot_reload=False)
+
+    for role in RolesService.AVAILABLE_ROLES:
+        assert registry.system_message(role) is registry.system_message(role)
+        assert role in registry.system_prompt(role)
+    assert registry.system_message(None) is None
+    assert registry.get_stats()["roles"] == sorted(RolesService.AVAILABLE_ROLES)
+
+
+def test_unknown_roles_are_rendered_from_the_shared_template(directory):
+    registry = PromptRegistry(directory, hot_reload=False)
+
+    assert "Auditor" in registry.system_prompt("Auditor")
+    assert registry.system_message("Auditor").content == registry.system_prompt("Auditor")
+
+
+def test_render_fills_template_fields(directory):
+    registry = PromptRegistry(directory, hot_reload=False)
+
+    rendered = registry.render("summary_update", previous_summary="(none)", transcript="user: hi", max_tokens=50)
+
+    assert "user: hi" in rendered and "50" in rendered
+    assert "transcript" in registry.get("summary_update").fields
+    with pytest.raises(KeyError):
+        registry.render("summary_update")
+
+
+def test_hot_reload_picks_up_edited_and_role_specific_templates(directory):
+    registry = PromptRegistry(directory, hot_reload=True)
+    registry.reload_interval = 0
+    role, other = RolesService.AVAILABLE_ROLES[0], RolesService.AVAILABLE_ROLES[1]
+    before = registry.system_message(other)
+
+    (directory / f"role_system.{role}.txt").write_text("Board-level {role} view.\n", encoding="utf-8")
+
+    assert registry.system_prompt(role) == f"Board-level {role} view."
+    assert registry.system_message(other).content == before.content
+
+
+def test_without_hot_reload_edits_are_ignored(directory):
+    registry = PromptRegistry(directory, hot_reload=False)
+    role = RolesService.AVAILABLE_ROLES[0]
+    before = registry.system_prompt(role)
+
+    (directory / "role_system.txt").write_text("Changed {role}\n", encoding="utf-8")
+
+    assert registry.system_prompt(role) == before
+
+
+def test_broken_reload_keeps_the_last_good_templates(directory):
+    registry = PromptRegistry(directory, hot_reload=True)
+    registry.reload_interval = 0
+    role = RolesService.AVAILABLE_ROLES[0]
+    before = registry.system_prompt(role)
+
+    (directory / "role_system.txt").unlink()
+
+    assert registry.system_prompt(role) == before
+
+
+def test_missing_directory_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        PromptRegistry(tmp_path / "missing")
+
+
+def test_requests_for_a_role_share_a_byte_identical_prefix(fake_llm):
+    service = fake_llm()
+    role = RolesService.AVAILABLE_ROLES[0]
+
+    first = service._build_messages("q1", role, [{"role": "user", "content": "earlier"}], "summary")
+    second = service._build_messages("q2", role)
+
+    assert first[0] is second[0]
+    assert first[0].content == service.get_system_prompt(role)
+    assert first[-1].content == "q1" and second[-1].content == "q2"
@@ -0,0 +1,51 @@
+"""
+Tests for the lazily imported provider registry.
+"""
+import subprocess
+import sys
+import pytest
+from app.services import llm_service
+from app.services.llm_service import PROVIDERS, LLMService, preload_provider, register_provider
+
+
+def test_builtin_providers_are_registered():
+    assert {"openai", "gemma"} <= set(PROVIDERS)
+    assert PROVIDERS["openai"].module == "langchain_openai"
+
+
+def test_importing_the_service_does_not_import_provider_sdks():
+    code = (
+        "import os, sys; os.environ.setdefault('OPENAI_API_KEY', 'sk-test'); "
+        "import app.services.llm_service; print('langchain_openai' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == "False"
+
+
+def test_preload_imports_once(monkeypatch):
+    monkeypatch.setattr(llm_service, "PROVIDER_IMPORT_SECONDS", {})
+    assert preload_provider("openai") >= 0.0
+    assert "openai" in llm_service.PROVIDER_IMPORT_SECONDS
+    assert preload_provider("openai") == 0.0
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        preload_provider("no-such-provider")
+
+
+def test_registered_factory_builds_the_client(monkeypatch):
+    monkeypatch.setattr(llm_service, "PROVIDERS", dict(PROVIDERS))
+    monkeypatch.setattr(llm_service.settings, "llm_providers", ["local"])
+    monkeypatch.setattr(llm_service.settings, "openai_model_name", "local-model")
+    created = []
+
+    @register_provider("local", "json", "openai_model_name", "openai_base_url")
+    def create_local(service):
+        created.append(service)
+        return object()
+
+    service = LLMService()
+    assert created == [service]
+    assert service.provider == "local"
+    assert service.model_name == "local-model"
@@ -0,0 +1,114 @@
+"""
+Tests for multi-provider routing, hedging and fallback.
+"""
+import time
+from langchain_core.messages import HumanMessage
+import pytest
+from benchmarks.fake_llm import FakeChatModel
+from app.config import settings
+from app.services.chat_service import ChatService
+from app.services.llm_service import LLMResult, LLMService
+from app.services.provider_router import ProviderBackend, ProviderRouter
+
+MESSAGES = [HumanMessage(content="Revenue by region")]
+
+
+class FailingChatModel(FakeChatModel):
+    """Fake model whose calls always fail."""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise ConnectionError("provider down")
+
+
+def _fake(latency: float = 0.0) -> FakeChatModel:
+    return FakeChatModel(latency=latency, token_rate=1e6, response_tokens=3)
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+    monkeypatch.setattr(settings, "llm_router_failure_threshold", 2)
+
+    def create(*backends: ProviderBackend) -> ProviderRouter:
+        return ProviderRouter(list(backends))
+
+    return create
+
+
+async def test_fastest_healthy_backend_ranks_first(router):
+    slow = ProviderBackend("openai", "gpt", _fake())
+    fast = ProviderBackend("gemma", "gemma", _fake())
+    slow.record_success(0.5)
+    fast.record_success(0.1)
+    assert router(slow, fast).select() is fast
+
+
+async def test_failure_falls_back_to_next_backend(router):
+    primary = ProviderBackend("openai", "gpt", FailingChatModel())
+    secondary = ProviderBackend("gemma", "gemma", _fake())
+    routed = await router(primary, secondary).ainvoke(MESSAGES, timeout=1.0)
+    assert routed.backend is secondary
+    assert routed.fallback
+    assert primary.failures == 1
+
+
+async def test_repeated_failures_put_backend_in_cooldown(router):
+    primary = ProviderBackend("openai", "gpt", FailingChatModel())
+    secondary = ProviderBackend("gemma", "gemma", _fake())
+    routes = router(primary, secondary)
+    for _ in range(2):
+        await routes.ainvoke(MESSAGES, timeout=1.0)
+    assert not primary.is_healthy(time.monotonic())
+    assert routes.select() is secondary
+
+
+async def test_slow_backend_is_hedged(router, monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_delay_seconds", 0.02)
+    slow = ProviderBackend("openai", "gpt", _fake(latency=1.0))
+    fast = ProviderBackend("gemma", "gemma", _fake())
+    routed = await router(slow, fast).ainvoke(MESSAGES, timeout=5.0)
+    assert routed.backend is fast
+    assert routed.hedged
+
+
+async def test_every_backend_failing_raises_last_error(router):
+    routes = router(ProviderBackend("openai", "gpt", FailingChatModel()), ProviderBackend("gemma", "gemma", FailingChatModel()))
+    with pytest.raises(ConnectionError):
+        await routes.ainvoke(MESSAGES, timeout=1.0)
+
+
+async def test_fallback_response_is_attributed_to_serving_backend(monkeypatch):
+    monkeypatch.setattr(settings, "llm_providers", ["openai", "gemma"])
+    monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+    monkeypatch.setattr(settings, "response_cache_dir", "")
+    monkeypatch.setattr(
+        LLMService, "_initialize_llm",
+        lambda self, provider: FailingChatModel() if provider == "openai" else _fake(),
+    )
+    chat_service = ChatService(llm_service=LLMService())
+    response = await chat_service.process_chat("Revenue by region", role="DataAnalyst", conversation_id="c1")
+
+    metadata = response["metadata"]
+    assert (metadata["provider"], metadata["fallback"]) == ("gemma", True)
+    assert metadata["model"] == settings.gemma_model_name
+
+    # Cached under the backend that produced the answer, not the primary
+    context = await chat_service.context_builder.build("c2", None, "Revenue by region", "DataAnalyst")
+    served = LLMResult(provider="gemma", model=settings.gemma_model_name)
+    primary = LLMResult(provider="openai", model=settings.openai_model_name)
+    cache = chat_service.response_cache
+    assert await cache.get(chat_service._make_cache_key("Revenue by region", "DataAnalyst", context, served)) is not None
+    assert await cache.get(chat_service._make_cache_key("Revenue by region", "DataAnalyst", context, primary)) is None
+
+
+async def test_error_rate_penalizes_a_fast_backend(router):
+    flaky = ProviderBackend("gemma", "gemma", _fake())
+    steady = ProviderBackend("openai", "gpt", _fake())
+    flaky.record_success(0.1)
+    for _ in range(4):
+        flaky.record_failure(failure_threshold=100, cooldown=1.0)
+    steady.record_success(0.2)
+    assert router(flaky, steady).select() is steady
+
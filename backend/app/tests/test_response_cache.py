@@ -0,0 +1,99 @@
+"""
+Tests for the LLM response cache.
+"""
+import time
+import pytest
+from app.config import settings
+from app.services import response_cache
+from app.services.response_cache import ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Revenue last quarter"}]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+    monkeypatch.setattr(settings, "response_cache_dir", "")
+    cache = ResponseCache()
+    yield cache
+    cache.close()
+
+
+def test_key_ignores_whitespace_and_case():
+    key = ResponseCache.make_key("openai", "gpt-4o", "prompt", MESSAGES)
+    same = ResponseCache.make_key("openai", "gpt-4o", "prompt", [{"role": "user", "content": " revenue  LAST quarter"}])
+    assert key == same
+
+
+def test_key_covers_provider_model_and_system_prompt():
+    key = ResponseCache.make_key("openai", "gpt-4o", "prompt", MESSAGES)
+    assert key != ResponseCache.make_key("gemma", "gpt-4o", "prompt", MESSAGES)
+    assert key != ResponseCache.make_key("openai", "gpt-4o-mini", "prompt", MESSAGES)
+    assert key != ResponseCache.make_key("openai", "gpt-4o", "other prompt", MESSAGES)
+
+
+async def test_hit_after_set(cache):
+    key = ResponseCache.make_key("openai", "gpt-4o", None, MESSAGES)
+    assert await cache.get(key) is None
+    await cache.set(key, "Revenue grew 12%")
+    assert await cache.get(key) == "Revenue grew 12%"
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+async def test_entries_expire(cache, monkeypatch):
+    await cache.set("key", "value")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + cache.ttl + 1)
+    assert await cache.get("key") is None
+
+
+async def test_least_recently_used_entry_is_evicted(cache):
+    cache.max_entries = 2
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    await cache.get("a")
+    await cache.set("c", "3")
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert cache.stats["evictions"] == 1
+
+
+async def test_disk_tier_survives_restart(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+    monkeypatch.setattr(settings, "response_cache_dir", str(tmp_path))
+    first = ResponseCache()
+    await first.set("key", "cached answer")
+    first.close()
+
+    second = ResponseCache()
+    assert await second.get("key") == "cached answer"
+    assert second.stats["disk_hits"] == 1
+    second.close()
+
+
+def test_disabled_roles(cache):
+    cache.disabled_roles = {"DataAnalyst"}
+    assert not cache.is_enabled_for("DataAnalyst")
+    assert cache.is_enabled_for("Executive")
+
+
+async def test_expired_disk_entries_are_purged_periodically(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+    monkeypatch.setattr(settings, "response_cache_dir", str(tmp_path))
+    monkeypatch.setattr(response_cache, "EXPIRE_EVERY_WRITES", 4)
+    cache = ResponseCache()
+    await cache.set("old", "stale answer")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + cache.ttl + 1)
+
+    for index in range(2):
+        await cache.set(f"key {index}", "answer")
+    assert cache._disk.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 3
+    await cache.set("key 2", "answer")
+
+    assert cache._disk.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 3
+    assert cache.stats["expired"] == 1
+    plan = cache._disk.execute("EXPLAIN QUERY PLAN DELETE FROM responses WHERE expires_at < 0").fetchall()
+    assert "responses_expires_at" in str(plan)
+    cache.close()
@@ -0,0 +1,148 @@
+"""
+Tests for the columnar result store and its spill files.
+"""
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+import threading
+import pytest
+from app.services.result_store import ColumnBuilder, ResultStore, build_result
+from app.services.sql_executor import RowChunk
+
+ROWS = [
+    (1, 1.5, "a", True, Decimal("19.990"), datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), date(2024, 5, 1), time(8, 15)),
+    (None, None, None, None, None, None, None, None),
+    (3, -2.25, "é", False, Decimal("-0.000001"), datetime(2024, 5, 2, 9, 0, 0, 123456), date(1999, 12, 31), time(23, 59, 59)),
+]
+NAMES = ["id", "score", "label", "flag", "price", "created_at", "day", "opens"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "results"))
+    yield store
+    store.close()
+
+
+def _built(values):
+    builder = ColumnBuilder("value")
+    for value in values:
+        builder.append(value)
+    return builder.finish()
+
+
+def test_values_round_trip_with_their_types():
+    result = build_result(NAMES, ROWS)
+
+    assert [column.kind for column in result.columns] == [
+        "int", "float", "str", "bool", "decimal", "datetime", "date", "time"
+    ]
+    assert list(result.rows()) == ROWS
+    assert [column.to_list() for column in result.columns] == [list(values) for values in zip(*ROWS)]
+    assert result.column("price")[0] == Decimal("19.990") and str(result.column("price")[0]) == "19.990"
+
+
+def test_objects_keep_nested_decimals_and_datetimes():
+    values = [{"total": Decimal("0.10"), "at": datetime(2024, 1, 2, 3, 4)}, [date(2024, 1, 2), time(5, 6)], None]
+    column = _built(values)
+
+    assert column.kind == "object"
+    assert column.to_list() == values
+    assert column[0]["total"] == Decimal("0.10")
+
+
+def test_mixed_numeric_kinds_widen_without_losing_exactness():
+    assert _built([1, 2.5]).to_list() == [1.0, 2.5]
+    widened = _built([1, Decimal("2.50")])
+    assert widened.kind == "decimal" and widened.to_list() == [Decimal("1"), Decimal("2.50")]
+    mixed = _built([Decimal("0.1"), 0.5])
+    assert mixed.kind == "object" and mixed.to_list() == [Decimal("0.1"), 0.5]
+    assert _built([1, 1 << 70]).to_list() == [1, 1 << 70]
+
+
+def test_mixed_temporal_and_text_values_become_objects():
+    column = _built([date(2024, 1, 2), "soon", datetime(2024, 1, 2, 3, 4)])
+
+    assert column.kind == "object"
+    assert column.to_list() == [date(2024, 1, 2), "soon", datetime(2024, 1, 2, 3, 4)]
+
+
+def test_slices_share_the_buffers():
+    result = build_result(["id", "label"], [(index, f"row {index}") for index in range(100)])
+
+    part = result.slice(10, 13)
+
+    assert part.to_dicts() == [{"id": index, "label": f"row {index}"} for index in range(10, 13)]
+    assert part.column("id").values().obj is result.column("id").values().obj
+    assert part.column("label").data.obj is result.column("label").data.obj
+    assert len(result.slice(90, 200)) == 10
+
+
+def test_large_results_spill_to_a_mapped_file(store):
+    store.spill_bytes = 1024
+    rows = [(index, index * 0.5, f"label {index}", Decimal(index) / 100, date(2024, 1, 1 + index % 28)) for index in range(2000)]
+    names = ["id", "half", "label", "price", "day"]
+
+    with pytest.raises(KeyError):
+        store.get("ctx", "step")
+    result = store.put_rows("ctx", "step", names, rows)
+
+    assert result.spill_path is not None and result.spill_path.exists()
+    assert store.stats["spilled"] == 1 and store.memory_bytes == 0
+    assert list(result.rows()) == rows
+    assert list(result.slice(1500, 1503).rows()) == rows[1500:1503]
+
+    path = result.spill_path
+    del result
+    store.release("ctx")
+    assert not path.exists()
+    assert store.get_stats()["spilled_bytes"] == 0
+
+
+def test_small_results_stay_in_memory_until_released(store):
+    result = store.put_rows("ctx", "step", NAMES, ROWS)
+
+    assert result.spill_path is None
+    assert store.memory_bytes == result.nbytes
+    assert store.keys("ctx") == ["step"]
+    store.release("ctx")
+    assert store.memory_bytes == 0 and store.keys("ctx") == []
+
+
+def test_concurrent_puts_stay_within_the_memory_budget(store):
+    result = build_result(NAMES, ROWS)
+    store.max_memory_bytes = int(result.nbytes * 2.5)
+    ready = threading.Barrier(8)
+
+    def put(index):
+        ready.wait()
+        store.put("ctx", f"step {index}", result)
+
+    threads = [threading.Thread(target=put, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.memory_bytes == 2 * result.nbytes
+    assert store.get_stats()["spilled"] == 6
+
+
+def test_spilled_results_keep_nulls_and_exact_values(store):
+    store.spill_bytes = 0
+    result = store.put_rows("ctx", "step", NAMES, ROWS)
+
+    assert result.spill_path is not None
+    assert list(result.rows()) == ROWS
+
+
+async def test_streamed_chunks_are_stored_as_columns(store):
+    async def chunks():
+        for index in range(3):
+            yield RowChunk(("id", "price"), [(index * 2 + offset, Decimal(f"{index}.{offset}5")) for offset in range(2)], index)
+
+    async with store.context() as context_id:
+        result = await store.write(context_id, "step", chunks())
+        assert [column.kind for column in result.columns] == ["int", "decimal"]
+        assert result.column("price").to_list()[-1] == Decimal("2.15")
+        assert len(result) == 6
+    assert store.get_stats()["contexts"] == 0
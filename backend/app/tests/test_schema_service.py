@@ -0,0 +1,124 @@
+"""
+Tests for the cached schema index, against a local SQLite database.
+"""
+import json
+import pytest
+from app.services.schema_service import SchemaService
+from app.services.sql_executor import SQLExecutor
+
+
+@pytest.fixture
+async def executor(tmp_path):
+    executor = SQLExecutor(f"sqlite:///{tmp_path / 'reports.db'}")
+    await executor.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL, region TEXT)")
+    await executor.execute(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), "
+        "amount REAL, region TEXT)"
+    )
+    await executor.execute("CREATE TABLE audit_log (id INTEGER PRIMARY KEY, note TEXT)")
+    yield executor
+    await executor.aclose()
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return tmp_path / "schema.json"
+
+
+@pytest.fixture
+async def service(executor, snapshot):
+    service = SchemaService(executor, str(snapshot))
+    service.ttl = 3600
+    await service.start()
+    yield service
+    await service.close()
+
+
+async def test_lookups_by_table_and_column_name(service):
+    orders = service.get_table("ORDERS")
+
+    assert [column.name for column in orders.columns] == ["id", "customer_id", "amount", "region"]
+    assert orders.get_column("ID").primary_key
+    assert service.get_table("missing") is None
+    assert sorted(table.name for table, _ in service.find_column("Region")) == ["customers", "orders"]
+    assert [table.name for table in service.search("cust")] == ["customers", "orders"]
+
+
+async def test_relationships_and_prompt_description(service):
+    relationships = service.relationships("customers")
+
+    assert [(name, key.columns, key.referred_table) for name, key in relationships] == [
+        ("orders", ("customer_id",), "customers")
+    ]
+    assert service.describe(["orders", "missing"]) == (
+        "orders(id INTEGER PK, customer_id INTEGER -> customers.id, amount REAL, region TEXT)"
+    )
+
+
+async def test_refresh_introspects_only_changed_tables(service, executor):
+    assert not await service.refresh()
+
+    await executor.execute("ALTER TABLE orders ADD COLUMN status TEXT")
+    await executor.execute("DROP TABLE audit_log")
+    await executor.execute("CREATE TABLE regions (code TEXT PRIMARY KEY)")
+
+    assert await service.refresh()
+    assert service.stats["tables_introspected"] == 3 + 2
+    assert service.stats["tables_dropped"] == 1
+    assert service.get_table("orders").get_column("status") is not None
+    assert service.get_table("audit_log") is None
+    assert service.get_table("regions") is not None
+
+
+async def test_restart_loads_the_snapshot_without_introspecting(service, executor, snapshot):
+    restarted = SchemaService(executor, str(snapshot))
+    restarted.ttl = 3600
+    await restarted.start()
+
+    assert restarted.stats["refreshes"] == 0
+    assert restarted.describe(["orders"]) == service.describe(["orders"])
+    assert restarted.get_stats()["tables"] == 3
+
+
+async def test_snapshot_of_another_database_is_ignored(service, snapshot, tmp_path):
+    other = SQLExecutor(f"sqlite:///{tmp_path / 'other.db'}")
+    await other.execute("CREATE TABLE things (id INTEGER PRIMARY KEY)")
+    try:
+        restarted = SchemaService(other, str(snapshot))
+        await restarted.start()
+        assert restarted.get_table("orders") is None
+        assert restarted.get_table("things") is not None
+    finally:
+        await other.aclose()
+
+
+async def test_stale_index_refreshes_in_the_background(service, executor):
+    await executor.execute("CREATE TABLE regions (code TEXT PRIMARY KEY)")
+    service.refreshed_at = 0
+
+    # The lookup answers from the current index and schedules a refresh
+    assert service.get_table("regions") is None
+    await service._refresh_task
+
+    assert service.get_table("regions") is not None
+
+
+async def test_failed_refresh_keeps_the_index(service, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(service.executor, "fetch", fail)
+
+    assert not await service.refresh()
+    assert service.stats["failed_refreshes"] == 1
+    assert service.get_table("orders") is not None
+
+
+async def test_unreadable_snapshot_falls_back_to_introspection(executor, snapshot):
+    snapshot.write_text("{not json")
+
+    service = SchemaService(executor, str(snapshot))
+    await service.start()
+
+    assert service.get_table("orders") is not None
+    assert json.loads(snapshot.read_text())["tables"]
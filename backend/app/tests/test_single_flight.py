@@ -0,0 +1,64 @@
+"""
+Tests for single-flight call coalescing.
+"""
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    group = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    results = await asyncio.gather(*(group.do("key", fetch) for _ in range(5)))
+    assert calls == 1
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert group.get_stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+async def test_different_keys_run_separately():
+    group = SingleFlight()
+    results = await asyncio.gather(group.do("a", lambda: asyncio.sleep(0, "a")), group.do("b", lambda: asyncio.sleep(0, "b")))
+    assert results == [("a", False), ("b", False)]
+
+
+async def test_sequential_calls_are_not_coalesced():
+    group = SingleFlight()
+    await group.do("key", lambda: asyncio.sleep(0, 1))
+    result, shared = await group.do("key", lambda: asyncio.sleep(0, 2))
+    assert (result, shared) == (2, False)
+
+
+async def test_errors_reach_every_caller():
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(group.do("key", fail), group.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_call_survives_cancelled_starter():
+    group = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    starter = asyncio.create_task(group.do("key", fetch))
+    await asyncio.sleep(0)
+    joiner = asyncio.create_task(group.do("key", fetch))
+    await asyncio.sleep(0)
+    starter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await starter
+    assert await joiner == ("answer", True)
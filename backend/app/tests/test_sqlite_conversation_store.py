@@ -0,0 +1,112 @@
+"""
+Tests for the SQLite conversation store shared by worker processes.
+"""
+import asyncio
+import threading
+import pytest
+from app.services.sqlite_conversation_store import SQLiteConversationStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "conversations.sqlite")
+
+
+def test_workers_share_conversations_through_the_database(path):
+    first, second = SQLiteConversationStore(path), SQLiteConversationStore(path)
+
+    first.add_message("c1", "user", "hello")
+    second.add_message("c1", "assistant", "hi")
+
+    assert [m["content"] for m in first.get_conversation("c1")] == ["hello", "hi"]
+    assert first.get_version("c1") == second.get_version("c1")
+    assert first.get_version("c1").endswith("-2")
+
+
+def test_cache_fetches_only_new_messages(path):
+    store = SQLiteConversationStore(path)
+    store.add_message("c1", "user", "one")
+    store.get_conversation("c1")
+    store.get_conversation("c1")
+    store.add_message("c1", "assistant", "two")
+
+    assert [m["content"] for m in store.get_conversation("c1")] == ["one", "two"]
+    assert store.cache_stats == {"hits": 1, "refreshes": 2, "misses": 0}
+
+
+def test_messages_are_trimmed_and_cursors_stay_stable(path):
+    store = SQLiteConversationStore(path)
+    store.max_messages = 3
+    for index in range(5):
+        store.add_message("c1", "user", f"message {index}")
+
+    page = store.get_conversation_page("c1", cursor=3)
+
+    assert store.get_message_offset("c1") == 2
+    assert [m["content"] for m in page["messages"]] == ["message 3", "message 4"]
+    assert page["next_cursor"] == 5
+    assert store.evictions["trimmed_messages"] == 2
+
+
+def test_sweep_removes_idle_and_excess_conversations(path):
+    store = SQLiteConversationStore(path)
+    for conversation_id in ("c1", "c2", "c3"):
+        store.add_message(conversation_id, "user", "hello")
+    store.max_conversations = 2
+
+    store.sweep()
+    assert [store.has_conversation(c) for c in ("c1", "c2", "c3")] == [False, True, True]
+
+    store.idle_ttl = -1
+    store.sweep()
+    assert store.get_conversation("c2") is None
+    assert store.evictions["count"] == 1 and store.evictions["ttl"] == 2
+
+
+async def test_event_loop_never_touches_the_database(path, monkeypatch):
+    store = SQLiteConversationStore(path)
+    await store.start()
+    loop_thread = threading.get_ident()
+    threads = []
+    append, read = store._append, store._read
+    monkeypatch.setattr(store, "_append", lambda *args: threads.append(threading.get_ident()) or append(*args))
+    monkeypatch.setattr(store, "_read", lambda *args: threads.append(threading.get_ident()) or read(*args))
+
+    store.add_message("c1", "user", "hello")
+    store.add_message("c1", "assistant", "hi")
+    await store.ensure_loaded("c1")
+
+    assert [m["content"] for m in store.get_conversation("c1")] == ["hello", "hi"]
+    assert store.get_version("c1").endswith("-2")
+    assert store.get_conversation_messages_for_llm("c1")[-1] == {"role": "assistant", "content": "hi"}
+    assert len(threads) == 3 and loop_thread not in threads
+    await store.close()
+
+
+async def test_queued_writes_keep_their_order_and_finish_on_close(path):
+    store = SQLiteConversationStore(path)
+    await store.start()
+    for index in range(20):
+        store.add_message("c1", "user", f"message {index}")
+    await store.close()
+
+    reopened = SQLiteConversationStore(path)
+    await reopened.ensure_loaded("c1")
+    assert [m["content"] for m in reopened.get_conversation("c1")] == [f"message {i}" for i in range(20)]
+    assert store.write_stats == {"written": 20, "failed": 0}
+
+
+async def test_failed_write_is_counted_and_logged(path, monkeypatch):
+    store = SQLiteConversationStore(path)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_append", fail)
+    store.add_message("c1", "user", "hello")
+    await store.ensure_loaded("c1")
+
+    assert store.write_stats["failed"] == 1
+    assert store.get_conversation("c1") is None
+    await asyncio.sleep(0)
+    assert store.get_stats()["writes"]["pending"] == 0
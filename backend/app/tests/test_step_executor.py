@@ -0,0 +1,165 @@
+"""
+Tests for running plans of steps as dependency graphs.
+"""
+import asyncio
+import time
+import pytest
+from app.services.step_executor import FAILED, SKIPPED, SUCCEEDED, TIMED_OUT, PlanError, Step, StepExecutor
+
+
+def square_sum(inputs):
+    """Process step; module-level so it can be pickled."""
+    return sum(index * index for index in range(inputs["n"]))
+
+
+@pytest.fixture
+def executor():
+    executor = StepExecutor(max_concurrency=4)
+    executor.retry_backoff = 0.01
+    yield executor
+    executor.close()
+
+
+def _output(value, delay=0.0):
+    async def step(inputs):
+        await asyncio.sleep(delay)
+        return value
+    return step
+
+
+async def _fail(inputs):
+    raise RuntimeError("boom")
+
+
+async def test_independent_steps_run_concurrently(executor):
+    async def fetch(inputs):
+        await asyncio.sleep(0.2)
+        return inputs["query"].upper()
+
+    async def combine(inputs):
+        return inputs["a"] + inputs["b"]
+
+    started = time.perf_counter()
+    plan = await executor.run(
+        [Step("combine", combine, depends_on=["a", "b"]), Step("a", fetch), Step("b", fetch)],
+        {"query": "q"},
+    )
+
+    assert plan.ok and plan.outputs == {"combine": "QQ", "a": "Q", "b": "Q"}
+    assert time.perf_counter() - started < 0.35
+    assert plan.metadata()["parallelism"] > 1.5
+
+
+async def test_failure_skips_dependents_but_not_independent_branches(executor):
+    async def combine(inputs):
+        return sorted(inputs)
+
+    plan = await executor.run([
+        Step("broken", _fail, retries=0),
+        Step("after", combine, depends_on=["broken"]),
+        Step("after_after", combine, depends_on=["after", "ok"]),
+        Step("ok", _output("fine", 0.05)),
+        Step("independent", combine, depends_on=["ok"]),
+    ])
+    steps = plan.steps
+
+    assert not plan.ok
+    assert steps["broken"].status == FAILED and steps["broken"].error == "RuntimeError: boom"
+    assert steps["after"].status == SKIPPED and steps["after"].attempts == 0
+    assert steps["after"].error == "Dependency 'broken' failed"
+    assert steps["after_after"].status == SKIPPED
+    assert steps["ok"].status == SUCCEEDED and steps["independent"].status == SUCCEEDED
+    assert executor.get_stats()["steps_run"] == 3
+
+
+async def test_failed_attempts_are_retried(executor):
+    calls = []
+
+    async def flaky(inputs):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ConnectionError("try again")
+        return "ok"
+
+    plan = await executor.run([Step("flaky", flaky, retries=2)])
+
+    assert plan.ok and plan.steps["flaky"].attempts == 3
+    assert executor.retries == 2
+    # Backoff doubles between attempts
+    assert calls[2] - calls[1] >= 0.02 > calls[1] - calls[0] >= 0.01
+
+
+async def test_timeouts_are_reported_per_step(executor):
+    plan = await executor.run([
+        Step("slow", _output(None, 5), timeout=0.05, retries=0),
+        Step("after", _output(None), depends_on=["slow"]),
+    ])
+
+    assert plan.steps["slow"].status == TIMED_OUT
+    assert "timed out" in plan.steps["slow"].error
+    assert plan.steps["after"].error == "Dependency 'slow' timed_out"
+
+
+async def test_backoff_releases_the_concurrency_slot():
+    executor = StepExecutor(max_concurrency=1)
+    executor.retry_backoff = 0.3
+    finished = {}
+
+    async def flaky(inputs):
+        if "flaky" not in finished:
+            finished["flaky"] = None
+            raise ConnectionError("try again")
+        finished["flaky"] = time.monotonic()
+
+    async def quick(inputs):
+        finished["quick"] = time.monotonic()
+
+    plan = await executor.run([Step("flaky", flaky, retries=1), Step("quick", quick)])
+
+    assert plan.ok
+    # The other step ran while the flaky one was backing off
+    assert finished["quick"] < finished["flaky"]
+    assert plan.steps["quick"].finished_at - plan.steps["flaky"].started_at < 0.2
+
+
+async def test_concurrency_is_bounded(executor):
+    active, peak = [0], [0]
+
+    async def tracked(inputs):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+
+    plan = await executor.run([Step(f"s{index}", tracked) for index in range(12)])
+
+    assert plan.ok and peak[0] == 4
+
+
+async def test_thread_and_process_steps(executor):
+    def blocking(inputs):
+        time.sleep(0.05)
+        return "thread"
+
+    plan = await executor.run(
+        [Step("thread", blocking, kind="thread"), Step("process", square_sum, kind="process")],
+        {"n": 1000},
+    )
+
+    assert plan.ok
+    assert plan.outputs == {"thread": "thread", "process": square_sum({"n": 1000})}
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([Step("x", _fail, depends_on=["y"])], "unknown step"),
+    ([Step("x", _fail, depends_on=["z"]), Step("z", _fail, depends_on=["x"])], "cycle"),
+    ([Step("x", _fail), Step("x", _fail)], "Duplicate"),
+])
+async def test_invalid_plans_are_rejected(executor, steps, message):
+    with pytest.raises(PlanError, match=message):
+        await executor.run(steps)
+
+
+def test_unknown_step_kind_is_rejected():
+    with pytest.raises(PlanError):
+        Step("x", _fail, kind="gpu")
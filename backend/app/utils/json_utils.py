@@ -0,0 +1,28 @@
+"""
+JSON utilities - Fast serialization of response payloads built by hand.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize a payload to compact UTF-8 JSON.
+
+    Uses orjson when installed and falls back to the standard library
+    otherwise; both leave non-ASCII text unescaped.
+
+    Args:
+        content: JSON-compatible payload of dicts, lists and scalars
+
+    Returns:
+        The encoded JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -3,17 +3,34 @@ Logging utilities for the application using loguru.
 """
 
 import os
+import random
 import sys
 from pathlib import Path
+from typing import Dict
 from loguru import logger
 
-# Get the absolute path to the logs directory
+# Get the absolute path to the logs directory (created by the file sink on first write)
 logs_dir = Path(__file__).parent.parent / "logs"
-logs_dir.mkdir(exist_ok=True)
 
 # Define log level from environment variable or use INFO as default
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
+# Emit records as JSON lines instead of formatted text
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() == "true"
+
+# Hand records to a background thread so sinks never block the request path
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() == "true"
+
+# Fraction of access-log lines to keep, overall and per route prefix
+# (e.g. ACCESS_LOG_ROUTE_SAMPLE_RATES="/api/health=0,/api/chat=0.5")
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {
+    route.strip(): float(rate)
+    for route, _, rate in (
+        item.partition("=") for item in os.getenv("ACCESS_LOG_ROUTE_SAMPLE_RATES", "").split(",") if "=" in item
+    )
+}
+
 # Remove default handler
 logger.remove()
 
@@ -22,6 +39,8 @@ logger.add(
     sys.stdout,
     level=LOG_LEVEL,
     format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+    serialize=LOG_JSON,
+    enqueue=LOG_ENQUEUE,
 )
 
 # Add file handler with rotation
@@ -33,13 +52,15 @@ logger.add(
     level=LOG_LEVEL,
     format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
     encoding="utf-8",
+    serialize=LOG_JSON,
+    enqueue=LOG_ENQUEUE,
+    delay=True,  # Open the file on the first record instead of at import
 )
 
 # Log startup information
-logger.info(f"Logging initialized with level: {LOG_LEVEL}")
-logger.info(f"Logs will be written to: {logs_dir.absolute()}")
 logger.info(
-    "Log rotation configured: daily rotation, 30 days retention, with compression"
+    "Logging initialized with level: {} - writing to {} (daily rotation, 30 days retention), json: {}, enqueued: {}",
+    LOG_LEVEL, logs_dir, LOG_JSON, LOG_ENQUEUE,
 )
 
 
@@ -54,3 +75,27 @@ def get_logger(name: str):
         A logger instance bound with the given context
     """
     return logger.bind(name=name)
+
+
+def should_log_access(path: str, status_code: int) -> bool:
+    """
+    Decide whether to write the access-log line for a request.
+
+    Server errors are always logged. Otherwise the sample rate of the
+    longest matching route prefix applies, falling back to the global rate.
+
+    Args:
+        path: The request path
+        status_code: The response status code
+
+    Returns:
+        True if the request should be logged
+    """
+    if status_code >= 500:
+        return True
+    rate = ACCESS_LOG_SAMPLE_RATE
+    matched = ""
+    for route, route_rate in ACCESS_LOG_ROUTE_SAMPLE_RATES.items():
+        if path.startswith(route) and len(route) > len(matched):
+            matched, rate = route, route_rate
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
@@ -0,0 +1,242 @@
+"""
+Metrics utilities - Minimal Prometheus-compatible metrics for the chat pipeline.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+# Latency buckets in seconds, from sub-millisecond store operations up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a label set, optionally with an extra pre-rendered label."""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """Base class for labelled metrics."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Optional[str]]) -> Tuple[str, ...]:
+        """Build the label-value key, rendering missing values as "none"."""
+        return tuple(str(labels.get(name) or "none") for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Optional[str]) -> None:
+        """Increase the counter for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Optional[str]) -> None:
+        """Increase the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Optional[str]) -> None:
+        """Decrease the gauge for a label set."""
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Optional[str]) -> None:
+        """Set the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    metric_type = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (non-cumulative), sum and count
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: Optional[str]) -> None:
+        """Record an observation for a label set."""
+        key = self._key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0.0] * (len(self.buckets) + 3)
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: Optional[str]) -> Iterator[None]:
+        """Observe the duration of the wrapped block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        lines = []
+        for key, data in items:
+            cumulative = 0.0
+            for position, bound in enumerate(self.buckets):
+                cumulative += data[position]
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {data[-1]}")
+        return lines
+
+
+MetricT = TypeVar("MetricT", bound=_Metric)
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together for the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: MetricT) -> MetricT:
+        """Add a metric to the registry and return it."""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every registered metric in the Prometheus text format."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Chat pipeline metrics
+CHAT_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "chat_stage_duration_seconds",
+    "Duration of each chat pipeline stage "
+    "(store_read, store_write, context_build, message_build, provider, response_build)",
+    ("stage", "role", "provider"),
+))
+CHAT_IN_FLIGHT = REGISTRY.register(Gauge(
+    "chat_requests_in_flight",
+    "Chat requests currently being processed",
+    ("endpoint", "role", "provider"),
+))
+CHAT_ERRORS = REGISTRY.register(Counter(
+    "chat_errors_total",
+    "Chat requests that failed",
+    ("endpoint", "role", "provider"),
+))
+LLM_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens sent to the LLM provider",
+    ("role", "provider"),
+))
+LLM_COMPLETION_TOKENS = REGISTRY.register(Counter(
+    "llm_completion_tokens_total",
+    "Completion tokens generated by the LLM provider",
+    ("role", "provider"),
+))
+LLM_HEDGES = REGISTRY.register(Counter(
+    "llm_hedged_requests_total",
+    "Hedge requests sent to a second LLM backend after the first was slow",
+    ("provider",),
+))
+LLM_FALLBACKS = REGISTRY.register(Counter(
+    "llm_fallback_responses_total",
+    "Responses served by a backend other than the first choice",
+    ("provider",),
+))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "admission_rejections_total",
+    "Chat requests turned away by admission control (rate_limited, queue_full, queue_timeout)",
+    ("reason", "role"),
+))
+
+# Data access metrics
+SQL_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "sql_query_duration_seconds",
+    "Duration of SQL queries and statements, including streaming all rows",
+    ("operation", "outcome"),
+))
+PLAN_STEP_SECONDS = REGISTRY.register(Histogram(
+    "plan_step_duration_seconds",
+    "Duration of each attempt of a planned query step",
+    ("kind", "outcome"),
+))
+
+# Process metrics
+APP_STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "app_startup_duration_seconds",
+    "Time spent in each startup phase of the worker",
+    ("phase",),
+))
@@ -0,0 +1,92 @@
+"""
+Fake LLM - Deterministic chat model with configurable latency for benchmarks.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Vocabulary the fake responses are drawn from
+_WORDS = (
+    "revenue growth margin quarter region customer churn forecast pipeline cohort "
+    "trend variance segment retention conversion average median total increase decrease"
+).split()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers deterministically after a simulated delay.
+
+    Each call waits for a fixed first-token latency and then produces
+    response_tokens tokens at token_rate tokens per second. The response text
+    depends only on the last message, so identical prompts get identical
+    answers, and token usage is reported like a real provider.
+    """
+
+    latency: float = 0.05
+    token_rate: float = 200.0
+    response_tokens: int = 50
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        """Build the deterministic response tokens for a prompt."""
+        digest = hashlib.sha256(str(messages[-1].content).encode("utf-8")).digest()
+        return [_WORDS[digest[i % len(digest)] % len(_WORDS)] + " " for i in range(self.response_tokens)]
+
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        """Wrap the response tokens in a ChatResult with usage metadata."""
+        prompt_tokens = sum(len(str(message.content).split()) for message in messages)
+        message = AIMessage(
+            content="".join(tokens).strip(),
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generation_time(self) -> float:
+        return self.latency + self.response_tokens / self.token_rate
+
+    def _generate(self,
+                  messages: List[BaseMessage],
+                  stop: Optional[List[str]] = None,
+                  run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        time.sleep(self._generation_time())
+        return self._result(messages, self._tokens(messages))
+
+    async def _agenerate(self,
+                         messages: List[BaseMessage],
+                         stop: Optional[List[str]] = None,
+                         run_manager: Any = None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._generation_time())
+        return self._result(messages, self._tokens(messages))
+
+    def _stream(self,
+                messages: List[BaseMessage],
+                stop: Optional[List[str]] = None,
+                run_manager: Any = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens(messages):
+            time.sleep(1.0 / self.token_rate)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self,
+                       messages: List[BaseMessage],
+                       stop: Optional[List[str]] = None,
+                       run_manager: Any = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(messages):
+            await asyncio.sleep(1.0 / self.token_rate)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
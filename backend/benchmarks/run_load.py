@@ -0,0 +1,230 @@
+"""
+Load Benchmark - Drives the FastAPI app in-process against a fake LLM.
+
+Usage (from the backend directory):
+    python -m benchmarks.run_load --concurrency 50 --conversations 200 --turns 5
+    python -m benchmarks.run_load --endpoint stream --output benchmarks/results/stream.json
+    python -m benchmarks.run_load --compare benchmarks/results/baseline.json
+
+Each virtual user runs one conversation of --turns sequential chat requests;
+--concurrency conversations run at once. The app's LLM client is replaced by
+FakeChatModel, so results measure the service itself rather than a provider.
+Results are written as JSON so runs can be compared with --compare.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Keep benchmark output readable and avoid measuring log I/O unless asked to
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LLM_WARMUP_ENABLED", "false")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.fake_llm import FakeChatModel  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(percentile / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _git_commit() -> Optional[str]:
+    """Current git commit, if available, to label the results."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def _send(client: httpx.AsyncClient,
+                endpoint: str,
+                payload: Dict[str, Any],
+                user_id: str) -> Optional[str]:
+    """Send one chat request and return the conversation ID from the response."""
+    # Each virtual user is its own caller for the per-user rate limit
+    headers = {"X-User-Id": user_id}
+    if endpoint == "stream":
+        conversation_id = None
+        async with client.stream("POST", "/api/chat/stream", json=payload, headers=headers) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and '"conversation_id"' in line:
+                    conversation_id = json.loads(line[6:])["conversation_id"]
+        return conversation_id
+    response = await client.post("/api/chat", json=payload, headers=headers)
+    response.raise_for_status()
+    return response.json()["conversation_id"]
+
+
+async def _conversation(client: httpx.AsyncClient,
+                        args: argparse.Namespace,
+                        index: int,
+                        latencies: List[float],
+                        errors: List[str]) -> None:
+    """Run one virtual user's conversation."""
+    conversation_id = None
+    for turn in range(args.turns):
+        query = f"Question {turn}" if args.repeat_queries else f"Question {turn} from user {index}"
+        payload = {"query": query, "role": args.role, "conversationId": conversation_id}
+        start = time.perf_counter()
+        try:
+            conversation_id = await _send(client, args.endpoint, payload, f"benchmark-user-{index}") or conversation_id
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the benchmark and collect results.
+
+    Args:
+        args: Parsed command-line arguments
+
+    Returns:
+        Dictionary with the configuration and measured results
+    """
+    latencies: List[float] = []
+    errors: List[str] = []
+    fake_llm = FakeChatModel(latency=args.latency, token_rate=args.token_rate, response_tokens=args.tokens)
+
+    async with app.router.lifespan_context(app):
+        # Swap the provider client for the fake model on the app-scoped service
+        app.state.llm_service.llm = fake_llm
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def user(index: int) -> None:
+                async with semaphore:
+                    await _conversation(client, args, index, latencies, errors)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(user(index) for index in range(args.conversations)))
+            duration = time.perf_counter() - start
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "endpoint": args.endpoint,
+            "concurrency": args.concurrency,
+            "conversations": args.conversations,
+            "turns": args.turns,
+            "role": args.role,
+            "repeat_queries": args.repeat_queries,
+            "fake_llm": {"latency": args.latency, "token_rate": args.token_rate, "response_tokens": args.tokens},
+        },
+        "results": {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "duration_s": round(duration, 3),
+            "requests_per_s": round(len(latencies) / duration, 2) if duration else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(latencies_ms, 50), 2),
+                "p95": round(_percentile(latencies_ms, 95), 2),
+                "p99": round(_percentile(latencies_ms, 99), 2),
+                "mean": round(statistics.fmean(latencies_ms), 2) if latencies_ms else 0.0,
+                "max": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+            },
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        },
+        "sample_errors": errors[:5],
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Describe how the current results differ from a baseline run.
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from an earlier run
+
+    Returns:
+        Lines describing the change of each headline metric
+    """
+    lines = []
+    metrics = [
+        ("requests_per_s", current["results"]["requests_per_s"], baseline["results"]["requests_per_s"]),
+        ("peak_rss_mb", current["results"]["peak_rss_mb"], baseline["results"]["peak_rss_mb"]),
+    ]
+    for name in ("p50", "p95", "p99"):
+        metrics.append((
+            f"latency_{name}_ms",
+            current["results"]["latency_ms"][name],
+            baseline["results"]["latency_ms"][name],
+        ))
+    for name, now, before in metrics:
+        change = ((now - before) / before * 100) if before else 0.0
+        lines.append(f"{name:>18}: {before:>10} -> {now:>10} ({change:+.1f}%)")
+    return lines
+
+
+def main() -> None:
+    """Parse arguments, run the benchmark and write the results file."""
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the chat API")
+    parser.add_argument("--endpoint", choices=["chat", "stream"], default="chat", help="Chat endpoint to drive")
+    parser.add_argument("--concurrency", type=int, default=20, help="Conversations running at once")
+    parser.add_argument("--conversations", type=int, default=100, help="Total conversations to run")
+    parser.add_argument("--turns", type=int, default=5, help="Sequential requests per conversation")
+    parser.add_argument("--role", default="DataAnalyst", help="Role sent with each request")
+    parser.add_argument("--repeat-queries", action="store_true", help="Send the same queries in every conversation")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM first-token latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake LLM tokens per second")
+    parser.add_argument("--tokens", type=int, default=50, help="Fake LLM tokens per response")
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = args.output or RESULTS_DIR / f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    summary = results["results"]
+    print(f"Requests: {summary['requests']} ({summary['errors']} errors) in {summary['duration_s']}s")
+    print(f"Throughput: {summary['requests_per_s']} req/s")
+    print("Latency ms: p50={p50} p95={p95} p99={p99} max={max}".format(**summary["latency_ms"]))
+    print(f"Peak RSS: {summary['peak_rss_mb']} MB")
+    print(f"Results written to: {output}")
+
+    if args.compare:
+        print(f"Compared with {args.compare}:")
+        for line in compare(results, json.loads(args.compare.read_text())):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
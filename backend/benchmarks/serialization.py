@@ -0,0 +1,155 @@
+"""
+Serialization Benchmark - Compares the response encoding paths of the chat API.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --messages 200 2000 10000 --batch 100
+
+Each case times the previous encoding path against the current one on the
+same payload, outside of the ASGI stack so only serialization is measured:
+
+- conversation: a GET /chat/conversation page of N messages, previously
+  json.dumps, now app.utils.json_utils.dumps (orjson when installed)
+- chat: a POST /chat response, previously built as ChatResponse in the
+  router and validated again by FastAPI, now validated once from the dict
+- batch: a POST /chat/batch response of B items, previously wrapped in
+  ChatBatchItemResult and ChatBatchResponse models before FastAPI's own
+  validation, now validated once from plain dicts
+
+Pydantic does not revalidate model instances, so the chat and batch cases
+only drop a model construction and mostly stay within noise; FastAPI
+already encodes response_model routes with pydantic-core, which is why they
+keep the default response class rather than an orjson one. The gain is on
+the hand-built conversation, SSE and NDJSON payloads.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+# Keep benchmark output readable
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from pydantic import TypeAdapter  # noqa: E402
+from app.models.chat import ChatBatchItemResult, ChatBatchResponse, ChatResponse  # noqa: E402
+from app.utils.json_utils import dumps, orjson  # noqa: E402
+
+
+def _time(func: Callable[[], Any], min_seconds: float = 0.5) -> float:
+    """Best per-call time of func in seconds over repeated runs of at least min_seconds."""
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= 0.05:
+            break
+        calls *= 2
+    best = elapsed / calls
+    deadline = time.perf_counter() + min_seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - started) / calls)
+    return best
+
+
+def _messages(count: int) -> List[Dict[str, str]]:
+    """A conversation of alternating user and assistant messages with realistic lengths."""
+    started = datetime(2024, 1, 1)
+    answer = (
+        "Revenue grew 12.4% quarter over quarter, driven mostly by the EMEA region (+18%) "
+        "while APAC was flat. The top three products account for 61% of the increase; "
+        "returns stayed below 2% in every region. "
+    ) * 3
+    return [
+        {
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": f"How did revenue change in Q{index % 4 + 1}, broken down by region?" if index % 2 == 0 else answer,
+            "timestamp": (started + timedelta(seconds=index)).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def _chat_response(index: int = 0) -> Dict[str, Any]:
+    """A chat response payload as built by ChatService."""
+    return {
+        "query": "Summarize last quarter's revenue by region",
+        "result": "Revenue grew 12.4% quarter over quarter, driven mostly by EMEA. " * 8,
+        "conversation_id": f"5f0c8a7e-0000-4000-8000-{index:012d}",
+        "metadata": {
+            "role": "DataAnalyst", "provider": "openai", "model": "gpt-4o", "hedged": False,
+            "fallback": False, "context_tokens": 1834, "history_messages": 12,
+            "summarized_messages": 0, "cache_hit": False, "coalesced": False,
+        },
+    }
+
+
+def _report(name: str, before: float, after: float) -> None:
+    print(f"{name:<28} {before * 1e6:>12.1f}us {after * 1e6:>12.1f}us {before / after:>8.2f}x")
+
+
+def run(args: argparse.Namespace) -> None:
+    print(f"JSON encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'case':<28} {'before':>14} {'after':>14} {'speedup':>9}")
+
+    for count in args.messages:
+        payload = {
+            "id": "5f0c8a7e-0000-4000-8000-000000000000",
+            "messages": _messages(count),
+            "version": "65dfe383de43c-4",
+            "next_cursor": count,
+            "has_more": False,
+        }
+        assert json.loads(dumps(payload)) == payload
+        _report(
+            f"conversation ({count} msgs)",
+            _time(lambda: json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+            _time(lambda: dumps(payload)),
+        )
+
+    # FastAPI validates and serializes response_model routes through a TypeAdapter
+    chat_adapter = TypeAdapter(ChatResponse)
+    response = _chat_response()
+    _report(
+        "chat response",
+        _time(lambda: chat_adapter.dump_json(chat_adapter.validate_python(ChatResponse(**response)))),
+        _time(lambda: chat_adapter.dump_json(chat_adapter.validate_python(response))),
+    )
+
+    batch_adapter = TypeAdapter(ChatBatchResponse)
+    results = [{"response": _chat_response(index)} for index in range(args.batch)]
+
+    def batch_before() -> bytes:
+        items = [ChatBatchItemResult(index=index, **result) for index, result in enumerate(results)]
+        return batch_adapter.dump_json(batch_adapter.validate_python(ChatBatchResponse(results=items)))
+
+    def batch_after() -> bytes:
+        items = [dict(result, index=index) for index, result in enumerate(results)]
+        return batch_adapter.dump_json(batch_adapter.validate_python({"results": items}))
+
+    assert json.loads(batch_before()) == json.loads(batch_after())
+    _report(f"batch ({args.batch} items)", _time(batch_before), _time(batch_after))
+
+    _report(
+        f"batch ndjson ({args.batch} items)",
+        _time(lambda: [json.dumps({"index": index, **result}) + "\n" for index, result in enumerate(results)]),
+        _time(lambda: [dumps({"index": index, **result}) + b"\n" for index, result in enumerate(results)]),
+    )
+
+
+def main() -> None:
+    """Parse arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Serialization benchmark for the chat API responses")
+    parser.add_argument("--messages", type=int, nargs="+", default=[50, 500, 5000], help="Conversation lengths to encode")
+    parser.add_argument("--batch", type=int, default=100, help="Items in the batch response")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()